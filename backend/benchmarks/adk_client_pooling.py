@@ -0,0 +1,86 @@
+"""
+ADK call latency with a new HTTP client per call vs the pooled AdkClient.
+
+Starts the ADK stand-in server (tests/fixtures/adk_stub_server.py) on a local
+port and issues suggestion requests at a fixed concurrency, first creating an
+httpx.AsyncClient per call (the old pattern, one TCP handshake per request),
+then through one AdkClient whose keep-alive pool is shared by every call.
+Over loopback there is no TLS and almost no RTT, so real deployments gain
+more than shown here.
+
+Usage (from the backend directory):
+    python benchmarks/adk_client_pooling.py [--requests 400] [--concurrency 20]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from fixtures.adk_stub_server import create_adk_stub_app  # noqa: E402
+from trip_wizards.adk_client import AdkClient  # noqa: E402
+
+PORT = 8765
+
+
+async def client_per_call(base_url):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.post('/v1/suggest', json={'prompt': 'restaurant', 'context': {}})
+        response.raise_for_status()
+
+
+async def run(label, call, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{label:<18} {latencies[len(latencies) // 2] * 1000:>10.2f} "
+        f"{latencies[int(len(latencies) * 0.99)] * 1000:>10.2f} {requests / elapsed:>10.0f}"
+    )
+
+
+async def main_async(args):
+    server = uvicorn.Server(uvicorn.Config(
+        create_adk_stub_app(), host='127.0.0.1', port=PORT, log_level='warning'
+    ))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    base_url = f'http://127.0.0.1:{PORT}'
+    adk = AdkClient(base_url, max_keepalive=args.concurrency)
+    print(f"{'mode':<18} {'p50 ms':>10} {'p99 ms':>10} {'req/s':>10}")
+    await run('client per call', lambda: client_per_call(base_url), args.requests, args.concurrency)
+    await run('pooled AdkClient', lambda: adk.suggest('restaurant'), args.requests, args.concurrency)
+    await adk.close()
+
+    server.should_exit = True
+    await serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=20)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
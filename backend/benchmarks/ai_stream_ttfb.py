@@ -0,0 +1,83 @@
+"""
+Time to first byte of an AI suggestion, whole response vs streamed.
+
+Starts the ADK stand-in server (tests/fixtures/adk_stub_server.py) with a
+fixed processing delay, by default the 1234 ms the itinerary generation
+fixture reports, and asks for a full itinerary: once with AdkClient.suggest,
+which returns only when the answer is complete, then with
+AdkClient.stream_suggest, timing the first chunk and the last. The stand-in
+spreads its delay across the chunks, as a token-streaming model would.
+
+Usage (from the backend directory):
+    python benchmarks/ai_stream_ttfb.py [--delay 1.234] [--requests 5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import uvicorn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from fixtures.adk_stub_server import create_adk_stub_app  # noqa: E402
+from trip_wizards.adk_client import AdkClient  # noqa: E402
+
+PORT = 8766
+PROMPT = 'plan my trip to Tokyo'
+
+
+async def whole(adk):
+    started = time.perf_counter()
+    await adk.suggest(PROMPT)
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+async def streamed(adk):
+    started = time.perf_counter()
+    first = None
+    async for _ in adk.stream_suggest(PROMPT):
+        if first is None:
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+async def run(label, call, adk, requests):
+    results = [await call(adk) for _ in range(requests)]
+    first = sorted(result[0] for result in results)[len(results) // 2]
+    last = sorted(result[1] for result in results)[len(results) // 2]
+    print(f"{label:<10} {first * 1000:>14.1f} {last * 1000:>14.1f}")
+
+
+async def main_async(args):
+    server = uvicorn.Server(uvicorn.Config(
+        create_adk_stub_app(args.delay), host='127.0.0.1', port=PORT, log_level='warning'
+    ))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    adk = AdkClient(f'http://127.0.0.1:{PORT}')
+    await adk.suggest('warm up the connection pool')
+    print(f"{'mode':<10} {'first byte ms':>14} {'complete ms':>14}")
+    await run('whole', whole, adk, args.requests)
+    await run('streamed', streamed, adk, args.requests)
+    await adk.close()
+
+    server.should_exit = True
+    await serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--delay', type=float, default=1.234)
+    parser.add_argument('--requests', type=int, default=5)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
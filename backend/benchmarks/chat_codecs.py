@@ -0,0 +1,74 @@
+"""
+Bytes per chat message and encode cost for each WebSocket subprotocol.
+
+Encodes a mix of short and long chat messages with the JSON text format, the
+compact MessagePack format and MessagePack with per-message deflate, and
+reports the average frame size and the time to re-encode one broadcast frame
+for a binary subscriber (the per-room cost paid once per codec).
+
+Usage (from the backend directory):
+    python benchmarks/chat_codecs.py [--messages 2000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from trip_wizards.chat_codec import CODECS  # noqa: E402
+
+PHRASES = [
+    'ok',
+    'sounds good!',
+    'Can we push the museum visit to the afternoon?',
+    'I found a ryokan near Kiyomizu-dera with an onsen, about 180 per night '
+    'including breakfast and dinner. Should I book two rooms for the 14th?',
+    'Agent: here are three dinner options in Gion that take reservations for six '
+    'people on Friday, sorted by distance from the hotel.',
+]
+
+
+def make_messages(count):
+    start = datetime(2024, 4, 15, 9, 0)
+    return [
+        {
+            'message': random.choice(PHRASES),
+            'sender': random.choice(['user_alice_123', 'user_bob_456', 'agent']),
+            'isAgent': random.random() < 0.2,
+            'timestamp': (start + timedelta(seconds=seq * 7)).isoformat(),
+            'trip_id': 'trip_kyoto_2024',
+            'seq': seq,
+        }
+        for seq in range(1, count + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=2000)
+    args = parser.parse_args()
+
+    frames = [json.dumps(message) for message in make_messages(args.messages)]
+
+    print(f"{'protocol':<32} {'avg bytes':>10} {'vs json':>8} {'encode us':>10}")
+    json_size = None
+    for protocol, codec in CODECS.items():
+        started = time.perf_counter()
+        encoded = [codec.encode_frame(frame) for frame in frames]
+        elapsed = time.perf_counter() - started
+        sizes = [len(item.encode() if isinstance(item, str) else item) for item in encoded]
+        average = sum(sizes) / len(sizes)
+        json_size = json_size or average
+        print(
+            f"{protocol:<32} {average:>10.1f} {average / json_size:>7.0%} "
+            f"{elapsed / len(frames) * 1e6:>10.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Event loop responsiveness under mixed load.
+
+Compares the old blocking Firestore access pattern (sync client calls inside
+async handlers) with the async FirestoreStore. A ticker task measures how late
+the event loop wakes it up while org lookups and chat echo traffic run
+concurrently; with a blocking client every round trip shows up as loop lag.
+
+Usage (from the backend directory):
+    python benchmarks/event_loop_responsiveness.py [--latency-ms 20] [--requests 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from fixtures.fake_firestore import FakeAsyncFirestore  # noqa: E402
+from trip_wizards.firestore_store import FirestoreStore  # noqa: E402
+
+TICK_SECONDS = 0.001
+
+
+class BlockingStore:
+    """Mimics the sync firestore.client(): each round trip blocks the thread."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def get(self, collection, doc_id):
+        time.sleep(self.latency)
+        return {'name': 'Acme Travel Corp'}
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+
+async def chat_echo(latencies, stop):
+    # Stand-in for a chat socket receiving a frame every 2 ms: record how
+    # late each frame is handled
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.002)
+        latencies.append(time.perf_counter() - started - 0.002)
+
+
+async def run(store, requests: int, concurrency: int):
+    lags, chat_latencies = [], []
+    stop = asyncio.Event()
+    background = [asyncio.create_task(ticker(lags, stop))]
+    background += [asyncio.create_task(chat_echo(chat_latencies, stop)) for _ in range(10)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def org_lookup(i):
+        async with semaphore:
+            await store.get('organizations', f'org_{i}')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(org_lookup(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*background)
+    return elapsed, lags, chat_latencies
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, elapsed, lags, chat_latencies, requests):
+    print(f"{label}")
+    print(f"  throughput     {requests / elapsed:10.1f} lookups/s")
+    print(f"  loop lag p50   {statistics.median(lags) * 1000:10.2f} ms")
+    print(f"  loop lag p99   {percentile(lags, 99) * 1000:10.2f} ms")
+    print(f"  loop lag max   {max(lags) * 1000:10.2f} ms")
+    print(f"  chat delay p99 {percentile(chat_latencies, 99) * 1000:10.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    for label, store in (
+        ('blocking sync client', BlockingStore(latency)),
+        ('async FirestoreStore', FirestoreStore(FakeAsyncFirestore(latency=latency))),
+    ):
+        elapsed, lags, chat_latencies = asyncio.run(run(store, args.requests, args.concurrency))
+        report(label, elapsed, lags, chat_latencies, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Prompt intent routing: chained substring checks vs the compiled IntentRouter.
+
+Generates labelled synthetic prompts from templates (intent keywords mixed
+with filler, destinations and small talk), then routes every prompt with
+each approach and reports the cost per prompt and the share routed to the
+right intent. The substring baseline checks `keyword in prompt` for every
+keyword of every intent in turn, the way ai_suggest used to with two
+keywords, and takes the first hit.
+
+Usage (from the backend directory):
+    python benchmarks/intent_routing.py [--prompts 10000] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from trip_wizards.ai_intents import GENERAL, INTENT_KEYWORDS, IntentRouter  # noqa: E402
+
+TEMPLATES = {
+    'restaurant': ['where should we eat in {city}', 'any good restaurants near {place}?',
+                   'best ramen for dinner in {city}', 'vegan food options around {place}'],
+    'activity': ['things to do in {city} on a rainy afternoon', 'hiking trails near {city}',
+                 'which museums should we visit', 'fun activities for kids near {place}'],
+    'weather': ['what will the weather be like in {city}', 'will it rain on our trip?',
+                'temperature forecast for {city} next week', 'should I bring an umbrella'],
+    'budget': ['how much should we budget per day', 'is {city} expensive?',
+               'what will the hotel cost', 'cheap ways to save money in {city}'],
+    'transportation': ['how do we get around {city}', 'is the JR pass worth it',
+                       'taxi or subway from {place}?', 'best airport transfer to {place}'],
+    'itinerary_optimization': ['optimize our itinerary for tomorrow', 'reorder day 2 to avoid backtracking',
+                               'what is the best order for these stops'],
+    'itinerary_generation': ['plan our trip to {city}', 'generate a day by day plan for {city}',
+                             'make a full itinerary for {city}'],
+    'help': ['hi', 'hello there', 'what can you do?'],
+    GENERAL: ['what is the capital of {city}', 'tell me about {city}', 'is {place} open on sunday'],
+}
+CITIES = ['Tokyo', 'Barcelona', 'Lisbon', 'Hotan', 'Eaton', 'Kyoto', 'Seattle']
+PLACES = ['the hotel', 'Shibuya station', 'our Airbnb', 'the old town', 'Heathrow']
+
+
+def synthetic_prompts(count, seed):
+    rng = random.Random(seed)
+    intents = list(TEMPLATES)
+    prompts = []
+    for _ in range(count):
+        intent = rng.choice(intents)
+        text = rng.choice(TEMPLATES[intent]).format(city=rng.choice(CITIES), place=rng.choice(PLACES))
+        if rng.random() < 0.2:
+            text = '@agent ' + text
+        prompts.append((text, intent))
+    return prompts
+
+
+def substring_route(prompt):
+    prompt = prompt.lower()
+    for intent, keywords in INTENT_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword.rstrip('*') in prompt:
+                return intent
+    return GENERAL
+
+
+def run(label, route, prompts):
+    started = time.perf_counter()
+    intents = [route(text) for text, _ in prompts]
+    elapsed = time.perf_counter() - started
+    correct = sum(intent == expected for intent, (_, expected) in zip(intents, prompts))
+    print(f"{label:<18} {elapsed / len(prompts) * 1e6:>12.2f} {correct / len(prompts):>10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--prompts', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    prompts = synthetic_prompts(args.prompts, args.seed)
+    router = IntentRouter()
+    print(f"{'approach':<18} {'us/prompt':>12} {'correct':>10}")
+    run('substring chain', substring_route, prompts)
+    run('IntentRouter', lambda text: router.route(text).intent, prompts)
+
+
+if __name__ == '__main__':
+    main()
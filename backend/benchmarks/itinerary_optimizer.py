@@ -0,0 +1,76 @@
+"""
+Local itinerary optimization time and travel saved for 10, 100 and 1000 stops.
+
+Scatters stops over central Tokyo (30 minutes each, with a booked dinner and
+a morning window for one in ten stops) and orders them three ways: as given,
+nearest neighbour only, and nearest neighbour plus 2-opt. Reports the
+optimizer's wall time per run and the total travel minutes of each order.
+
+Usage (from the backend directory):
+    python benchmarks/itinerary_optimizer.py [--sizes 10 100 1000] [--runs 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from trip_wizards.itinerary_optimizer import ItineraryOptimizer  # noqa: E402
+
+
+def make_stops(count, seed, windows):
+    rng = random.Random(seed)
+    stops = []
+    for i in range(count):
+        stop = {
+            'id': f'stop_{i}',
+            'coordinates': {'lat': 35.60 + rng.random() * 0.15, 'lng': 139.65 + rng.random() * 0.2},
+            'duration_minutes': 30,
+        }
+        if windows and i == 0:
+            stop['startTime'] = '19:00'
+        elif windows and i % 10 == 5:
+            stop['window'] = {'start': '09:00', 'end': '12:00'}
+        stops.append(stop)
+    return stops
+
+
+def run(count, runs, windows):
+    greedy = ItineraryOptimizer(max_passes=0)
+    two_opt = ItineraryOptimizer()
+    timings = {'greedy': [], 'two_opt': []}
+    for seed in range(runs):
+        stops = make_stops(count, seed, windows)
+        for label, optimizer in (('greedy', greedy), ('two_opt', two_opt)):
+            started = time.perf_counter()
+            result = optimizer.optimize(stops)
+            timings[label].append((time.perf_counter() - started) * 1000)
+            timings[label + '_travel'] = result['total_travel_minutes']
+        timings['baseline_travel'] = result['baseline_travel_minutes']
+    median = {label: sorted(values)[len(values) // 2] for label, values in timings.items() if isinstance(values, list)}
+    print(
+        f"{count:>6} {'yes' if windows else 'no':>8} {median['greedy']:>10.2f} {median['two_opt']:>10.2f} "
+        f"{timings['baseline_travel']:>12.0f} {timings['greedy_travel']:>12.0f} {timings['two_opt_travel']:>12.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # Warm up NumPy before timing
+    ItineraryOptimizer().optimize(make_stops(10, 0, True))
+    print(f"{'stops':>6} {'windows':>8} {'nn ms':>10} {'2-opt ms':>10} "
+          f"{'as given min':>12} {'nn min':>12} {'2-opt min':>12}")
+    for count in args.sizes:
+        for windows in (False, True):
+            run(count, args.runs, windows)
+
+
+if __name__ == '__main__':
+    main()
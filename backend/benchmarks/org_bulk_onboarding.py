@@ -0,0 +1,79 @@
+"""
+Onboarding a large organization.
+
+Adds N users to a new organization one POST /members call at a time (timed
+on a sample and extrapolated, since thousands of sequential calls take
+minutes) and with one bulk call, which reads and writes in chunked batches
+several at a time.
+
+Usage (from the backend directory):
+    python benchmarks/org_bulk_onboarding.py [--latency-ms 20] [--users 10000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from fixtures.fake_firestore import FakeAsyncFirestore  # noqa: E402
+from trip_wizards.doc_cache import CachedFirestoreStore, DocumentCache  # noqa: E402
+from trip_wizards.doc_loader import DocumentLoader  # noqa: E402
+from trip_wizards.org_index import OrgIndex  # noqa: E402
+from trip_wizards.org_members import OrgMembers  # noqa: E402
+
+
+def make_members(latency: float, users: int, concurrency: int):
+    client = FakeAsyncFirestore(latency=latency)
+    client.seed('organizations/org_1', {'name': 'Big Corp', 'adminId': 'admin'})
+    for i in range(users):
+        client.seed(f'users/u{i:05d}', {'subscriptionPlan': 'free'})
+    # The same cached store the app uses
+    store = CachedFirestoreStore(client, DocumentCache(['organizations', 'users']))
+    return client, store, OrgMembers(store, OrgIndex(store), concurrency=concurrency)
+
+
+async def one_at_a_time(latency: float, users: int, sample: int):
+    client, store, members = make_members(latency, users, 1)
+    started = time.perf_counter()
+    for i in range(sample):
+        # What add_member_to_org does per call
+        loader = DocumentLoader(store)
+        await asyncio.gather(loader.load('users', f'u{i:05d}'), loader.load('organizations', 'org_1'))
+        await members.add('org_1', f'u{i:05d}', loader=loader)
+    elapsed = time.perf_counter() - started
+    return elapsed * users / sample, client.rpc_count * users / sample
+
+
+async def bulk(latency: float, users: int, concurrency: int):
+    client, _, members = make_members(latency, users, concurrency)
+    started = time.perf_counter()
+    result = await members.bulk_add('org_1', [f'u{i:05d}' for i in range(users)])
+    assert result['added'] == users
+    return time.perf_counter() - started, client.rpc_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--sample', type=int, default=100)
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    elapsed, rpcs = asyncio.run(one_at_a_time(latency, args.users, min(args.sample, args.users)))
+    print(f"{args.users} single adds (extrapolated from {min(args.sample, args.users)})")
+    print(f"  time           {elapsed:10.1f} s")
+    print(f"  round trips    {rpcs:10.0f}")
+    for concurrency in (1, 8):
+        elapsed, rpcs = asyncio.run(bulk(latency, args.users, concurrency))
+        print(f"bulk add, {concurrency} batches at a time")
+        print(f"  time           {elapsed:10.1f} s")
+        print(f"  round trips    {rpcs:10d}")
+
+
+if __name__ == '__main__':
+    main()
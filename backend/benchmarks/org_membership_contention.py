@@ -0,0 +1,121 @@
+"""
+Concurrent membership changes on one organization.
+
+Many admins invite users to, and add members to, the same organization at
+once. Compares the original handlers, which read the organization, edited
+its memberIds and pendingInvites arrays in Python and wrote them back, with
+ArrayUnion/ArrayRemove updates of those arrays and with the current layout
+of one document per member and invite. Reports throughput, Firestore round
+trips per change and how many changes were lost to overwrites, for one admin
+at a time and for many at once.
+
+Usage (from the backend directory):
+    python benchmarks/org_membership_contention.py [--latency-ms 20] [--changes 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from google.cloud.firestore import ArrayRemove, ArrayUnion  # noqa: E402
+
+from fixtures.fake_firestore import FakeAsyncFirestore  # noqa: E402
+from trip_wizards.doc_cache import CachedFirestoreStore, DocumentCache  # noqa: E402
+from trip_wizards.firestore_store import FirestoreStore  # noqa: E402
+from trip_wizards.org_index import OrgIndex  # noqa: E402
+from trip_wizards.org_members import OrgMembers  # noqa: E402
+
+ARRAYS = {'name': 'Wizards', 'adminId': 'admin', 'memberIds': ['admin'], 'pendingInvites': []}
+
+
+async def read_modify_write(store, i):
+    org = await store.get('organizations', 'org_1')
+    if i % 2:
+        await store.update('organizations', 'org_1', {
+            'pendingInvites': org['pendingInvites'] + [f'{i}@example.com'],
+        })
+    else:
+        members = org['memberIds'] + [f'u{i}']
+        invites = [email for email in org['pendingInvites'] if email != f'{i}@example.com']
+        await store.update('organizations', 'org_1', {'memberIds': members, 'pendingInvites': invites})
+
+
+async def array_operations(store, i):
+    org = await store.get('organizations', 'org_1')
+    if i % 2:
+        if f'{i}@example.com' not in org['pendingInvites']:
+            await store.update('organizations', 'org_1', {'pendingInvites': ArrayUnion([f'{i}@example.com'])})
+    elif f'u{i}' not in org['memberIds']:
+        await store.update('organizations', 'org_1', {
+            'memberIds': ArrayUnion([f'u{i}']),
+            'pendingInvites': ArrayRemove([f'{i}@example.com']),
+        })
+
+
+async def member_documents(store, i):
+    members = OrgMembers(store, OrgIndex(store))
+    if i % 2:
+        await members.invite('org_1', f'{i}@example.com')
+    else:
+        await members.add('org_1', f'u{i}', f'{i}@example.com')
+
+
+async def run(make_store, change, latency: float, changes: int, concurrency: int):
+    client = FakeAsyncFirestore(latency=latency)
+    if change is member_documents:
+        client.seed('organizations/org_1', {'name': 'Wizards', 'adminId': 'admin'})
+        client.seed('organizations/org_1/members/admin', {'userId': 'admin', 'role': 'admin'})
+    else:
+        client.seed('organizations/org_1', ARRAYS)
+    store = make_store(client)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await change(store, i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(changes)))
+    elapsed = time.perf_counter() - started
+    if change is member_documents:
+        # Member and invite documents, less the admin's
+        kept = sum(1 for path in client._docs if path.startswith('organizations/org_1/')) - 1
+    else:
+        org = client.data('organizations/org_1')
+        kept = len(org['memberIds']) - 1 + len(org['pendingInvites'])
+    return elapsed, client.rpc_count, changes - kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--changes', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    def cached(client):
+        return CachedFirestoreStore(client, DocumentCache(['organizations']))
+
+    # One admin at a time, then many at once
+    for concurrency in (1, args.concurrency):
+        for label, make_store, change in (
+            ('read-modify-write', FirestoreStore, read_modify_write),
+            ('array operations', FirestoreStore, array_operations),
+            ('array operations, cached reads', cached, array_operations),
+            ('member documents, cached reads', cached, member_documents),
+        ):
+            elapsed, rpcs, lost = asyncio.run(run(make_store, change, latency, args.changes, concurrency))
+            print(f"{label}, {concurrency} concurrent")
+            print(f"  throughput     {args.changes / elapsed:10.1f} changes/s")
+            print(f"  round trips    {rpcs / args.changes:10.2f} per change")
+            print(f"  lost changes   {lost:10d} of {args.changes}")
+
+
+if __name__ == '__main__':
+    main()
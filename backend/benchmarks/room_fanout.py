@@ -0,0 +1,119 @@
+"""
+Chat room fan-out latency for rooms of 2, 50 and 500 sockets.
+
+Compares the original broadcast loop (json.dumps and an awaited send_text per
+recipient, one after another) with RoomBroadcaster (encode once, per-connection
+queues and writers), and RoomBroadcaster with batched clients whose frames are
+coalesced into array frames. Each fake socket takes 0.2-1 ms per send and one
+socket per room is a slow mobile client taking 30 ms. Reported numbers are the
+delay from broadcast to delivery for the healthy sockets and the number of send
+calls per healthy socket.
+
+Usage (from the backend directory):
+    python benchmarks/room_fanout.py [--messages 20] [--coalesce-ms 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from trip_wizards.chat_rooms import RoomBroadcaster  # noqa: E402
+
+SLOW_SEND_SECONDS = 0.03
+
+
+class TimedWebSocket:
+    def __init__(self, send_seconds: float, delays, healthy: bool):
+        self.send_seconds = send_seconds
+        self.delays = delays
+        self.healthy = healthy
+        self.sends = 0
+
+    async def send_text(self, frame):
+        await asyncio.sleep(self.send_seconds)
+        self.sends += 1
+        if self.healthy:
+            decoded = json.loads(frame)
+            received_at = time.perf_counter()
+            for message in decoded if isinstance(decoded, list) else [decoded]:
+                self.delays.append(received_at - message['sent_at'])
+
+    async def close(self, code=1000):
+        pass
+
+
+def make_sockets(size, delays):
+    sockets = [TimedWebSocket(SLOW_SEND_SECONDS, delays, healthy=False)]
+    sockets += [
+        TimedWebSocket(random.uniform(0.0002, 0.001), delays, healthy=True)
+        for _ in range(size - 1)
+    ]
+    return sockets
+
+
+def sends_per_socket(sockets):
+    healthy = [socket.sends for socket in sockets if socket.healthy]
+    return sum(healthy) / len(healthy)
+
+
+async def sequential(size, messages, coalesce_window):
+    delays = []
+    sockets = make_sockets(size, delays)
+    for i in range(messages):
+        message = {'message': f'msg {i}', 'sent_at': time.perf_counter()}
+        for socket in sockets:
+            await socket.send_text(json.dumps(message))
+    return delays, sends_per_socket(sockets)
+
+
+async def broadcaster(size, messages, coalesce_window, batched=False):
+    delays = []
+    rooms = RoomBroadcaster(max_queue=messages + 1, coalesce_window=coalesce_window)
+    sockets = make_sockets(size, delays)
+    for socket in sockets:
+        rooms.join('trip_bench', socket, batched=batched)
+    for i in range(messages):
+        rooms.broadcast('trip_bench', {'message': f'msg {i}', 'sent_at': time.perf_counter()})
+        await asyncio.sleep(0.005)
+    expected = (size - 1) * messages
+    while len(delays) < expected:
+        await asyncio.sleep(0.001)
+    return delays, sends_per_socket(sockets)
+
+
+async def coalesced(size, messages, coalesce_window):
+    return await broadcaster(size, messages, coalesce_window, batched=True)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--coalesce-ms', type=float, default=10)
+    args = parser.parse_args()
+    window = args.coalesce_ms / 1000
+
+    runners = (('sequential', sequential), ('broadcaster', broadcaster), ('coalesced', coalesced))
+    print(f"{'room':>6} {'mode':<14} {'p50 ms':>10} {'p99 ms':>10} {'sends':>8}")
+    for size in (2, 50, 500):
+        for label, runner in runners:
+            delays, sends = asyncio.run(runner(size, args.messages, window))
+            print(
+                f"{size:>6} {label:<14} "
+                f"{percentile(delays, 50) * 1000:>10.2f} {percentile(delays, 99) * 1000:>10.2f} "
+                f"{sends:>8.1f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
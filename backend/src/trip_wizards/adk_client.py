@@ -0,0 +1,420 @@
+# Client for the ADK (AI Development Kit) travel concierge service
+# One pooled httpx.AsyncClient is created lazily and kept for the lifetime of
+# the app, so AI calls reuse warm keep-alive connections instead of paying a
+# TCP/TLS handshake per request. Every call has an overall deadline.
+# With a CircuitBreaker, calls fail fast with 'circuit_open' while ADK is
+# failing or has asked us to back off; transient failures are retried after
+# ADK's retry_after or a jittered backoff when that fits in the deadline, and
+# a slow answer can be hedged with a second request after hedge_after.
+# Response shapes follow tests/fixtures/adk_mock_responses.py. Streaming
+# endpoints return newline-delimited JSON chunks:
+#   {"type": "delta", "text": ...}    partial suggestion text
+#   {"type": "item", "item": {...}}   one structured element (place, day)
+#   {"type": "done", "response": {}}  the complete response
+#   {"type": "error", ...}            ADK error payload
+
+import asyncio
+import json
+import random
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from .circuit_breaker import CLOSED, CircuitBreaker
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # HTTP/2 needs the optional h2 package
+    HTTP2_AVAILABLE = False
+
+# HTTP status returned to our own clients for each ADK error code
+ERROR_STATUS = {
+    'rate_limit_exceeded': 429,
+    'invalid_input': 400,
+    'service_unavailable': 503,
+    'timeout': 504,
+    'circuit_open': 503,
+    'insufficient_credits': 402,
+}
+
+# Errors that say nothing about ADK's health, e.g. a bad prompt
+CLIENT_ERRORS = frozenset({'invalid_input'})
+# Errors worth another attempt after a pause
+RETRYABLE_ERRORS = frozenset({'service_unavailable', 'rate_limit_exceeded'})
+
+
+class AdkError(Exception):
+    """An ADK call that failed, carrying the ADK error payload when there is one."""
+
+    def __init__(self, error: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.error = error
+        self.message = message
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> int:
+        return ERROR_STATUS.get(self.error, 502)
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "AdkError":
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        return cls(
+            payload.get('error', 'service_unavailable'),
+            payload.get('message', f"ADK service returned status {response.status_code}"),
+            payload.get('retry_after_seconds'),
+        )
+
+
+class AdkClient:
+    """
+    Async ADK client holding one keep-alive connection pool.
+
+    Args:
+        base_url: ADK service root, e.g. http://localhost:8001
+        api_key: Sent as a bearer token when set
+        deadline: Default overall seconds allowed per call
+        connect_timeout: Seconds allowed to open a new connection
+        max_connections: Upper bound on concurrent connections to ADK
+        max_keepalive: Idle connections kept warm in the pool
+        http2: Use HTTP/2 when the h2 package is installed
+        health_url: URL probed by health(); defaults to {base_url}/health
+        transport: Optional httpx transport, used by tests to run in-process
+        breaker: Optional CircuitBreaker guarding every call
+        retries: Extra attempts for transient failures, within the deadline
+        backoff: Base seconds of the jittered exponential backoff between
+            attempts when ADK gives no retry_after
+        hedge_after: Seconds after which a second request is sent for a
+            suggestion or chat call still unanswered; None disables hedging
+        hedge_budget: Largest share of requests that may be hedges
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str] = None,
+        deadline: float = 10.0,
+        connect_timeout: float = 3.0,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        http2: bool = False,
+        health_url: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retries: int = 0,
+        backoff: float = 0.2,
+        hedge_after: Optional[float] = None,
+        hedge_budget: float = 0.1,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.health_url = health_url or f"{self.base_url}/health"
+        self.transport = transport
+        self.breaker = breaker
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.hedge_budget = hedge_budget
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retried = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared pooled client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            headers = {'Authorization': f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                http2=self.http2,
+                timeout=httpx.Timeout(self.deadline, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _admit(self) -> None:
+        """Raise 'circuit_open' at once while the breaker turns calls away."""
+        if self.breaker is None:
+            return
+        wait = self.breaker.acquire()
+        if wait:
+            raise AdkError('circuit_open', "ADK is unavailable; calls are paused", wait)
+
+    def _record(self, error: Optional[AdkError] = None) -> None:
+        if self.breaker is None:
+            return
+        if error is None or error.error in CLIENT_ERRORS:
+            self.breaker.record_success()
+        elif error.retry_after:
+            self.breaker.hold_off(error.retry_after)
+        else:
+            self.breaker.record_failure()
+
+    def _backoff(self, error: AdkError, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after error, or None not to retry."""
+        if attempt >= self.retries or error.error not in RETRYABLE_ERRORS:
+            return None
+        if error.retry_after:
+            return error.retry_after
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    async def _post(self, path: str, body: Dict[str, Any], deadline: Optional[float]) -> Dict[str, Any]:
+        deadline = deadline or self.deadline
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + deadline
+        attempt = 0
+        while True:
+            self._admit()
+            try:
+                result = await self._hedged(path, body, expires_at - loop.time())
+            except AdkError as e:
+                self._record(e)
+                pause = self._backoff(e, attempt)
+                if pause is None or loop.time() + pause >= expires_at:
+                    raise
+                attempt += 1
+                self.retried += 1
+                await asyncio.sleep(pause)
+                continue
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            self._record()
+            return result
+
+    async def _hedged(self, path: str, body: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        """
+        Send a request, and a duplicate if the first is slow; the first
+        success wins and the other request is cancelled.
+        """
+        if (
+            self.hedge_after is None
+            or self.hedge_after >= deadline
+            or (self.breaker is not None and self.breaker.state != CLOSED)
+            or self.hedges >= self.hedge_budget * self.requests
+        ):
+            return await self._send(path, body, deadline)
+        first = asyncio.create_task(self._send(path, body, deadline))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                self.hedges += 1
+                tasks.add(asyncio.create_task(self._send(path, body, deadline - self.hedge_after)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _send(self, path: str, body: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        self.requests += 1
+        try:
+            response = await asyncio.wait_for(self.client.post(path, json=body), deadline)
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            self.timeouts += 1
+            raise AdkError('timeout', f"ADK did not answer within {round(deadline, 3)}s")
+        except httpx.HTTPError as e:
+            self.failures += 1
+            raise AdkError('service_unavailable', f"ADK service unreachable: {e}")
+        if response.status_code >= 400:
+            self.failures += 1
+            raise AdkError.from_response(response)
+        return response.json()
+
+    async def suggest(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Ask ADK for trip suggestions.
+
+        Args:
+            prompt: Free-text request from the user
+            context: Optional trip context (destination, dates, preferences)
+            deadline: Overall seconds allowed for this call
+
+        Returns:
+            ADK suggestion response, e.g. ADK_SUGGESTION_RESPONSES['restaurant']
+
+        Raises:
+            AdkError: On timeouts, connection failures and ADK error responses
+        """
+        return await self._post('/v1/suggest', {'prompt': prompt, 'context': context or {}}, deadline)
+
+    async def chat(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Answer an @agent chat mention; returns an ADK_CHAT_RESPONSES shape."""
+        return await self._post('/v1/chat', {'message': message, 'context': context or {}}, deadline)
+
+    async def stream_suggest(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a suggestion as ADK produces it.
+
+        Args:
+            prompt: Free-text request from the user
+            context: Optional trip context (destination, dates, preferences)
+            deadline: Overall seconds allowed for the whole stream
+
+        Yields:
+            Chunk dicts, ending with a 'done' chunk carrying the full response
+
+        Raises:
+            AdkError: On timeouts, connection failures and ADK error responses,
+                or 'circuit_open' while the breaker turns calls away
+        """
+        self._admit()
+        try:
+            async for chunk in self._stream(prompt, context, deadline):
+                yield chunk
+        except AdkError as e:
+            self._record(e)
+            raise
+        except BaseException:
+            if self.breaker is not None:
+                self.breaker.release()
+            raise
+        self._record()
+
+    async def _stream(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]],
+        deadline: Optional[float],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        self.requests += 1
+        deadline = deadline or self.deadline
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + deadline
+        body = {'prompt': prompt, 'context': context or {}}
+        try:
+            async with self.client.stream('POST', '/v1/suggest/stream', json=body) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self.failures += 1
+                    raise AdkError.from_response(response)
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('type') == 'error':
+                        self.failures += 1
+                        raise AdkError(chunk.get('error', 'service_unavailable'), chunk.get('message', ''))
+                    yield chunk
+                    if loop.time() > expires_at:
+                        raise asyncio.TimeoutError
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            self.timeouts += 1
+            raise AdkError('timeout', f"ADK stream did not finish within {deadline}s")
+        except httpx.HTTPError as e:
+            self.failures += 1
+            raise AdkError('service_unavailable', f"ADK service unreachable: {e}")
+
+    async def health(self, deadline: float = 5.0) -> int:
+        """Probe the ADK health URL and return its HTTP status code."""
+        response = await asyncio.wait_for(self.client.get(self.health_url), deadline)
+        return response.status_code
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'retried': self.retried,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'http2': self.http2,
+            'pool_open': self._client is not None and not self._client.is_closed,
+            'circuit': self.breaker.stats() if self.breaker is not None else None,
+        }
+
+
+def item_text(item: Dict[str, Any]) -> str:
+    """One line of text for a structured element: a place, itinerary day or step."""
+    if 'name' in item:
+        return f"{item['name']}: {item.get('description', '')}".strip()
+    if 'day' in item:
+        return f"Day {item['day']} ({item.get('theme', '')}): " + ', '.join(
+            entry['title'] for entry in item.get('items', [])
+        )
+    if 'itinerary_item_id' in item:
+        return f"{item.get('recommended_time', '')} {item['itinerary_item_id']} ({item.get('reasoning', '')})"
+    return ''
+
+
+def chunk_text(chunk: Dict[str, Any]) -> str:
+    """Text to show for a streamed 'delta' or 'item' chunk."""
+    if chunk.get('type') == 'delta':
+        return chunk.get('text', '')
+    if chunk.get('type') == 'item':
+        return item_text(chunk.get('item', {}))
+    return ''
+
+
+def suggestion_text(response: Dict[str, Any]) -> str:
+    """
+    Flatten an ADK response into the single string /ai/suggest returns.
+
+    Args:
+        response: Any ADK suggestion or chat response shape
+
+    Returns:
+        Human-readable suggestion text
+    """
+    if response.get('suggestion'):
+        return response['suggestion']
+    if response.get('message'):
+        return response['message']
+    suggestions = response.get('suggestions') or []
+    if suggestions:
+        return 'I recommend ' + ' Also consider '.join(item_text(item) for item in suggestions)
+    itinerary = response.get('itinerary')
+    if itinerary:
+        days = [item_text(day) for day in itinerary.get('days', [])]
+        return f"{itinerary.get('trip_title', 'Your trip')}. " + ' '.join(days)
+    if response.get('optimized_order'):
+        return 'Suggested order: ' + '; '.join(item_text(step) for step in response['optimized_order'])
+    return 'No suggestion available right now.'
@@ -0,0 +1,103 @@
+# Batched AI suggestions
+# Runs many prompts for one trip concurrently under a limit, so a client
+# filling a week of itinerary slots makes one request instead of one per
+# slot. Every item succeeds or fails on its own; a failed item carries the
+# ADK error instead of failing the whole batch.
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from .adk_client import AdkError, suggestion_text
+
+
+class SuggestionBatches:
+    """
+    Runs suggestion batches with bounded concurrency per batch.
+
+    Args:
+        concurrency: Prompts of one batch sent to ADK at the same time
+        max_prompts: Largest batch accepted
+    """
+
+    def __init__(self, concurrency: int = 8, max_prompts: int = 50):
+        self.concurrency = concurrency
+        self.max_prompts = max_prompts
+        self.batches = 0
+        self.items = 0
+        self.failed_items = 0
+        self.in_flight = 0
+
+    async def _item(
+        self,
+        index: int,
+        prompt: str,
+        suggest: Callable[[str], Awaitable[Dict[str, Any]]],
+        semaphore: asyncio.Semaphore,
+    ) -> Dict[str, Any]:
+        async with semaphore:
+            self.in_flight += 1
+            try:
+                response = await suggest(prompt)
+            except AdkError as e:
+                self.failed_items += 1
+                return {
+                    'index': index,
+                    'prompt': prompt,
+                    'error': e.error,
+                    'message': e.message,
+                    'status': e.status_code,
+                }
+            finally:
+                self.in_flight -= 1
+        return {'index': index, 'prompt': prompt, 'suggestion': suggestion_text(response)}
+
+    async def as_completed(
+        self,
+        prompts: List[str],
+        suggest: Callable[[str], Awaitable[Dict[str, Any]]],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield item results as each prompt finishes.
+
+        Args:
+            prompts: Prompts sharing one trip context
+            suggest: Coroutine function returning the ADK response for a prompt
+
+        Yields:
+            {'index', 'prompt', 'suggestion'} or, for a failed item,
+            {'index', 'prompt', 'error', 'message', 'status'}
+        """
+        self.batches += 1
+        self.items += len(prompts)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [
+            asyncio.create_task(self._item(index, prompt, suggest, semaphore))
+            for index, prompt in enumerate(prompts)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client went away or an item raised; stop the rest
+            for task in tasks:
+                task.cancel()
+
+    async def ordered(
+        self,
+        prompts: List[str],
+        suggest: Callable[[str], Awaitable[Dict[str, Any]]],
+    ) -> List[Dict[str, Any]]:
+        """Run a batch and return item results in prompt order."""
+        results: List[Dict[str, Any]] = [{}] * len(prompts)
+        async for result in self.as_completed(prompts, suggest):
+            results[result['index']] = result
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'failed_items': self.failed_items,
+            'in_flight': self.in_flight,
+            'concurrency': self.concurrency,
+        }
@@ -0,0 +1,188 @@
+# Response cache for AI suggestions
+# Prompts are normalized (case, punctuation, whitespace, @agent prefix) and
+# combined with the trip's destination and dates into the cache key, so
+# near-identical questions from people on the same trip share one ADK call.
+# The local tier is an LRU bounded in bytes with a TTL; an optional shared
+# tier over Redis (or the RESP stand-in) lets workers reuse each other's
+# answers.
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .resp_client import RespConnection
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Reduce a prompt to the form used for cache keys.
+
+    "Restaurants near X??" and "@agent restaurants  near x" normalize to the
+    same string.
+    """
+    text = unicodedata.normalize('NFKC', prompt).lower()
+    text = text.replace('@agent', ' ')
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _date_part(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return str(value)[:10]
+
+
+def trip_context(trip: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The parts of a trip document that change what ADK should answer."""
+    if not trip:
+        return {}
+    return {
+        'destination': (trip.get('destination') or '').strip().lower() or None,
+        'startDate': _date_part(trip.get('startDate')),
+        'endDate': _date_part(trip.get('endDate')),
+    }
+
+
+class SuggestionCache:
+    """
+    Two-tier cache of ADK suggestion responses.
+
+    Args:
+        max_bytes: Upper bound on the encoded size of locally cached responses
+        ttl: Seconds a cached response stays valid
+        shared_url: Optional redis://host:port for the shared tier
+        shared_timeout: Seconds to wait for the shared tier before treating
+            it as a miss
+        key_prefix: Namespace for keys in the shared tier
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 8 * 1024 * 1024,
+        ttl: float = 900.0,
+        shared_url: Optional[str] = None,
+        shared_timeout: float = 0.05,
+        key_prefix: str = 'tripwizards:ai:',
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared_timeout = shared_timeout
+        self.key_prefix = key_prefix
+        self._shared = RespConnection.from_url(shared_url) if shared_url else None
+        # key -> (encoded response, expires at)
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_errors = 0
+
+    async def start(self) -> None:
+        if self._shared is not None:
+            try:
+                await self._shared.connect()
+            except OSError as e:
+                # The shared tier is an optimization; run local-only meanwhile
+                print(f"Failed to connect AI cache shared tier: {e}")
+
+    async def stop(self) -> None:
+        if self._shared is not None:
+            await self._shared.close()
+
+    def key(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        intent: Optional[str] = None,
+    ) -> str:
+        """
+        Cache key for a prompt in a trip context.
+
+        Args:
+            prompt: Raw prompt text
+            context: Trip context from trip_context()
+            intent: Set when the prompt asks for nothing beyond this intent,
+                so every such prompt shares one entry
+        """
+        subject = {'intent': intent} if intent else normalize_prompt(prompt)
+        material = json.dumps([subject, context or {}], sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response for a key, checking the local then the shared tier."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            encoded, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(encoded)
+            self._discard(key)
+            self.expirations += 1
+
+        if self._shared is not None:
+            encoded = await self._shared_call('GET', self.key_prefix + key)
+            if encoded:
+                self.shared_hits += 1
+                self._store(key, encoded)
+                return json.loads(encoded)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, response: Dict[str, Any]) -> None:
+        encoded = json.dumps(response).encode()
+        self._store(key, encoded)
+        if self._shared is not None:
+            await self._shared_call('SET', self.key_prefix + key, encoded, 'EX', max(1, int(self.ttl)))
+
+    def _store(self, key: str, encoded: bytes) -> None:
+        if len(encoded) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._discard(key)
+        self._entries[key] = (encoded, time.monotonic() + self.ttl)
+        self.size_bytes += len(encoded)
+        while self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def _discard(self, key: str) -> None:
+        encoded, _ = self._entries.pop(key)
+        self.size_bytes -= len(encoded)
+
+    async def _shared_call(self, *args: Any) -> Any:
+        try:
+            return await asyncio.wait_for(self._shared.execute(*args), self.shared_timeout)
+        except Exception as e:
+            self.shared_errors += 1
+            print(f"AI cache shared tier {args[0]} failed: {e!r}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.shared_hits) / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'shared_errors': self.shared_errors,
+        }
@@ -0,0 +1,275 @@
+# Intent routing for AI prompts
+# Keywords, synonyms and phrases for every intent ADK answers are compiled
+# once into a word trie with per-keyword weights. A prompt is matched in a
+# single pass over its words and routed to the best-scoring intent. Prompts
+# that are nothing but small talk (greetings, help, thanks) are answered
+# locally without ADK; small talk around a real question still goes to ADK.
+# Prompts that say nothing beyond their intent's head keyword ("any good
+# restaurants?") share one cache entry per intent and trip; any other
+# keyword ("sushi", "cheap") is part of the question, so those prompts are
+# cached by their own text.
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .ai_cache import normalize_prompt
+
+GENERAL = 'general'
+
+# intent -> {keyword or phrase: weight}; a trailing * matches any word with
+# that prefix, e.g. 'hik*' matches hike, hikes and hiking. The first keyword
+# is the intent's head keyword, the one that names the intent itself.
+INTENT_KEYWORDS: Dict[str, Dict[str, float]] = {
+    'restaurant': {
+        'restaurant*': 1.5, 'food*': 1.0, 'dinner*': 1.0, 'lunch*': 1.0, 'breakfast*': 1.0,
+        'brunch*': 1.0, 'eat': 1.0, 'eating': 1.0, 'eats': 1.0, 'dining': 1.2, 'cuisine*': 1.0,
+        'cafe*': 0.8, 'sushi': 0.8, 'ramen': 0.8, 'bar': 0.6, 'bars': 0.6,
+        'where to eat': 2.0, 'hungry': 1.0,
+    },
+    'activity': {
+        'activit*': 1.5, 'things to do': 2.0, 'hik*': 1.0, 'museum*': 1.0, 'tour*': 0.8,
+        'sightseeing': 1.0, 'attraction*': 1.0, 'outdoor*': 0.8, 'adventure*': 0.6,
+        'temple*': 0.6, 'shopping': 0.6, 'nightlife': 0.8,
+    },
+    'weather': {
+        'weather': 2.0, 'rain*': 1.2, 'temperature*': 1.2, 'forecast*': 1.5, 'umbrella*': 1.0,
+        'sunny': 1.0, 'cold': 0.8, 'hot': 0.8, 'climate': 1.2, 'what to pack': 1.2, 'packing': 0.6,
+    },
+    'budget': {
+        'budget*': 2.0, 'cost*': 1.2, 'price*': 1.0, 'how much': 1.2, 'expensive': 1.0,
+        'cheap*': 1.0, 'afford*': 1.0, 'spend*': 1.0, 'money': 1.0,
+    },
+    'transportation': {
+        'transport*': 2.0, 'train*': 1.2, 'subway*': 1.2, 'metro': 1.2, 'bus': 1.0, 'buses': 1.0,
+        'taxi*': 1.0, 'jr pass': 1.5, 'get around': 1.5, 'getting around': 1.5,
+        'airport transfer*': 1.5, 'car rental*': 1.2, 'commut*': 1.0,
+    },
+    'itinerary_optimization': {
+        'optimi*': 2.0, 'reorder*': 1.5, 'best order': 1.5, 'rearrange*': 1.5,
+        'schedul*': 0.6, 'itinerary': 0.5,
+    },
+    'itinerary_generation': {
+        'plan my trip': 2.5, 'plan our trip': 2.5, 'plan a trip': 2.5, 'generate*': 1.2,
+        'full itinerary': 2.5, 'day by day': 1.5, 'itinerary': 0.6, 'plan': 0.5,
+    },
+    # Small talk, answered without ADK; weighted low so a greeting in front
+    # of a real question does not win
+    'help': {
+        'hi': 0.5, 'hello': 0.5, 'hey': 0.5, 'help': 0.7,
+        'what can you do': 2.0, 'how does this work': 1.5,
+    },
+    'thanks': {
+        'thanks': 0.7, 'thank you': 0.7, 'thx': 0.7, 'cheers': 0.4,
+    },
+}
+
+# Filler words that do not change what a prompt asks for
+STOPWORDS = frozenset('''
+    a an the any some good great best nice top me us we i our my you your
+    please can could would should will do does is are was there here
+    for to in at on of near nearby around with about from this that these
+    what where which who when how recommend recommendation recommendations
+    suggest suggestion suggestions idea ideas place places spot spots option
+    options find show give tell need want like know let s agent be it have get go
+'''.split())
+
+
+def _help_answer(context: Dict[str, Any]) -> str:
+    destination = context.get('destination')
+    trip = f" for your trip to {destination.title()}" if destination else ''
+    return (
+        f"I can help{trip}: ask me for restaurants, activities, weather, budget "
+        "tips, getting around, or to plan or optimize your itinerary."
+    )
+
+
+# Intents answered on this server without calling ADK
+LOCAL_ANSWERS = {
+    'help': _help_answer,
+    'thanks': lambda context: "You're welcome! Happy travels.",
+}
+
+
+class Route:
+    """Where a prompt goes: the winning intent and how it was matched."""
+
+    def __init__(self, intent: str, score: float, matches: List[str], generic: bool, head_only: bool = False):
+        self.intent = intent
+        self.score = score
+        self.matches = matches
+        # Nothing in the prompt beyond filler words and intent keywords
+        self.generic = generic
+        # The only keyword matched was the intent's head keyword
+        self.head_only = head_only
+
+    @property
+    def cache_intent(self) -> Optional[str]:
+        """
+        Intent to key the cache by instead of the prompt text, if any.
+
+        Only prompts made of filler words and the head keyword share an
+        entry; "sushi" and "ramen" are both restaurant prompts but different
+        questions.
+        """
+        return self.intent if self.generic and self.head_only and self.intent != GENERAL else None
+
+    def local_response(self, context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        An ADK-shaped response for prompts answered locally, else None.
+
+        Only prompts made of small talk and filler words are answered here;
+        "help me book a hotel" also asks for something, so it goes to ADK.
+        """
+        answer = LOCAL_ANSWERS.get(self.intent)
+        if answer is None or not self.generic:
+            return None
+        return {'type': f'{self.intent}_answer', 'message': answer(context or {}), 'local': True}
+
+    def fallback_response(self, context: Optional[Dict[str, Any]] = None, retry_after: float = 0) -> Dict[str, Any]:
+        """An ADK-shaped stand-in answer for when ADK cannot be reached."""
+        destination = (context or {}).get('destination')
+        trip = f" about {destination.title()}" if destination else ''
+        wait = f" in about {math.ceil(retry_after)} seconds" if retry_after else ' shortly'
+        return {
+            'type': f'{self.intent}_fallback',
+            'message': f"The trip assistant is busy right now. Please ask again{trip}{wait}.",
+            'local': True,
+            'fallback': True,
+        }
+
+    def __repr__(self) -> str:
+        return f"Route({self.intent!r}, score={self.score}, generic={self.generic})"
+
+
+class _Node:
+    __slots__ = ('children', 'outputs')
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # (intent, weight, keyword, phrase length in words)
+        self.outputs: List[Tuple[str, float, str, int]] = []
+
+
+class IntentRouter:
+    """
+    Routes prompts to intents with a precompiled keyword trie.
+
+    Args:
+        keywords: intent -> {keyword or phrase: weight}; defaults to
+            INTENT_KEYWORDS
+        stopwords: Words ignored when deciding whether a prompt is generic
+    """
+
+    def __init__(
+        self,
+        keywords: Optional[Dict[str, Dict[str, float]]] = None,
+        stopwords: Iterable[str] = STOPWORDS,
+    ):
+        self.keywords = keywords or INTENT_KEYWORDS
+        self.stopwords = frozenset(stopwords)
+        self._heads = {intent: next(iter(table)) for intent, table in self.keywords.items() if table}
+        # Intents listed first win ties
+        self._priority = {intent: rank for rank, intent in enumerate(self.keywords)}
+        self._root = _Node()
+        self._stems: Dict[str, str] = {}
+        self._stem_lengths: List[int] = []
+        for intent, table in self.keywords.items():
+            for keyword, weight in table.items():
+                self._add(intent, keyword, weight)
+        self._stem_lengths = sorted({len(stem) for stem in self._stems}, reverse=True)
+        self._edges = self._collect_edges(self._root, set())
+        # word -> trie edges it can follow; prompts reuse a small vocabulary
+        self._word_symbols: Dict[str, Tuple[str, ...]] = {}
+        self.routed: Dict[str, int] = {}
+        self.local = 0
+
+    def _add(self, intent: str, keyword: str, weight: float) -> None:
+        node = self._root
+        words = keyword.split()
+        for word in words:
+            if word.endswith('*'):
+                stem = word[:-1]
+                word = self._stems.setdefault(stem, stem + '*')
+            node = node.children.setdefault(word, _Node())
+        node.outputs.append((intent, weight, keyword, len(words)))
+
+    def _collect_edges(self, node: _Node, edges: set) -> set:
+        for label, child in node.children.items():
+            edges.add(label)
+            self._collect_edges(child, edges)
+        return edges
+
+    def _symbols(self, word: str) -> Tuple[str, ...]:
+        """Trie edges a word can follow: itself and every stem it starts with."""
+        symbols = self._word_symbols.get(word)
+        if symbols is None:
+            candidates = [word] + [
+                self._stems[word[:length]]
+                for length in self._stem_lengths
+                if length <= len(word) and word[:length] in self._stems
+            ]
+            symbols = tuple(symbol for symbol in candidates if symbol in self._edges)
+            if len(self._word_symbols) >= 50000:
+                self._word_symbols.clear()
+            self._word_symbols[word] = symbols
+        return symbols
+
+    def route(self, prompt: str) -> Route:
+        """
+        Pick the intent for a prompt.
+
+        Args:
+            prompt: Raw prompt or chat message
+
+        Returns:
+            Route with the best-scoring intent, or 'general' when no keyword
+            matched
+        """
+        words = normalize_prompt(prompt).split()
+        symbols = [self._symbols(word) for word in words]
+        scores: Dict[str, float] = {}
+        matches: List[str] = []
+        covered = [False] * len(words)
+        # Walk the trie from every word; phrases are at most a few words, so
+        # this stays one pass over the prompt
+        for start in range(len(words)):
+            if not symbols[start]:
+                continue
+            frontier = [self._root]
+            position = start
+            while frontier and position < len(words):
+                next_frontier = []
+                for node in frontier:
+                    for symbol in symbols[position]:
+                        child = node.children.get(symbol)
+                        if child is None:
+                            continue
+                        next_frontier.append(child)
+                        for intent, weight, keyword, length in child.outputs:
+                            scores[intent] = scores.get(intent, 0.0) + weight
+                            matches.append(keyword)
+                            for index in range(start, start + length):
+                                covered[index] = True
+                frontier = next_frontier
+                position += 1
+
+        if scores:
+            intent = max(scores, key=lambda name: (scores[name], -self._priority[name]))
+            score = scores[intent]
+        else:
+            intent, score = GENERAL, 0.0
+        generic = all(
+            covered[index] or word in self.stopwords for index, word in enumerate(words)
+        )
+        head_only = bool(matches) and all(keyword == self._heads.get(intent) for keyword in matches)
+        self.routed[intent] = self.routed.get(intent, 0) + 1
+        if generic and intent in LOCAL_ANSWERS:
+            self.local += 1
+        return Route(intent, round(score, 3), matches, generic, head_only)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'keywords': sum(len(table) for table in self.keywords.values()),
+            'routed': dict(self.routed),
+            'local': self.local,
+        }
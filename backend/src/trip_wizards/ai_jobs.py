@@ -0,0 +1,364 @@
+# Background jobs for long AI calls
+# Full itinerary generation takes over a second, so it runs as a job instead
+# of holding an HTTP request open: submitting returns a job ID at once, a
+# bounded pool of workers runs queued jobs, and results are kept for a TTL.
+# Clients poll for the result or get it pushed to the trip's chat room.
+# Jobs live in memory; with a FirestoreJobStore they are also written to
+# Firestore, so any worker can answer a poll and queued jobs survive a restart.
+# Persisted jobs carry a claim: the worker that owns the job and when its lease
+# runs out. A worker claims a job in a transaction before running it and keeps
+# renewing the lease while it runs, so a starting worker only recovers jobs
+# whose owner stopped renewing, and never runs one a live worker is running.
+
+import asyncio
+import time
+import uuid
+from collections import deque
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .firestore_store import FirestoreStore
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    """Raised when max_pending jobs are already waiting."""
+
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of a job returned to clients and pushed to its trip room."""
+    return {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'trip_id': job['tripId'],
+        'result': job['result'],
+        'error': job['error'],
+        'submitted_at': job['submittedAt'],
+        'finished_at': job['finishedAt'],
+    }
+
+
+class FirestoreJobStore:
+    """
+    Persists jobs as documents in a Firestore collection.
+
+    Finished jobs carry an `expireAt` timestamp; configure a Firestore TTL
+    policy on that field to have expired jobs deleted.
+    """
+
+    def __init__(self, store: FirestoreStore, collection: str = 'ai_jobs'):
+        self.store = store
+        self.collection = collection
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        data = dict(job)
+        if job.get('expiresAt'):
+            data['expireAt'] = datetime.fromtimestamp(job['expiresAt'], tz=timezone.utc)
+        await self.store.set(self.collection, job['id'], data)
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = await self.store.get(self.collection, job_id)
+        if data is not None:
+            data.pop('expireAt', None)
+        return data
+
+    async def abandoned(self, now: float) -> List[Dict[str, Any]]:
+        """Jobs queued or running whose owner's lease ran out before now."""
+        jobs = []
+        for status in (QUEUED, RUNNING):
+            for _, data in await self.store.query(self.collection, 'status', '==', status):
+                if (data.get('leaseExpiresAt') or 0) >= now:
+                    continue
+                data.pop('expireAt', None)
+                jobs.append(data)
+        return sorted(jobs, key=lambda job: job['submittedAt'])
+
+    async def claim(self, job_id: str, worker_id: str, lease_ttl: float) -> Optional[Dict[str, Any]]:
+        """
+        Mark a job running for this worker, unless another worker holds it.
+
+        Returns:
+            The claimed job, or None if it is finished, gone, or claimed by
+            another worker whose lease has not run out
+        """
+        job_ref = self.store.document(self.collection, job_id)
+
+        async def take(transaction) -> Optional[Dict[str, Any]]:
+            # Read in the transaction so two workers cannot both take the job
+            data = await self.store.get(self.collection, job_id, transaction=transaction)
+            now = time.time()
+            if data is None or data['status'] not in (QUEUED, RUNNING):
+                return None
+            if data.get('workerId') not in (None, worker_id) and (data.get('leaseExpiresAt') or 0) >= now:
+                return None
+            claim = {'status': RUNNING, 'workerId': worker_id, 'leaseExpiresAt': now + lease_ttl}
+            transaction.update(job_ref, claim)
+            return {**data, **claim}
+
+        job = await self.store.run_transaction(take)
+        self.store.forget(self.collection, job_id)
+        if job is not None:
+            job.pop('expireAt', None)
+        return job
+
+    async def renew(self, job_id: str, lease_expires_at: float) -> None:
+        await self.store.update(self.collection, job_id, {'leaseExpiresAt': lease_expires_at})
+
+    async def release(self, job_id: str, worker_id: str) -> None:
+        """End this worker's claim on an unfinished job so others recover it at once."""
+        job_ref = self.store.document(self.collection, job_id)
+
+        async def drop(transaction) -> None:
+            data = await self.store.get(self.collection, job_id, transaction=transaction)
+            if data is not None and data['status'] in (QUEUED, RUNNING) and data.get('workerId') == worker_id:
+                transaction.update(job_ref, {'leaseExpiresAt': 0})
+
+        await self.store.run_transaction(drop)
+        self.store.forget(self.collection, job_id)
+
+
+class JobQueue:
+    """
+    In-process job queue with a bounded worker pool.
+
+    Args:
+        handlers: Job kind -> coroutine function taking the job payload and
+            returning its result
+        workers: Jobs run concurrently
+        max_pending: Jobs allowed to wait before submit() refuses more
+        result_ttl: Seconds a finished job is kept
+        store: Optional FirestoreJobStore for persistence across workers
+        on_finish: Optional coroutine called with each finished job
+        lease_ttl: Seconds a persisted job stays claimed by this worker
+            without a renewal; renewed every third of that while it runs
+        worker_id: Name of this worker in job claims
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]],
+        workers: int = 4,
+        max_pending: int = 100,
+        result_ttl: float = 600.0,
+        store: Optional[FirestoreJobStore] = None,
+        on_finish: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        lease_ttl: float = 60.0,
+        worker_id: Optional[str] = None,
+    ):
+        self.handlers = handlers
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.store = store
+        self.on_finish = on_finish
+        self.lease_ttl = lease_ttl
+        self.worker_id = worker_id or uuid.uuid4().hex[:12]
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # (expires at, job ID) in finishing order, for dropping expired jobs
+        self._expiry: Deque[Tuple[float, str]] = deque()
+        self._tasks: List[asyncio.Task] = []
+        self._saving = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.running = 0
+        self.recovered = 0
+        self.skipped = 0
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        if self.store is not None:
+            await self._recover()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if self.store is not None:
+            self._tasks.append(asyncio.create_task(self._watch()))
+
+    async def stop(self) -> None:
+        """Stop the workers and release this worker's unfinished persisted jobs."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        if self.store is None:
+            return
+        for job in list(self._jobs.values()):
+            if job['status'] not in (QUEUED, RUNNING):
+                continue
+            try:
+                await self.store.release(job['id'], self.worker_id)
+            except Exception as e:
+                print(f"Failed to release AI job {job['id']}: {e}")
+
+    async def submit(self, kind: str, payload: Dict[str, Any], trip_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a job.
+
+        Args:
+            kind: One of the handler kinds
+            payload: Passed to the handler
+            trip_id: Trip whose chat room is told when the job finishes
+
+        Returns:
+            The job, with status 'queued'
+
+        Raises:
+            ValueError: If no handler is registered for kind
+            JobQueueFull: If max_pending jobs are already waiting
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self._expire()
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'status': QUEUED,
+            'tripId': trip_id,
+            'payload': payload,
+            'result': None,
+            'error': None,
+            'submittedAt': time.time(),
+            'finishedAt': None,
+            'expiresAt': None,
+            # Held by this worker while it waits in the local queue
+            'workerId': self.worker_id,
+            'leaseExpiresAt': time.time() + self.lease_ttl,
+        }
+        # Jobs still being saved hold their place in the queue
+        if self._queue.qsize() + self._saving >= self._queue.maxsize > 0:
+            self.rejected += 1
+            raise JobQueueFull(f"{self._queue.maxsize} jobs already waiting")
+        self._jobs[job['id']] = job
+        self.submitted += 1
+        # Saved before it is queued, so a worker claiming it finds it stored
+        self._saving += 1
+        try:
+            await self._save(job)
+        finally:
+            self._saving -= 1
+        self._queue.put_nowait(job['id'])
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job by ID, from memory or the persistent store; None once expired."""
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = await self.store.load(job_id)
+        if job is None or (job['expiresAt'] and job['expiresAt'] < time.time()):
+            return None
+        return job
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._expiry and self._expiry[0][0] < now:
+            _, job_id = self._expiry.popleft()
+            self._jobs.pop(job_id, None)
+
+    async def _work(self) -> None:
+        while True:
+            job = self._jobs.get(await self._queue.get())
+            if job is None or not await self._claim(job):
+                continue
+            job['status'] = RUNNING
+            self.running += 1
+            renewing = asyncio.create_task(self._keep_lease(job)) if self.store is not None else None
+            try:
+                job['result'] = await self.handlers[job['kind']](job['payload'])
+                job['status'] = DONE
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job['status'] = FAILED
+                job['error'] = {'error': getattr(e, 'error', type(e).__name__), 'message': str(e)}
+                self.failed += 1
+            finally:
+                self.running -= 1
+                if renewing is not None:
+                    renewing.cancel()
+            job['finishedAt'] = time.time()
+            job['expiresAt'] = job['finishedAt'] + self.result_ttl
+            self._expiry.append((job['expiresAt'], job['id']))
+            await self._save(job)
+            if self.on_finish is not None:
+                try:
+                    await self.on_finish(job)
+                except Exception as e:
+                    print(f"Failed to announce AI job {job['id']}: {e}")
+
+    async def _recover(self) -> None:
+        """Queue persisted jobs whose owner stopped renewing its claim."""
+        try:
+            for job in await self.store.abandoned(time.time()):
+                if job['id'] in self._jobs:
+                    continue
+                self._queue.put_nowait(job['id'])
+                self._jobs[job['id']] = job
+                self.recovered += 1
+        except asyncio.QueueFull:
+            pass
+        except Exception as e:
+            print(f"Failed to recover AI jobs: {e}")
+
+    async def _watch(self) -> None:
+        # Workers that crash never release their jobs; pick them up here
+        while True:
+            await asyncio.sleep(self.lease_ttl)
+            await self._recover()
+
+    async def _claim(self, job: Dict[str, Any]) -> bool:
+        """Take a persisted job for this worker; in-memory jobs are always ours."""
+        if self.store is None:
+            return True
+        try:
+            claimed = await self.store.claim(job['id'], self.worker_id, self.lease_ttl)
+        except Exception as e:
+            # Left queued in Firestore; recovered once its lease runs out
+            print(f"Failed to claim AI job {job['id']}: {e}")
+            claimed = None
+        if claimed is None:
+            # Finished or running elsewhere: answer polls from the store
+            self._jobs.pop(job['id'], None)
+            self.skipped += 1
+            return False
+        job.update(claimed)
+        return True
+
+    async def _keep_lease(self, job: Dict[str, Any]) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            job['leaseExpiresAt'] = time.time() + self.lease_ttl
+            try:
+                await self.store.renew(job['id'], job['leaseExpiresAt'])
+            except Exception as e:
+                print(f"Failed to renew AI job {job['id']}: {e}")
+
+    async def _save(self, job: Dict[str, Any]) -> None:
+        if self.store is not None:
+            try:
+                await self.store.save(job)
+            except Exception as e:
+                print(f"Failed to store AI job {job['id']}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': self._queue.qsize(),
+            'running': self.running,
+            'retained': len(self._jobs),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'recovered': self.recovered,
+            'skipped': self.skipped,
+            'workers': self.workers if self._tasks else 0,
+        }
@@ -0,0 +1,221 @@
+# Streaming AI suggestions
+# Relays ADK's chunked suggestion stream as it is produced, so the first words
+# reach the user within tens of milliseconds instead of after the whole
+# answer. Chunks go out as Server-Sent Events from /ai/suggest/stream, or as
+# agent frames in a trip chat room. Cached answers are replayed at once as a
+# single 'done' chunk, and completed streams fill the cache. Only streams that
+# reach ADK are charged a credit.
+
+import asyncio
+import json
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from .adk_client import AdkClient, AdkError, chunk_text, suggestion_text
+from .ai_cache import SuggestionCache
+from .ai_intents import IntentRouter
+from .credit_ledger import CreditLedger
+
+# Chat frame type a client sends to ask the agent, and the type of the
+# unsequenced frames carrying the partial reply
+AGENT_REQUEST = 'agent'
+AGENT_CHUNK = 'agent_chunk'
+AGENT_SENDER = 'agent'
+
+AGENT_UNAVAILABLE = "Sorry, the trip agent is unavailable right now. Please try again shortly."
+AGENT_NO_CREDITS = "Sorry, you are out of AI credits. Upgrade your plan to keep asking the agent."
+
+
+async def suggestion_stream(
+    adk: AdkClient,
+    cache: SuggestionCache,
+    prompt: str,
+    context: Optional[Dict[str, Any]] = None,
+    router: Optional[IntentRouter] = None,
+    credits: Optional[CreditLedger] = None,
+    user_id: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream suggestion chunks, serving the cache first and filling it on completion.
+
+    With a router, small talk is answered locally, generic prompts share
+    their intent's cache entry, and a stand-in answer is given while the
+    ADK circuit is open. With a ledger and user_id, one credit is debited
+    just before ADK is called and refunded if the call fails.
+
+    Yields:
+        ADK chunk dicts; the last one is {'type': 'done', 'response': ...,
+        'cached': bool}
+
+    Raises:
+        AdkError: When ADK fails before the stream completes, or
+            InsufficientCredits when the user cannot pay for the call; any
+            other error is raised as is, after the credit is refunded
+    """
+    intent = None
+    if router is not None:
+        route = router.route(prompt)
+        local = route.local_response(context)
+        if local is not None:
+            yield {'type': 'done', 'response': local, 'cached': False}
+            return
+        intent = route.cache_intent
+    key = cache.key(prompt, context, intent)
+    cached = await cache.get(key)
+    if cached is not None:
+        yield {'type': 'done', 'response': cached, 'cached': True}
+        return
+    charged = False
+    try:
+        if credits is not None and user_id:
+            await credits.debit(user_id)
+            charged = True
+        async for chunk in adk.stream_suggest(prompt, context):
+            if chunk.get('type') == 'done':
+                await cache.set(key, chunk['response'])
+                chunk = {**chunk, 'cached': False}
+            yield chunk
+    except Exception as e:
+        # Failed calls and stand-in answers are free, whatever the failure
+        if charged:
+            credits.refund(user_id)
+        if router is None or not isinstance(e, AdkError) or e.error != 'circuit_open':
+            raise
+        # ADK is paused, so nothing was streamed; answer with a stand-in
+        yield {'type': 'done', 'response': route.fallback_response(context, e.retry_after), 'cached': False}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def sse_suggestion_events(chunks: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """
+    Render a suggestion stream as Server-Sent Events.
+
+    Events:
+        delta  {"text": str}                        partial suggestion text
+        item   {"text": str, "item": {...}}         one place, day or step
+        done   {"suggestion": str, "cached": bool}  the complete suggestion
+        error  {"error": str, "message": str, "status": int}
+    """
+    # A comment goes out first so headers and the first byte leave at once,
+    # even while ADK is still working on the first chunk
+    yield ': stream open\n\n'
+    try:
+        async for chunk in chunks:
+            kind = chunk.get('type')
+            if kind == 'delta':
+                yield sse_event('delta', {'text': chunk_text(chunk)})
+            elif kind == 'item':
+                yield sse_event('item', {'text': chunk_text(chunk), 'item': chunk['item']})
+            elif kind == 'done':
+                yield sse_event('done', {
+                    'suggestion': suggestion_text(chunk['response']),
+                    'cached': chunk.get('cached', False),
+                })
+    except AdkError as e:
+        yield sse_event('error', {'error': e.error, 'message': e.message, 'status': e.status_code})
+
+
+class AgentReplies:
+    """
+    Streams agent replies into trip chat rooms.
+
+    Each reply runs as a background task. Partial text goes to the room as
+    unsequenced 'agent_chunk' frames sharing a stream_id; the complete reply
+    is then posted as an ordinary, persisted chat message with isAgent set
+    and the same stream_id, which clients use to replace the partial text.
+
+    Args:
+        stream: Called as stream(prompt, context, user_id) to get the chunk
+            iterator; user_id is who pays for the reply, if anyone
+        publish_chunk: Coroutine publishing an unsequenced frame to a room
+        post_message: Coroutine sequencing, persisting and publishing a message
+    """
+
+    def __init__(
+        self,
+        stream: Callable[[str, Dict[str, Any], Optional[str]], AsyncIterator[Dict[str, Any]]],
+        publish_chunk: Callable[[str, str], Awaitable[None]],
+        post_message: Callable[[str, Dict[str, Any]], Awaitable[None]],
+    ):
+        self.stream = stream
+        self.publish_chunk = publish_chunk
+        self.post_message = post_message
+        self._tasks: Set[asyncio.Task] = set()
+        self.replies = 0
+        self.chunks = 0
+        self.failures = 0
+
+    def start(
+        self,
+        trip_id: str,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None,
+    ) -> str:
+        """Begin streaming a reply to a room; returns the reply's stream_id."""
+        stream_id = uuid.uuid4().hex
+        task = asyncio.create_task(self._reply(trip_id, prompt, context or {}, user_id, stream_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return stream_id
+
+    async def _reply(
+        self, trip_id: str, prompt: str, context: Dict[str, Any], user_id: Optional[str], stream_id: str
+    ) -> None:
+        message = None
+        try:
+            async for chunk in self.stream(prompt, context, user_id):
+                if chunk.get('type') == 'done':
+                    message = suggestion_text(chunk['response'])
+                    continue
+                text = chunk_text(chunk)
+                if not text:
+                    continue
+                self.chunks += 1
+                await self.publish_chunk(trip_id, json.dumps({
+                    'type': AGENT_CHUNK,
+                    'stream_id': stream_id,
+                    'text': text,
+                    'sender': AGENT_SENDER,
+                    'isAgent': True,
+                    'trip_id': trip_id,
+                }))
+        except Exception as e:
+            # Whatever went wrong, the room still gets a reply to replace
+            # the partial text
+            self.failures += 1
+            message = None
+            if isinstance(e, AdkError) and e.error == 'insufficient_credits':
+                message = AGENT_NO_CREDITS
+            print(f"Failed to stream agent reply for trip {trip_id}: {e!r}")
+        if message is None:
+            message = AGENT_UNAVAILABLE
+        self.replies += 1
+        try:
+            await self.post_message(trip_id, {
+                'message': message,
+                'sender': AGENT_SENDER,
+                'isAgent': True,
+                'stream_id': stream_id,
+            })
+        except Exception as e:
+            print(f"Failed to post agent reply for trip {trip_id}: {e}")
+
+    async def stop(self) -> None:
+        """Cancel replies still streaming."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'streaming': len(self._tasks),
+            'replies': self.replies,
+            'chunks': self.chunks,
+            'failures': self.failures,
+        }
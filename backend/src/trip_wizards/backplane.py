@@ -0,0 +1,222 @@
+# Pub/sub backplane for trip chat rooms
+# Chat frames are published to the backplane and every worker that has local
+# sockets in the room delivers them, so users connected to different uvicorn
+# workers or replicas see each other's messages. The backplane also hands out
+# per-trip sequence numbers so that every worker orders a room the same way.
+# Ephemeral frames (typing, presence, cursors) are published with seq 0 and
+# are neither persisted nor buffered for resume. While Redis is unreachable a
+# worker numbers and delivers its rooms locally, continuing after the highest
+# sequence it has seen, so chat keeps working for sockets on that worker.
+
+import asyncio
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from .resp_client import RespConnection, parse_url, encode_command, read_reply
+
+# Called with (trip_id, seq, encoded frame) for every frame a worker should
+# deliver; seq is 0 for unsequenced ephemeral frames
+DeliverCallback = Callable[[str, int, str], None]
+
+# Returns the highest sequence number already persisted for a trip
+LastSequenceLoader = Callable[[str], Awaitable[int]]
+
+
+async def _no_history(trip_id: str) -> int:
+    return 0
+
+
+class Backplane(ABC):
+    """Interface for fanning room frames out across processes."""
+
+    def __init__(self, deliver: DeliverCallback, last_sequence: LastSequenceLoader = _no_history):
+        self.deliver = deliver
+        self.last_sequence = last_sequence
+        self.published = 0
+        self.delivered = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def subscribe(self, trip_id: str) -> None:
+        """Start receiving frames for a room that has local connections."""
+
+    async def unsubscribe(self, trip_id: str) -> None:
+        """Stop receiving frames for a room with no local connections left."""
+
+    @abstractmethod
+    async def next_sequence(self, trip_id: str) -> int:
+        """Allocate the next sequence number for a trip's chat."""
+
+    @abstractmethod
+    async def publish(self, trip_id: str, seq: int, frame: str) -> None:
+        """Send a frame to every worker with sockets in the room."""
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'published': self.published,
+            'delivered': self.delivered,
+            'failed': self.failed,
+        }
+
+
+class InProcessBackplane(Backplane):
+    """Single-process backplane: publishing delivers directly to local rooms."""
+
+    def __init__(self, deliver: DeliverCallback, last_sequence: LastSequenceLoader = _no_history):
+        super().__init__(deliver, last_sequence)
+        self._sequences: Dict[str, int] = {}
+
+    async def next_sequence(self, trip_id: str) -> int:
+        if trip_id not in self._sequences:
+            # Continue after persisted history when a room is first used
+            last = await self.last_sequence(trip_id)
+            self._sequences.setdefault(trip_id, last)
+        self._sequences[trip_id] += 1
+        return self._sequences[trip_id]
+
+    async def publish(self, trip_id: str, seq: int, frame: str) -> None:
+        self.published += 1
+        self.delivered += 1
+        self.deliver(trip_id, seq, frame)
+
+
+class RedisBackplane(Backplane):
+    """
+    Backplane over Redis pub/sub (or the local RESP stand-in in resp_broker).
+
+    One pipelined connection publishes, a second one stays in SUBSCRIBE mode
+    for the rooms this worker currently hosts and reconnects on failure.
+    """
+
+    CHANNEL_PREFIX = 'tripwizards:chat:'
+    SEQUENCE_PREFIX = 'tripwizards:chatseq:'
+
+    def __init__(self, deliver: DeliverCallback, url: str, last_sequence: LastSequenceLoader = _no_history):
+        super().__init__(deliver, last_sequence)
+        self.host, self.port = parse_url(url)
+        self._publisher = RespConnection(self.host, self.port)
+        self._channels: Set[str] = set()
+        self._seeded: Set[str] = set()
+        # Highest sequence allocated or delivered here, per trip, for local
+        # numbering while Redis is unreachable
+        self._last_seen: Dict[str, int] = {}
+        self._sub_writer: Optional[asyncio.StreamWriter] = None
+        self._sub_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self._publisher.connect()
+        self._sub_task = asyncio.create_task(self._subscriber_loop())
+
+    async def stop(self) -> None:
+        if self._sub_task is not None:
+            self._sub_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sub_task
+            self._sub_task = None
+        await self._publisher.close()
+
+    async def subscribe(self, trip_id: str) -> None:
+        channel = self.CHANNEL_PREFIX + trip_id
+        if channel in self._channels:
+            return
+        self._channels.add(channel)
+        if self._sub_writer is not None:
+            self._sub_writer.write(encode_command('SUBSCRIBE', channel))
+
+    async def unsubscribe(self, trip_id: str) -> None:
+        channel = self.CHANNEL_PREFIX + trip_id
+        if channel not in self._channels:
+            return
+        self._channels.discard(channel)
+        if self._sub_writer is not None:
+            self._sub_writer.write(encode_command('UNSUBSCRIBE', channel))
+
+    async def next_sequence(self, trip_id: str) -> int:
+        key = self.SEQUENCE_PREFIX + trip_id
+        try:
+            if trip_id not in self._seeded:
+                # NX keeps whichever worker seeded the counter first
+                last = await self.last_sequence(trip_id)
+                await self._publisher.execute('SET', key, last, 'NX')
+                self._seeded.add(trip_id)
+            seq = await self._publisher.execute('INCR', key)
+        except (ConnectionError, OSError) as e:
+            # publish() will deliver locally too, so number the room here
+            print(f"Failed to allocate sequence from backplane: {e}")
+            self.failed += 1
+            if trip_id not in self._last_seen:
+                self._last_seen[trip_id] = await self.last_sequence(trip_id)
+            seq = self._last_seen[trip_id] + 1
+        self._seen(trip_id, seq)
+        return seq
+
+    def _seen(self, trip_id: str, seq: int) -> None:
+        if seq > self._last_seen.get(trip_id, 0):
+            self._last_seen[trip_id] = seq
+
+    async def publish(self, trip_id: str, seq: int, frame: str) -> None:
+        try:
+            await self._publisher.execute(
+                'PUBLISH', self.CHANNEL_PREFIX + trip_id, f"{seq} {frame}"
+            )
+            self.published += 1
+        except Exception as e:
+            # Keep the local room working while the backplane is unreachable
+            print(f"Failed to publish to backplane: {e}")
+            self.failed += 1
+            self.deliver(trip_id, seq, frame)
+
+    async def _subscriber_loop(self) -> None:
+        backoff = 0.5
+        while True:
+            try:
+                reader, self._sub_writer = await asyncio.open_connection(self.host, self.port)
+                if self._channels:
+                    self._sub_writer.write(encode_command('SUBSCRIBE', *self._channels))
+                backoff = 0.5
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and reply and reply[0] == b'message':
+                        channel = reply[1].decode()
+                        seq, frame = reply[2].decode().split(' ', 1)
+                        trip_id = channel[len(self.CHANNEL_PREFIX):]
+                        self._seen(trip_id, int(seq))
+                        self.delivered += 1
+                        self.deliver(trip_id, int(seq), frame)
+            except asyncio.CancelledError:
+                if self._sub_writer is not None:
+                    self._sub_writer.close()
+                raise
+            except (ConnectionError, asyncio.IncompleteReadError, OSError) as e:
+                print(f"Backplane subscriber disconnected: {e}")
+                self._sub_writer = None
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+
+
+def create_backplane(
+    url: Optional[str],
+    deliver: DeliverCallback,
+    last_sequence: LastSequenceLoader = _no_history,
+) -> Backplane:
+    """
+    Build the backplane configured by URL.
+
+    Args:
+        url: None or 'memory://' for a single process, 'redis://host:port'
+            for Redis or the local RESP stand-in
+        deliver: Callback delivering a frame to this worker's local room
+        last_sequence: Loader for the last persisted sequence of a trip, used
+            to seed counters the first time a room is seen
+    """
+    if not url or url.startswith('memory://'):
+        return InProcessBackplane(deliver, last_sequence)
+    if url.startswith('redis://'):
+        return RedisBackplane(deliver, url, last_sequence)
+    raise ValueError(f"Unsupported backplane URL: {url}")
@@ -0,0 +1,162 @@
+# Wire formats for /ws/chat/{trip_id}
+# JSON text frames are the default. Clients can negotiate a compact binary
+# MessagePack format (optionally deflated per message) through the
+# Sec-WebSocket-Protocol header. Binary frames use short keys, integer
+# millisecond timestamps and omit trip_id, which is implied by the socket.
+
+import json
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # Binary subprotocols are only offered when installed
+    msgpack = None
+
+JSON_PROTOCOL = 'tripwizards.json.v1'
+MSGPACK_PROTOCOL = 'tripwizards.msgpack.v1'
+MSGPACK_DEFLATE_PROTOCOL = 'tripwizards.msgpack-deflate.v1'
+
+# Long field name -> key used in binary frames
+COMPACT_KEYS = {
+    'message': 'm',
+    'sender': 's',
+    'isAgent': 'a',
+    'timestamp': 't',
+    'seq': 'q',
+}
+EXPANDED_KEYS = {short: long for long, short in COMPACT_KEYS.items()}
+
+
+def iso_to_millis(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+class ChatCodec(ABC):
+    """Encodes chat messages for one negotiated subprotocol."""
+
+    protocol: Optional[str] = None
+    binary = False
+
+    @abstractmethod
+    def encode(self, message: Dict[str, Any]) -> Union[str, bytes]:
+        """Serialize a chat message for the wire."""
+
+    @abstractmethod
+    def decode(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        """Parse a received frame into a chat message."""
+
+    def encode_frame(self, frame: str) -> Union[str, bytes]:
+        """Convert a JSON frame (the internal format) to this codec's format."""
+        return self.encode(json.loads(frame))
+
+    @abstractmethod
+    def encode_batch(self, frames: List[str]) -> Union[str, bytes]:
+        """Combine several JSON frames into one array frame, oldest first."""
+
+
+class JsonCodec(ChatCodec):
+    protocol = JSON_PROTOCOL
+
+    def encode(self, message: Dict[str, Any]) -> str:
+        return json.dumps(message)
+
+    def decode(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        return json.loads(data)
+
+    def encode_frame(self, frame: str) -> str:
+        return frame
+
+    def encode_batch(self, frames: List[str]) -> str:
+        # Frames are already JSON objects, so the array is plain concatenation
+        return '[' + ','.join(frames) + ']'
+
+
+class MsgpackCodec(ChatCodec):
+    protocol = MSGPACK_PROTOCOL
+    binary = True
+
+    def compact(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        compact = {}
+        for key, value in message.items():
+            if key == 'trip_id':
+                continue
+            if key == 'timestamp':
+                value = iso_to_millis(value)
+            compact[COMPACT_KEYS.get(key, key)] = value
+        return compact
+
+    def pack(self, value: Any) -> bytes:
+        return msgpack.packb(value)
+
+    def unpack(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        return self.pack(self.compact(message))
+
+    def encode_batch(self, frames: List[str]) -> bytes:
+        return self.pack([self.compact(json.loads(frame)) for frame in frames])
+
+    def decode(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        if isinstance(data, str):
+            return json.loads(data)
+        compact = self.unpack(data)
+        return {EXPANDED_KEYS.get(key, key): value for key, value in compact.items()}
+
+
+class DeflateMsgpackCodec(MsgpackCodec):
+    """MessagePack compressed with raw deflate, one independent stream per message."""
+
+    protocol = MSGPACK_DEFLATE_PROTOCOL
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def pack(self, value: Any) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(super().pack(value)) + compressor.flush()
+
+    def unpack(self, data: bytes) -> Any:
+        return super().unpack(zlib.decompress(data, -zlib.MAX_WBITS))
+
+
+JSON_CODEC = JsonCodec()
+
+
+def supported_codecs() -> Dict[str, ChatCodec]:
+    codecs: Dict[str, ChatCodec] = {JSON_PROTOCOL: JSON_CODEC}
+    if msgpack is not None:
+        codecs[MSGPACK_PROTOCOL] = MsgpackCodec()
+        codecs[MSGPACK_DEFLATE_PROTOCOL] = DeflateMsgpackCodec()
+    return codecs
+
+
+CODECS = supported_codecs()
+
+
+def negotiate(requested: List[str]) -> ChatCodec:
+    """
+    Pick the first requested subprotocol the server supports.
+
+    Args:
+        requested: Subprotocols offered by the client, in preference order
+
+    Returns:
+        The matching codec, or plain JSON when nothing matches
+    """
+    for protocol in requested:
+        codec = CODECS.get(protocol)
+        if codec is not None:
+            return codec
+    return JSON_CODEC
@@ -0,0 +1,116 @@
+# Application-level heartbeats for chat sockets
+# Clients that connect with ?heartbeat=true receive a {"type": "ping"} frame
+# every interval and must send something back (a {"type": "pong"} will do)
+# within the idle timeout, or the socket is closed and its room slot freed.
+# Other connections may only read, so silence says nothing about them; they
+# are left to protocol-level pings, which the server sends (uvicorn's
+# --ws-ping-interval and --ws-ping-timeout) and client WebSocket libraries
+# answer on their own. A half-open socket misses those pongs and its receive
+# ends in a disconnect, freeing its queue and presence entries. One task per
+# worker sends the application pings; the idle timeout is enforced on each
+# heartbeat socket's receive.
+
+import asyncio
+import time
+from contextlib import suppress
+from typing import Any, Dict, Optional
+
+from .chat_rooms import RoomBroadcaster, RoomConnection
+
+PING = 'ping'
+PONG = 'pong'
+
+# "Going Away" close code sent to clients reaped for inactivity
+IDLE_CLOSE_CODE = 1001
+
+
+class IdleConnection(Exception):
+    """Raised when a connection stays silent past its idle timeout."""
+
+
+class HeartbeatMonitor:
+    """
+    Pings heartbeat connections and reaps the ones that stop answering.
+
+    Args:
+        rooms: The worker's room registry
+        interval: Seconds between pings
+        idle_timeout: Seconds of silence after which a heartbeat connection
+            is closed; should be a few intervals
+    """
+
+    def __init__(
+        self,
+        rooms: RoomBroadcaster,
+        interval: float = 20.0,
+        idle_timeout: float = 60.0,
+    ):
+        self.rooms = rooms
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.pings_sent = 0
+        self.reaped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.ping_all()
+
+    def ping_all(self) -> int:
+        """Queue a ping for every heartbeat connection. Returns how many."""
+        message = {'type': PING, 'ts': int(time.time() * 1000)}
+        encoded = {}
+        sent = 0
+        for connection in self.rooms.connections():
+            if not connection.heartbeat or connection.closed:
+                continue
+            if connection.codec not in encoded:
+                encoded[connection.codec] = connection.codec.encode(message)
+            # A full queue means frames are still flowing; skip this round
+            if connection.offer(encoded[connection.codec]):
+                sent += 1
+        self.pings_sent += sent
+        return sent
+
+    async def receive(self, websocket, connection: RoomConnection) -> Dict[str, Any]:
+        """
+        Wait for the socket's next ASGI message and mark the connection alive.
+
+        Connections without heartbeats wait as long as it takes; a dead one
+        is detected by protocol-level pings.
+
+        Raises:
+            IdleConnection: If a heartbeat connection sends nothing within
+                the idle timeout
+        """
+        if not connection.heartbeat:
+            received = await websocket.receive()
+            connection.touch()
+            return received
+        try:
+            received = await asyncio.wait_for(websocket.receive(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            self.reaped += 1
+            raise IdleConnection(f"No frames for {self.idle_timeout}s")
+        connection.touch()
+        return received
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'interval': self.interval,
+            'idle_timeout': self.idle_timeout,
+            'pings_sent': self.pings_sent,
+            'reaped': self.reaped,
+        }
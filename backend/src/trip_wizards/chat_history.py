@@ -0,0 +1,219 @@
+# Recent chat history per trip room
+# Each room keeps a ring buffer of its latest frames keyed by sequence number so
+# that reconnecting clients can resume with ?resume_from=<seq> without a
+# Firestore read. Firestore is only queried when the buffer has been overrun
+# or the room has no buffer yet on this worker. A client further behind than
+# max_replay frames gets a 'history_gap' frame first, naming the sequence
+# numbers it will not be sent, so it can reload the history itself.
+
+import asyncio
+import json
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# (sequence number, encoded frame)
+HistoryEntry = Tuple[int, str]
+
+# Frame type sent ahead of a capped replay
+HISTORY_GAP = 'history_gap'
+
+# Optional frame fields persisted with a message and restored on replay
+FRAME_FIELDS = ('type', 'stream_id')
+
+
+class RoomHistory:
+    """
+    Ring buffer of the most recent frames of one room, ordered by sequence.
+
+    `floor` is the sequence number after which every frame is buffered, or
+    None while nothing is known about the room's history yet.
+    """
+
+    def __init__(self, capacity: int):
+        self.entries: Deque[HistoryEntry] = deque()
+        self.capacity = capacity
+        self.floor: Optional[int] = None
+
+    def record(self, seq: int, frame: str) -> None:
+        if self.floor is None:
+            # Everything from the first live frame onwards will be buffered
+            self.floor = seq - 1
+        if seq <= self.floor:
+            return
+        if not self.entries or seq > self.entries[-1][0]:
+            self.entries.append((seq, frame))
+        else:
+            # Frames published by different workers may arrive slightly out of order
+            index = len(self.entries)
+            while index > 0 and self.entries[index - 1][0] > seq:
+                index -= 1
+            if index > 0 and self.entries[index - 1][0] == seq:
+                return
+            self.entries.insert(index, (seq, frame))
+        while len(self.entries) > self.capacity:
+            self.floor = self.entries.popleft()[0]
+
+    def covers(self, resume_from: int) -> bool:
+        """True if every frame after resume_from is still buffered."""
+        return self.floor is not None and resume_from >= self.floor
+
+    def after(self, resume_from: int) -> List[HistoryEntry]:
+        return [entry for entry in self.entries if entry[0] > resume_from]
+
+
+def frame_from_document(data: Dict[str, Any]) -> str:
+    """Rebuild a chat frame from a persisted chat_messages document."""
+    frame = {
+        'message': data.get('message', ''),
+        'sender': data.get('sender', 'unknown'),
+        'isAgent': data.get('isAgent', False),
+        'timestamp': data.get('timestamp'),
+        'trip_id': data.get('tripId'),
+        'seq': data.get('seq'),
+    }
+    for field in FRAME_FIELDS:
+        if field in data:
+            frame[field] = data[field]
+    return json.dumps(frame)
+
+
+def gap_frame(trip_id: str, first: int, last: int) -> str:
+    """Frame telling a resuming client that frames first..last are not replayed."""
+    return json.dumps({'type': HISTORY_GAP, 'trip_id': trip_id, 'from': first, 'through': last})
+
+
+class ChatHistory:
+    """
+    Ring buffers for the rooms hosted by this worker.
+
+    A room's buffer starts when the room gets its first local connection and
+    is kept current from live deliveries. If a client asks to resume before
+    anything is known about the room, the buffer is seeded from Firestore once
+    (concurrent resumes share that read). Buffers are dropped when a room has
+    no local connections left, since the worker stops receiving its frames.
+    """
+
+    def __init__(
+        self,
+        client,
+        collection: str = 'chat_messages',
+        capacity: int = 200,
+        max_replay: int = 1000,
+    ):
+        self.client = client
+        self.collection = collection
+        self.capacity = capacity
+        self.max_replay = max_replay
+        self.rooms: Dict[str, RoomHistory] = {}
+        self._seeding: Dict[str, asyncio.Task] = {}
+        self.buffer_hits = 0
+        self.firestore_reads = 0
+        self.gaps = 0
+
+    def track(self, trip_id: str) -> None:
+        if trip_id not in self.rooms:
+            self.rooms[trip_id] = RoomHistory(self.capacity)
+
+    def record(self, trip_id: str, seq: int, frame: str) -> None:
+        room = self.rooms.get(trip_id)
+        if room is not None:
+            room.record(seq, frame)
+
+    def forget(self, trip_id: str) -> None:
+        self.rooms.pop(trip_id, None)
+
+    async def replay(self, trip_id: str, resume_from: int) -> List[HistoryEntry]:
+        """
+        Frames a client missed after sequence number resume_from.
+
+        Returns:
+            List of (seq, frame) tuples in sequence order. When more than
+            max_replay frames were missed, the oldest are left out and the
+            list starts with a 'history_gap' frame carrying the sequence
+            number of the last frame left out
+        """
+        room = self.rooms.get(trip_id)
+        if room is None or room.floor is None:
+            room = await self._seed(trip_id)
+        if room.covers(resume_from):
+            self.buffer_hits += 1
+            return room.after(resume_from)
+        # Client is further behind than the buffer reaches: read only the gap
+        # below the buffer, capped at max_replay frames
+        floor = room.floor
+        buffered = room.after(floor)
+        start = max(resume_from, floor - self.max_replay)
+        missing = await self._query(trip_id, after=start, through=floor, limit=floor - start)
+        if start <= resume_from:
+            return missing + buffered
+        self.gaps += 1
+        return [(start, gap_frame(trip_id, resume_from + 1, start))] + missing + buffered
+
+    async def last_sequence(self, trip_id: str) -> int:
+        """Highest persisted sequence number for a trip (0 if none)."""
+        entries = await self._query(trip_id, descending=True, limit=1)
+        return entries[0][0] if entries else 0
+
+    async def _seed(self, trip_id: str) -> RoomHistory:
+        task = self._seeding.get(trip_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_recent(trip_id))
+            self._seeding[trip_id] = task
+            task.add_done_callback(lambda _: self._seeding.pop(trip_id, None))
+        return await asyncio.shield(task)
+
+    async def _load_recent(self, trip_id: str) -> RoomHistory:
+        entries = await self._query(trip_id, descending=True, limit=self.capacity)
+        # Frames delivered live while the read was in flight are kept as well
+        room = self.rooms.setdefault(trip_id, RoomHistory(self.capacity))
+        if len(entries) < self.capacity:
+            floor = 0
+        else:
+            floor = entries[-1][0] - 1
+        # Only extend the buffer backwards if the loaded frames reach the live ones
+        if room.floor is None or (entries and entries[0][0] >= room.floor):
+            room.floor = floor
+        for seq, frame in reversed(entries):
+            room.record(seq, frame)
+        return room
+
+    async def _query(
+        self,
+        trip_id: str,
+        after: Optional[int] = None,
+        through: Optional[int] = None,
+        descending: bool = False,
+        limit: int = 200,
+    ) -> List[HistoryEntry]:
+        self.firestore_reads += 1
+        query = self.client.collection(self.collection).where('tripId', '==', trip_id)
+        if after is not None:
+            query = query.where('seq', '>', after)
+        if through is not None:
+            query = query.where('seq', '<=', through)
+        query = query.order_by('seq', direction='DESCENDING' if descending else 'ASCENDING')
+        query = query.limit(limit)
+        entries = []
+        async for doc in query.stream():
+            data = doc.to_dict()
+            entries.append((data['seq'], frame_from_document(data)))
+        return entries
+
+    def room_stats(self) -> Dict[str, Dict[str, int]]:
+        """Buffered frames and approximate bytes per room."""
+        return {
+            trip_id: {
+                'frames': len(room.entries),
+                'bytes': sum(len(frame) for _, frame in room.entries),
+            }
+            for trip_id, room in self.rooms.items()
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'rooms': len(self.rooms),
+            'buffered_frames': sum(len(room.entries) for room in self.rooms.values()),
+            'buffer_hits': self.buffer_hits,
+            'firestore_reads': self.firestore_reads,
+            'gaps': self.gaps,
+        }
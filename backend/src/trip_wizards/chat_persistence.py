@@ -0,0 +1,131 @@
+# Write-behind persistence for chat messages
+# Messages from every room are queued in memory and written to Firestore in
+# WriteBatches, so broadcasting a message never waits on a Firestore round trip.
+
+import asyncio
+from contextlib import suppress
+from typing import Any, Dict, List, Optional
+
+# Firestore rejects batches with more than 500 writes
+MAX_FIRESTORE_BATCH = 500
+
+
+class ChatWriteBehind:
+    """
+    Bounded write-behind queue that flushes chat messages in batches.
+
+    A batch is committed as soon as `max_batch` messages are queued or
+    `flush_interval` seconds after its first message arrived, whichever comes
+    first. When `max_pending` messages are already waiting, new messages are
+    dropped and counted instead of growing memory without bound.
+    """
+
+    def __init__(
+        self,
+        client,
+        collection: str = 'chat_messages',
+        max_batch: int = MAX_FIRESTORE_BATCH,
+        flush_interval: float = 0.05,
+        max_pending: int = 10000,
+    ):
+        self.client = client
+        self.collection = collection
+        self.max_batch = min(max_batch, MAX_FIRESTORE_BATCH)
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self._collecting: List[Dict[str, Any]] = []
+        self._commit_task: Optional[asyncio.Future] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def enqueue(self, message: Dict[str, Any]) -> bool:
+        """
+        Queue a message for persistence without waiting.
+
+        Returns:
+            True if queued, False if the queue was full and the message dropped
+        """
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background flusher and write everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._commit_task is not None:
+            await self._commit_task
+            self._commit_task = None
+
+        remaining, self._collecting = self._collecting, []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for start in range(0, len(remaining), self.max_batch):
+            await self._commit(remaining[start:start + self.max_batch])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': self._queue.qsize() + len(self._collecting),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._collecting = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(self._collecting) < self.max_batch:
+                if not self._queue.empty():
+                    self._collecting.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._collecting.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._collecting = self._collecting, []
+            # Shield the commit so that stop() can wait for it instead of
+            # abandoning a half-sent batch
+            self._commit_task = asyncio.ensure_future(self._commit(batch))
+            await asyncio.shield(self._commit_task)
+            self._commit_task = None
+
+    async def _commit(self, messages: List[Dict[str, Any]]) -> None:
+        if not messages:
+            return
+        batch = self.client.batch()
+        collection = self.client.collection(self.collection)
+        for message in messages:
+            batch.set(collection.document(), message)
+        try:
+            await batch.commit()
+        except Exception as e:
+            self.failed += len(messages)
+            print(f"Failed to store {len(messages)} chat messages: {e}")
+            return
+        self.written += len(messages)
+        self.batches += 1
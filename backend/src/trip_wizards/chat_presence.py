@@ -0,0 +1,169 @@
+# Ephemeral chat signals: typing indicators, presence and cursors
+# These frames are never persisted or sequenced. Updates are throttled per
+# sender and kind: the first one goes out at once, later ones within the
+# interval collapse into a single trailing update carrying the latest state.
+# Every worker keeps the latest state per user for the rooms it hosts, which
+# backs the cheap presence snapshot. Sockets are counted per user, so a user
+# is only announced offline when their last socket on this worker closes.
+
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+TYPING = 'typing'
+PRESENCE = 'presence'
+CURSOR = 'cursor'
+EPHEMERAL_TYPES = frozenset({TYPING, PRESENCE, CURSOR})
+
+# Presence state that removes a user from the snapshot
+OFFLINE = 'offline'
+
+# Called with (trip_id, encoded frame) to fan an ephemeral frame out
+PublishCallback = Callable[[str, str], Awaitable[None]]
+
+
+def is_ephemeral(message: Dict[str, Any]) -> bool:
+    return message.get('type') in EPHEMERAL_TYPES
+
+
+class PresenceTracker:
+    """
+    Throttles outgoing ephemeral frames and keeps the latest state per user.
+
+    Args:
+        publish: Coroutine fanning a frame out to the room (on every worker)
+        min_interval: Minimum seconds between frames of one kind per sender
+        ttl: Seconds after which a user's state is left out of snapshots
+    """
+
+    def __init__(self, publish: PublishCallback, min_interval: float = 0.25, ttl: float = 60.0):
+        self.publish = publish
+        self.min_interval = min_interval
+        self.ttl = ttl
+        # trip_id -> sender -> {kind: state, 'updated_at': monotonic seconds}
+        self.rooms: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.published = 0
+        self.collapsed = 0
+        self._last_sent: Dict[Tuple[str, str, str], float] = {}
+        self._pending: Dict[Tuple[str, str, str], Any] = {}
+        self._flushes: Set[asyncio.Task] = set()
+        # (trip_id, sender) -> local sockets speaking for the sender
+        self._connections: Dict[Tuple[str, str], int] = {}
+
+    async def update(self, trip_id: str, sender: str, kind: str, state: Any) -> bool:
+        """
+        Record a sender's new state and publish it, subject to throttling.
+
+        Returns:
+            True if a frame was published now, False if it was collapsed into
+            a trailing update
+        """
+        key = (trip_id, sender, kind)
+        now = time.monotonic()
+        wait = self._last_sent.get(key, float('-inf')) + self.min_interval - now
+        if wait <= 0 and key not in self._pending:
+            self._last_sent[key] = now
+            await self._publish(trip_id, sender, kind, state)
+            return True
+
+        if key in self._pending:
+            self.collapsed += 1
+        else:
+            task = asyncio.create_task(self._flush_later(key, max(wait, 0)))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        self._pending[key] = state
+        return False
+
+    def join(self, trip_id: str, sender: str) -> None:
+        """Count a socket that started speaking for a sender."""
+        key = (trip_id, sender)
+        self._connections[key] = self._connections.get(key, 0) + 1
+
+    async def leave(self, trip_id: str, sender: str) -> bool:
+        """
+        Uncount a closed socket of a sender, and announce the sender offline,
+        bypassing the throttle, once no socket on this worker speaks for them.
+
+        Returns:
+            True if the sender was announced offline
+        """
+        remaining = self._connections.pop((trip_id, sender), 0) - 1
+        if remaining > 0:
+            self._connections[(trip_id, sender)] = remaining
+            return False
+        for key in [key for key in self._pending if key[:2] == (trip_id, sender)]:
+            del self._pending[key]
+        for key in [key for key in self._last_sent if key[:2] == (trip_id, sender)]:
+            del self._last_sent[key]
+        await self._publish(trip_id, sender, PRESENCE, OFFLINE)
+        return True
+
+    async def _flush_later(self, key: Tuple[str, str, str], delay: float) -> None:
+        await asyncio.sleep(delay)
+        if key not in self._pending:
+            return
+        state = self._pending.pop(key)
+        self._last_sent[key] = time.monotonic()
+        trip_id, sender, kind = key
+        try:
+            await self._publish(trip_id, sender, kind, state)
+        except Exception as e:
+            print(f"Failed to publish {kind} update: {e}")
+
+    async def _publish(self, trip_id: str, sender: str, kind: str, state: Any) -> None:
+        self.published += 1
+        await self.publish(trip_id, json.dumps({
+            'type': kind,
+            'sender': sender,
+            'state': state,
+            'trip_id': trip_id,
+            'timestamp': datetime.utcnow().isoformat(),
+        }))
+
+    def track(self, trip_id: str) -> None:
+        """Start keeping state for a room that has local connections."""
+        self.rooms.setdefault(trip_id, {})
+
+    def observe(self, trip_id: str, frame: str) -> None:
+        """Apply an ephemeral frame delivered to this worker to the room state."""
+        users = self.rooms.get(trip_id)
+        if users is None:
+            return
+        message = json.loads(frame)
+        sender = message.get('sender')
+        # Other unsequenced frames, such as streamed agent replies, share the path
+        if sender is None or not is_ephemeral(message):
+            return
+        if message['type'] == PRESENCE and message.get('state') == OFFLINE:
+            users.pop(sender, None)
+            return
+        user = users.setdefault(sender, {})
+        user[message['type']] = message.get('state')
+        user['updated_at'] = time.monotonic()
+
+    def snapshot(self, trip_id: str) -> Dict[str, Dict[str, Any]]:
+        """Latest typing, presence and cursor state per user in a room."""
+        cutoff = time.monotonic() - self.ttl
+        return {
+            sender: {kind: state for kind, state in user.items() if kind != 'updated_at'}
+            for sender, user in self.rooms.get(trip_id, {}).items()
+            if user['updated_at'] >= cutoff
+        }
+
+    def forget(self, trip_id: str) -> None:
+        self.rooms.pop(trip_id, None)
+        for key in [key for key in self._last_sent if key[0] == trip_id]:
+            del self._last_sent[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'rooms': len(self.rooms),
+            'users': sum(len(users) for users in self.rooms.values()),
+            'connections': sum(self._connections.values()),
+            'published': self.published,
+            'collapsed': self.collapsed,
+            'pending': len(self._pending),
+        }
@@ -0,0 +1,200 @@
+# Rate limits on inbound chat messages
+# Every persisted chat message costs a Firestore write and an N-way fan-out,
+# so each socket and each trip room draws from a token bucket. What happens
+# when a bucket is empty is configurable: drop the frame, delay reading from
+# the socket (pushing back on the client through TCP), or close the socket.
+# Trip buckets are per worker. Ephemeral frames (typing, presence, cursors)
+# draw from a separate, larger per-socket bucket and are simply dropped over
+# the limit; a socket may also only speak for a few distinct senders.
+
+import asyncio
+import time
+from typing import Dict, Set
+
+DROP = 'drop'
+DELAY = 'delay'
+CLOSE = 'close'
+
+# "Policy Violation" close code sent to clients that exceed the limit
+RATE_LIMIT_CLOSE_CODE = 1008
+
+
+class RateLimitExceeded(Exception):
+    """Raised under the CLOSE policy when a socket exceeds its limit."""
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously.
+
+    Args:
+        rate: Tokens added per second
+        burst: Bucket capacity, i.e. how many frames may arrive back to back
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class ChatRateLimiter:
+    """
+    Token buckets per socket and per trip with a shared overflow policy.
+
+    Args:
+        socket_rate: Messages per second allowed on one socket
+        socket_burst: Messages one socket may send back to back
+        trip_rate: Messages per second allowed in one trip room on this worker
+        trip_burst: Messages a trip room may receive back to back
+        policy: DROP, DELAY or CLOSE
+        max_delay: Under DELAY, frames that would wait longer are dropped
+        ephemeral_rate: Ephemeral frames per second allowed on one socket
+        ephemeral_burst: Ephemeral frames one socket may send back to back
+        max_senders: Distinct senders one socket may send ephemeral frames for
+    """
+
+    def __init__(
+        self,
+        socket_rate: float = 5.0,
+        socket_burst: float = 10.0,
+        trip_rate: float = 50.0,
+        trip_burst: float = 100.0,
+        policy: str = DELAY,
+        max_delay: float = 2.0,
+        ephemeral_rate: float = 20.0,
+        ephemeral_burst: float = 40.0,
+        max_senders: int = 4,
+    ):
+        if policy not in (DROP, DELAY, CLOSE):
+            raise ValueError(f"Unknown rate limit policy: {policy}")
+        self.socket_rate = socket_rate
+        self.socket_burst = socket_burst
+        self.trip_rate = trip_rate
+        self.trip_burst = trip_burst
+        self.policy = policy
+        self.max_delay = max_delay
+        self.ephemeral_rate = ephemeral_rate
+        self.ephemeral_burst = ephemeral_burst
+        self.max_senders = max_senders
+        self.trips: Dict[str, TokenBucket] = {}
+        self.allowed = 0
+        self.limited = 0
+        self.dropped = 0
+        self.delayed = 0
+        self.closed = 0
+        self.ephemeral_dropped = 0
+
+    def socket_bucket(self) -> TokenBucket:
+        """Bucket for a newly accepted socket."""
+        return TokenBucket(self.socket_rate, self.socket_burst)
+
+    def ephemeral_bucket(self) -> TokenBucket:
+        """Bucket for a newly accepted socket's ephemeral frames."""
+        return TokenBucket(self.ephemeral_rate, self.ephemeral_burst)
+
+    def admit_ephemeral(self, bucket: TokenBucket, senders: Set[str], sender: str) -> bool:
+        """
+        Take a token for an ephemeral frame and record its sender.
+
+        Ephemeral frames are never delayed: a stale typing indicator is
+        worthless, so over the limit they are dropped (or, under the CLOSE
+        policy, the socket is closed). Frames for a new sender are dropped
+        once the socket already speaks for max_senders senders.
+
+        Args:
+            bucket: The sending socket's ephemeral bucket
+            senders: Senders seen on the socket so far, updated in place
+            sender: Sender named in the frame
+
+        Returns:
+            True if the frame may be processed, False if it was dropped
+
+        Raises:
+            RateLimitExceeded: Under the CLOSE policy when the bucket is empty
+        """
+        if sender not in senders and len(senders) >= self.max_senders:
+            self.ephemeral_dropped += 1
+            return False
+        if bucket.wait_time(time.monotonic()) > 0:
+            if self.policy == CLOSE:
+                self.closed += 1
+                raise RateLimitExceeded("Ephemeral frame rate limit exceeded")
+            self.ephemeral_dropped += 1
+            return False
+        bucket.take()
+        senders.add(sender)
+        return True
+
+    async def admit(self, trip_id: str, bucket: TokenBucket) -> bool:
+        """
+        Take a token from the socket's and the trip's bucket.
+
+        Args:
+            trip_id: Trip room the message is for
+            bucket: The sending socket's bucket
+
+        Returns:
+            True if the message may be processed, False if it was dropped
+
+        Raises:
+            RateLimitExceeded: Under the CLOSE policy when a bucket is empty
+        """
+        trip_bucket = self.trips.get(trip_id)
+        if trip_bucket is None:
+            trip_bucket = self.trips[trip_id] = TokenBucket(self.trip_rate, self.trip_burst)
+
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            wait = max(bucket.wait_time(now), trip_bucket.wait_time(now))
+            if wait <= 0:
+                bucket.take()
+                trip_bucket.take()
+                self.allowed += 1
+                return True
+            if not waited:
+                self.limited += 1
+            if self.policy == CLOSE:
+                self.closed += 1
+                raise RateLimitExceeded(f"Chat rate limit exceeded for trip {trip_id}")
+            if self.policy == DROP or waited + wait > self.max_delay:
+                self.dropped += 1
+                return False
+            if not waited:
+                self.delayed += 1
+            # Not reading from the socket meanwhile pushes back on the client
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def forget(self, trip_id: str) -> None:
+        self.trips.pop(trip_id, None)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'policy': self.policy,
+            'socket_rate': self.socket_rate,
+            'trip_rate': self.trip_rate,
+            'trips': len(self.trips),
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'dropped': self.dropped,
+            'delayed': self.delayed,
+            'closed': self.closed,
+            'ephemeral_dropped': self.ephemeral_dropped,
+        }
@@ -0,0 +1,374 @@
+# Trip chat room fan-out
+# Each message is encoded once per room (and once per negotiated wire format)
+# and handed to every connection's bounded outbound queue; a per-connection
+# writer task does the actual send, so one slow client never holds up the
+# rest of the room.
+# Connections that opt in to batching can also have frames that arrive close
+# together coalesced into one array frame, trading a few milliseconds of
+# latency for fewer sends in busy rooms.
+
+import asyncio
+import json
+import time
+from contextlib import suppress
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from .chat_codec import JSON_CODEC, ChatCodec
+
+# Slow consumer policies applied when a connection's outbound queue is full
+EVICT = 'evict'
+DROP_OLDEST = 'drop_oldest'
+
+# "Try Again Later" close code sent to evicted clients
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class FrameBatch:
+    """Frames coalesced for a room, encoded once per wire format on first send."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.entries: List[Tuple[Optional[int], str]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self._encoded: Dict[ChatCodec, Union[str, bytes]] = {}
+
+    @property
+    def last_seq(self) -> Optional[int]:
+        return self.entries[-1][0] if self.entries else None
+
+    @property
+    def size(self) -> int:
+        return sum(len(frame) for _, frame in self.entries)
+
+    def encode_for(self, codec: ChatCodec, skip_through: int = 0) -> Optional[Union[str, bytes]]:
+        """
+        Build the frame for one connection.
+
+        Args:
+            codec: Wire format of the connection
+            skip_through: Frames up to this sequence number were already
+                replayed to the connection and are left out
+
+        Returns:
+            A single message frame, an array frame, or None if nothing is left
+        """
+        frames = [frame for seq, frame in self.entries if seq is None or seq > skip_through]
+        if not frames:
+            return None
+        if len(frames) == 1:
+            return codec.encode_frame(frames[0])
+        if len(frames) < len(self.entries):
+            return codec.encode_batch(frames)
+        if codec not in self._encoded:
+            self._encoded[codec] = codec.encode_batch(frames)
+        return self._encoded[codec]
+
+
+def frame_size(frame: Union[str, bytes, FrameBatch]) -> int:
+    """Approximate bytes held by a queued frame."""
+    if isinstance(frame, FrameBatch):
+        return frame.size
+    return len(frame)
+
+
+class RoomConnection:
+    """A WebSocket in a room together with its outbound queue and writer task."""
+
+    def __init__(
+        self,
+        websocket,
+        trip_id: str,
+        max_queue: int,
+        codec: ChatCodec = JSON_CODEC,
+        batched: bool = False,
+        heartbeat: bool = False,
+    ):
+        self.websocket = websocket
+        self.trip_id = trip_id
+        self.codec = codec
+        self.batched = batched
+        self.heartbeat = heartbeat
+        self.connected_at = time.monotonic()
+        self.last_seen = self.connected_at
+        self.queued_bytes = 0
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.skip_through = 0
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self, skip_through: int = 0) -> None:
+        """
+        Start sending queued frames.
+
+        Args:
+            skip_through: Frames with a sequence number up to this value were
+                already sent as history and are skipped
+        """
+        self.skip_through = skip_through
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def offer(self, frame: Union[str, bytes, FrameBatch], seq: Optional[int] = None) -> bool:
+        """Queue a frame without waiting. Returns False if the queue is full."""
+        try:
+            self.queue.put_nowait((seq, frame))
+        except asyncio.QueueFull:
+            return False
+        self.queued_bytes += frame_size(frame)
+        return True
+
+    def drop_oldest(self) -> None:
+        with suppress(asyncio.QueueEmpty):
+            _, frame = self.queue.get_nowait()
+            self.queued_bytes -= frame_size(frame)
+            self.dropped += 1
+
+    def touch(self) -> None:
+        """Record that the client sent something and is still alive."""
+        self.last_seen = time.monotonic()
+
+    async def _write_loop(self) -> None:
+        while True:
+            seq, frame = await self.queue.get()
+            self.queued_bytes -= frame_size(frame)
+            if isinstance(frame, FrameBatch):
+                frame = frame.encode_for(self.codec, self.skip_through)
+                if frame is None:
+                    continue
+            elif seq is not None and seq <= self.skip_through:
+                continue
+            try:
+                await self.send(frame)
+            except Exception as e:
+                print(f"Failed to send message to connection: {e}")
+                self.closed = True
+                return
+            self.sent += 1
+
+    async def send(self, frame: Union[str, bytes]) -> None:
+        if isinstance(frame, bytes):
+            await self.websocket.send_bytes(frame)
+        else:
+            await self.websocket.send_text(frame)
+
+    async def close(self, code: Optional[int] = None) -> None:
+        """Stop the writer and, when a code is given, close the socket."""
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._writer
+        if code is not None:
+            with suppress(Exception):
+                await asyncio.wait_for(self.websocket.close(code=code), timeout=1.0)
+
+
+class RoomBroadcaster:
+    """
+    Registry of trip chat rooms for this worker.
+
+    Args:
+        max_queue: Outbound frames buffered per connection before the
+            slow consumer policy applies
+        slow_consumer_policy: EVICT closes the connection with code 1013,
+            DROP_OLDEST discards its oldest queued frame
+        coalesce_window: Seconds of quiet after a frame before a batch is
+            flushed to batched connections; 0 disables coalescing
+        coalesce_max_delay: Upper bound on how long the first frame of a
+            batch waits, however busy the room is
+        coalesce_max_frames: Batch size that triggers an immediate flush
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 64,
+        slow_consumer_policy: str = EVICT,
+        coalesce_window: float = 0.0,
+        coalesce_max_delay: float = 0.05,
+        coalesce_max_frames: int = 64,
+    ):
+        if slow_consumer_policy not in (EVICT, DROP_OLDEST):
+            raise ValueError(f"Unknown slow consumer policy: {slow_consumer_policy}")
+        self.max_queue = max_queue
+        self.slow_consumer_policy = slow_consumer_policy
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_delay = max(coalesce_max_delay, coalesce_window)
+        self.coalesce_max_frames = coalesce_max_frames
+        self.rooms: Dict[str, Set[RoomConnection]] = {}
+        self.evicted = 0
+        self.broadcasts = 0
+        self.batches = 0
+        self.coalesced_frames = 0
+        self._pending: Dict[str, FrameBatch] = {}
+        self._closing: Set[asyncio.Task] = set()
+
+    def join(
+        self,
+        trip_id: str,
+        websocket,
+        start: bool = True,
+        codec: ChatCodec = JSON_CODEC,
+        batched: bool = False,
+        heartbeat: bool = False,
+    ) -> RoomConnection:
+        """
+        Add a socket to a room.
+
+        With start=False frames are queued but not sent until the caller has
+        replayed history and calls connection.start(). With batched=True the
+        client accepts array frames and receives coalesced batches when
+        coalescing is enabled. With heartbeat=True the client answers
+        application-level pings and is reaped when it goes silent.
+        """
+        connection = RoomConnection(
+            websocket, trip_id, self.max_queue, codec,
+            batched=batched and self.coalesce_window > 0,
+            heartbeat=heartbeat,
+        )
+        if start:
+            connection.start()
+        self.rooms.setdefault(trip_id, set()).add(connection)
+        return connection
+
+    async def leave(self, connection: RoomConnection, code: Optional[int] = None) -> None:
+        self._remove(connection)
+        await connection.close(code)
+
+    def broadcast(self, trip_id: str, message: Dict[str, Any]) -> int:
+        """
+        Encode a message once and queue it for every connection in the room.
+
+        Returns:
+            Number of connections the frame was queued for
+        """
+        if trip_id not in self.rooms:
+            return 0
+        return self.broadcast_frame(trip_id, json.dumps(message), message.get('seq'))
+
+    def broadcast_frame(self, trip_id: str, frame: str, seq: Optional[int] = None) -> int:
+        """Queue an already JSON-encoded frame for every connection in the room."""
+        room = self.rooms.get(trip_id)
+        if not room:
+            return 0
+        self.broadcasts += 1
+        delivered = 0
+        batched = 0
+        # JSON frame re-encoded at most once per wire format in use
+        encoded: Dict[ChatCodec, Union[str, bytes]] = {JSON_CODEC: frame}
+        # Iterate over a snapshot: evictions mutate the room
+        for connection in list(room):
+            if connection.closed:
+                self._discard(connection)
+                continue
+            if connection.batched:
+                batched += 1
+                continue
+            if connection.codec not in encoded:
+                encoded[connection.codec] = connection.codec.encode_frame(frame)
+            if self._offer(connection, encoded[connection.codec], seq):
+                delivered += 1
+        if batched:
+            self._coalesce(trip_id, frame, seq)
+        return delivered + batched
+
+    def _offer(self, connection: RoomConnection, outbound, seq: Optional[int]) -> bool:
+        if connection.offer(outbound, seq):
+            return True
+        if self.slow_consumer_policy == DROP_OLDEST:
+            connection.drop_oldest()
+            connection.offer(outbound, seq)
+            return True
+        self.evicted += 1
+        self._discard(connection, SLOW_CONSUMER_CLOSE_CODE)
+        return False
+
+    def _coalesce(self, trip_id: str, frame: str, seq: Optional[int]) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        batch = self._pending.get(trip_id)
+        if batch is None:
+            batch = self._pending[trip_id] = FrameBatch(now)
+        elif batch.timer is not None:
+            batch.timer.cancel()
+        batch.entries.append((seq, frame))
+
+        # Flush after a quiet window, but never later than max_delay after
+        # the first frame, or at once when the batch is full
+        deadline = batch.started + self.coalesce_max_delay
+        if len(batch.entries) >= self.coalesce_max_frames or now >= deadline:
+            self.flush(trip_id)
+            return
+        delay = min(self.coalesce_window, deadline - now)
+        batch.timer = loop.call_later(delay, self.flush, trip_id)
+
+    def flush(self, trip_id: str) -> None:
+        """Send a room's pending batch to its batched connections now."""
+        batch = self._pending.pop(trip_id, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        room = self.rooms.get(trip_id)
+        if not room:
+            return
+        self.batches += 1
+        self.coalesced_frames += len(batch.entries)
+        for connection in list(room):
+            if not connection.batched:
+                continue
+            if connection.closed:
+                self._discard(connection)
+                continue
+            self._offer(connection, batch, batch.last_seq)
+
+    def _remove(self, connection: RoomConnection) -> None:
+        room = self.rooms.get(connection.trip_id)
+        if room is not None:
+            room.discard(connection)
+            if not room:
+                del self.rooms[connection.trip_id]
+
+    def _discard(self, connection: RoomConnection, code: Optional[int] = None) -> None:
+        # Remove right away so later broadcasts skip it; close in the background
+        self._remove(connection)
+        connection.closed = True
+        task = asyncio.create_task(connection.close(code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def connection_count(self, trip_id: Optional[str] = None) -> int:
+        if trip_id is not None:
+            return len(self.rooms.get(trip_id, ()))
+        return sum(len(room) for room in self.rooms.values())
+
+    def connections(self):
+        """Iterate over every connection on this worker."""
+        for room in list(self.rooms.values()):
+            yield from list(room)
+
+    def room_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Connection count, queued frames and bytes and idle time per room."""
+        now = time.monotonic()
+        return {
+            trip_id: {
+                'connections': len(room),
+                'heartbeat_connections': sum(1 for connection in room if connection.heartbeat),
+                'queued_frames': sum(connection.queue.qsize() for connection in room),
+                'queued_bytes': sum(connection.queued_bytes for connection in room),
+                'max_idle_seconds': round(max(now - connection.last_seen for connection in room), 1),
+            }
+            for trip_id, room in self.rooms.items()
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'rooms': len(self.rooms),
+            'connections': self.connection_count(),
+            'broadcasts': self.broadcasts,
+            'evicted': self.evicted,
+            'coalesced_batches': self.batches,
+            'coalesced_frames': self.coalesced_frames,
+            'queued_frames': sum(connection.queue.qsize() for connection in self.connections()),
+            'queued_bytes': sum(connection.queued_bytes for connection in self.connections()),
+        }
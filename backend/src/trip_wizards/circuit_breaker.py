@@ -0,0 +1,112 @@
+# Circuit breaker for calls to an upstream service
+# Consecutive failures are counted; at the threshold the circuit opens and
+# callers are turned away at once instead of each waiting out a timeout.
+# After a cooldown the circuit is half-open: one probe call is let through,
+# and its outcome closes the circuit or opens it again with a longer
+# cooldown. An upstream asking callers to back off (a rate-limit answer with
+# retry_after) holds the circuit open for at least that long.
+
+import time
+from typing import Any, Callable, Dict
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        cooldown: Seconds the circuit stays open before a probe is allowed
+        max_cooldown: Upper bound for the cooldown, which doubles each time
+            a probe fails
+        clock: Monotonic time source, replaced in tests
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        max_cooldown: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self._state = CLOSED
+        self._open_until = 0.0
+        self._probing = False
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.clock() >= self._open_until:
+            self._state = HALF_OPEN
+        return self._state
+
+    def acquire(self) -> float:
+        """
+        Ask to make a call.
+
+        Returns:
+            0 if the call may go ahead, else seconds until the next call
+            would be allowed. A caller that gets 0 must report the outcome
+            with record_success(), record_failure() or release().
+        """
+        state = self.state
+        if state == CLOSED:
+            return 0.0
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return 0.0
+        self.rejected += 1
+        # While a probe is out, retry after roughly the time it may take
+        return max(self._open_until - self.clock(), 1.0)
+
+    def record_success(self) -> None:
+        self._probing = False
+        self._state = CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._state == HALF_OPEN:
+            self._probing = False
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open(self.cooldown)
+        elif self._state == CLOSED and self.failures >= self.failure_threshold:
+            self._open(self.cooldown)
+
+    def hold_off(self, seconds: float) -> None:
+        """Keep the circuit open for at least `seconds`, e.g. an upstream's retry_after."""
+        self._probing = False
+        self._open(max(seconds, self._open_until - self.clock()))
+
+    def release(self) -> None:
+        """Give back a call that ended without an outcome, e.g. cancelled."""
+        self._probing = False
+
+    def _open(self, seconds: float) -> None:
+        if self._state != OPEN:
+            self.opened += 1
+        self._state = OPEN
+        self._open_until = self.clock() + seconds
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            'state': state,
+            'consecutive_failures': self.failures,
+            'opened': self.opened,
+            'rejected': self.rejected,
+            'retry_after_s': round(max(self._open_until - self.clock(), 0.0), 1) if state == OPEN else 0,
+            'cooldown_s': self.cooldown,
+        }
@@ -0,0 +1,347 @@
+# Credit metering for AI calls
+# A Firestore transaction per AI call would put a contended round trip on
+# every request. Instead each worker leases a block of a user's credits in
+# one transaction, recording them in user_credits.leasedCredits and a
+# credit_leases document, and debits that lease in memory. Spending is
+# flushed to Firestore in batches, taken off remainingCredits and
+# leasedCredits together, so remainingCredits stays the user's balance and
+# a new allowance written over it leaves outstanding leases accounted for.
+# A lease takes at most half of what is not already leased; once that is
+# one block or less, calls lease exactly what they spend, so no worker sits
+# on a small balance another worker needs. Unused lease credits go back
+# when the lease sits idle and when the worker shuts down. A worker that
+# died leaves its leases behind; they expire, and the next worker to start
+# returns them. Credits spent since that worker's last flush are lost in the
+# user's favour, but credits are never spent twice.
+
+import asyncio
+import random
+import time
+import uuid
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from google.cloud.firestore import Increment
+
+from .adk_client import AdkError
+from .firestore_store import FirestoreStore
+
+
+class InsufficientCredits(AdkError):
+    """
+    Raised when a user has no credits left for an AI call.
+
+    An AdkError, so every AI endpoint reports it like any other failed
+    suggestion, with status 402.
+    """
+
+    def __init__(self, user_id: str):
+        super().__init__('insufficient_credits', f"No AI credits left for user {user_id}")
+        self.user_id = user_id
+
+
+class _Lease:
+    __slots__ = ('credits', 'unflushed', 'used_at')
+
+    def __init__(self):
+        # Credits held by this worker and not yet spent
+        self.credits = 0
+        # Credits spent since the last flush
+        self.unflushed = 0
+        self.used_at = time.monotonic()
+
+
+class CreditLedger:
+    """
+    Per-worker credit reservations backed by Firestore.
+
+    Args:
+        store: Firestore data-access layer
+        block: Credits leased at a time; a bigger block means fewer
+            transactions but more credits parked on one worker
+        flush_interval: Seconds between flushes of spent credits
+        lease_ttl: Seconds a lease outlives its last flush before another
+            worker may return it to the user
+        idle_release: Seconds without debits after which a lease is returned
+        default_credits: Allowance for users without a user_credits document
+        worker_id: Name of this worker in lease documents
+        contention_retries: Extra attempts at a lease transaction that
+            aborted on every try because other workers kept winning
+    """
+
+    def __init__(
+        self,
+        store: FirestoreStore,
+        block: int = 10,
+        flush_interval: float = 5.0,
+        lease_ttl: float = 300.0,
+        idle_release: float = 60.0,
+        default_credits: int = 10,
+        worker_id: Optional[str] = None,
+        collection: str = 'user_credits',
+        lease_collection: str = 'credit_leases',
+        contention_retries: int = 3,
+    ):
+        self.store = store
+        self.block = block
+        self.flush_interval = flush_interval
+        self.lease_ttl = lease_ttl
+        self.idle_release = idle_release
+        self.default_credits = default_credits
+        self.worker_id = worker_id or uuid.uuid4().hex[:12]
+        self.collection = collection
+        self.lease_collection = lease_collection
+        self.contention_retries = contention_retries
+        self._leases: Dict[str, _Lease] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.debits = 0
+        self.refunds = 0
+        self.refused = 0
+        self.leased = 0
+        self.released = 0
+        self.flushes = 0
+        self.reconciled = 0
+
+    def _lease_id(self, user_id: str) -> str:
+        return f"{user_id}_{self.worker_id}"
+
+    def _expires_at(self) -> datetime:
+        return datetime.fromtimestamp(time.time() + self.lease_ttl, tz=timezone.utc)
+
+    async def start(self) -> None:
+        await self.reconcile()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush spent credits and return every lease held by this worker."""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.release(list(self._leases))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                now = time.monotonic()
+                await self.release([
+                    user_id for user_id, lease in self._leases.items()
+                    if now - lease.used_at > self.idle_release
+                ])
+            except Exception as e:
+                print(f"Failed to flush credit ledger: {e}")
+
+    async def debit(self, user_id: str, amount: int = 1) -> None:
+        """
+        Spend credits for an AI call.
+
+        Raises:
+            InsufficientCredits: If the user cannot cover amount
+        """
+        lease = self._leases.get(user_id)
+        if lease is None or lease.credits < amount:
+            lock = self._locks.setdefault(user_id, asyncio.Lock())
+            async with lock:
+                # Concurrent calls for the same user share one lease round trip
+                lease = self._leases.get(user_id)
+                if lease is None or lease.credits < amount:
+                    lease = await self._lease(user_id, amount)
+        lease.credits -= amount
+        lease.unflushed += amount
+        lease.used_at = time.monotonic()
+        self._dirty.add(user_id)
+        self.debits += amount
+
+    def refund(self, user_id: str, amount: int = 1) -> None:
+        """Give back credits debited for a call that failed."""
+        lease = self._leases.get(user_id)
+        if lease is None:
+            # The lease was released while the call ran; the refund becomes
+            # a lease of its own, recorded as leased at the next flush
+            lease = self._leases[user_id] = _Lease()
+        lease.credits += amount
+        lease.unflushed -= amount
+        self._dirty.add(user_id)
+        self.refunds += amount
+
+    async def _lease(self, user_id: str, amount: int) -> _Lease:
+        lease = self._leases.get(user_id) or _Lease()
+        need = amount - lease.credits
+        credits_ref = self.store.document(self.collection, user_id)
+        lease_ref = self.store.document(self.lease_collection, self._lease_id(user_id))
+
+        async def take(transaction) -> int:
+            data = await self.store.get(self.collection, user_id, transaction=transaction)
+            remaining = self.default_credits if data is None else data.get('remainingCredits', 0)
+            leased = 0 if data is None else data.get('leasedCredits', 0)
+            available = remaining - leased
+            if available < need:
+                return 0
+            granted = need if available <= self.block else max(need, min(self.block, available // 2))
+            update = {'leasedCredits': leased + granted, 'updatedAt': datetime.now(timezone.utc)}
+            if data is None:
+                transaction.set(credits_ref, {
+                    **update, 'remainingCredits': remaining, 'totalCredits': self.default_credits,
+                })
+            else:
+                transaction.update(credits_ref, update)
+            transaction.set(lease_ref, {
+                'userId': user_id,
+                'workerId': self.worker_id,
+                'credits': lease.credits + granted,
+                'expiresAt': self._expires_at(),
+            })
+            return granted
+
+        for attempt in range(self.contention_retries + 1):
+            try:
+                granted = await self.store.run_transaction(take)
+                break
+            except ValueError:
+                # The transaction lost to other workers on every attempt,
+                # which small balances leased per call make likely; back off
+                if attempt == self.contention_retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, 0.02 * (attempt + 1)))
+        if not granted:
+            self.refused += 1
+            raise InsufficientCredits(user_id)
+        lease.credits += granted
+        self._leases[user_id] = lease
+        self.leased += granted
+        return lease
+
+    async def flush(self) -> int:
+        """
+        Write spent credits of leases used since the last flush, and extend
+        those leases; returns the number of leases written.
+        """
+        dirty, self._dirty = self._dirty, set()
+        writes: List[Tuple[str, Any, Dict[str, Any]]] = []
+        flushed: List[Tuple[_Lease, int]] = []
+        for user_id in dirty:
+            lease = self._leases.get(user_id)
+            if lease is None:
+                continue
+            writes.extend(self._lease_writes(user_id, lease, release=False))
+            flushed.append((lease, lease.unflushed))
+            lease.unflushed = 0
+        try:
+            await self._commit(writes)
+        except Exception:
+            for lease, unflushed in flushed:
+                lease.unflushed += unflushed
+            self._dirty |= dirty
+            raise
+        self.flushes += 1
+        return len(flushed)
+
+    async def release(self, user_ids: List[str]) -> None:
+        """Return the unspent credits of these users' leases and drop the leases."""
+        writes: List[Tuple[str, Any, Dict[str, Any]]] = []
+        released = []
+        for user_id in user_ids:
+            lease = self._leases.get(user_id)
+            if lease is None or self._locks.get(user_id, asyncio.Lock()).locked():
+                continue
+            writes.extend(self._lease_writes(user_id, lease, release=True))
+            released.append((user_id, lease))
+        for user_id, lease in released:
+            del self._leases[user_id]
+            self._locks.pop(user_id, None)
+            self._dirty.discard(user_id)
+        try:
+            await self._commit(writes)
+        except Exception as e:
+            # Left as they are, the leases expire and are reconciled later
+            print(f"Failed to release credit leases: {e}")
+            return
+        self.released += sum(lease.credits for _, lease in released)
+
+    def _lease_writes(self, user_id: str, lease: _Lease, release: bool) -> List[Tuple[str, Any, Dict[str, Any]]]:
+        credits = {
+            'usedCredits': Increment(lease.unflushed),
+            'remainingCredits': Increment(-lease.unflushed),
+            'leasedCredits': Increment(-lease.unflushed),
+            'updatedAt': datetime.now(timezone.utc),
+        }
+        lease_ref = self.store.document(self.lease_collection, self._lease_id(user_id))
+        if release:
+            credits['leasedCredits'] = Increment(-lease.unflushed - lease.credits)
+            lease_write = ('delete', lease_ref, None)
+        else:
+            # A full set, so the lease is recreated if a release raced this flush
+            lease_write = ('set', lease_ref, {
+                'userId': user_id,
+                'workerId': self.worker_id,
+                'credits': lease.credits,
+                'expiresAt': self._expires_at(),
+            })
+        return [('update', self.store.document(self.collection, user_id), credits), lease_write]
+
+    async def _commit(self, writes: List[Tuple[str, Any, Dict[str, Any]]]) -> None:
+        # A Firestore batch holds at most 500 writes
+        for start in range(0, len(writes), 500):
+            await self.store.write_batch(writes[start:start + 500])
+
+    async def reconcile(self) -> int:
+        """
+        Return the credits of expired leases, left behind by workers that
+        stopped without releasing them; returns the number of leases returned.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            expired = await self.store.query(self.lease_collection, 'expiresAt', '<=', now)
+        except Exception as e:
+            print(f"Failed to reconcile credit leases: {e}")
+            return 0
+        returned = 0
+        for lease_id, _ in expired:
+            if await self._return_expired(lease_id, now):
+                returned += 1
+        self.reconciled += returned
+        return returned
+
+    async def _return_expired(self, lease_id: str, now: datetime) -> bool:
+        lease_ref = self.store.document(self.lease_collection, lease_id)
+
+        async def give_back(transaction) -> bool:
+            # Re-read in the transaction so two workers starting at once
+            # cannot both return the same lease
+            data = await self.store.get(self.lease_collection, lease_id, transaction=transaction)
+            if data is None or data['expiresAt'] > now:
+                return False
+            transaction.update(self.store.document(self.collection, data['userId']), {
+                'leasedCredits': Increment(-data['credits']),
+                'updatedAt': now,
+            })
+            transaction.delete(lease_ref)
+            return True
+
+        try:
+            return await self.store.run_transaction(give_back)
+        except Exception as e:
+            print(f"Failed to return credit lease {lease_id}: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'worker_id': self.worker_id,
+            'leases': len(self._leases),
+            'leased_credits': sum(lease.credits for lease in self._leases.values()),
+            'unflushed': sum(lease.unflushed for lease in self._leases.values()),
+            'debits': self.debits,
+            'refunds': self.refunds,
+            'refused': self.refused,
+            'leased': self.leased,
+            'released': self.released,
+            'flushes': self.flushes,
+            'reconciled': self.reconciled,
+        }
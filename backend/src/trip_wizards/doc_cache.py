@@ -0,0 +1,353 @@
+# Read-through cache for hot Firestore documents
+# Organization and user documents are read at the start of nearly every org
+# endpoint. CachedFirestoreStore answers those reads from a bounded LRU with
+# a TTL and drops an entry whenever this backend writes the document. Plain
+# and ArrayUnion/ArrayRemove updates are applied to the cached copy instead,
+# so the checks made before the next change of an organization are still
+# answered from memory. Other writers (clients using the Firebase SDK, other
+# workers) are only seen once the TTL runs out, unless a synchronous
+# Firestore client is given for on_snapshot listeners, which push every
+# change of a watched document into the cache. Each listener holds its own
+# thread and gRPC stream, so only up to max_watched documents are watched at
+# a time; the rest rely on the TTL until a watched entry leaves the cache and
+# frees its slot. Only existing documents are cached; misses always go to
+# Firestore.
+
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from google.cloud.firestore import ArrayRemove, ArrayUnion
+from google.cloud.firestore_v1 import transforms
+
+from .firestore_store import FirestoreStore
+
+Key = Tuple[str, str]
+
+
+class _Entry:
+    __slots__ = ('data', 'expires_at', 'watch')
+
+    def __init__(self, data: Dict[str, Any], expires_at: float):
+        self.data = data
+        self.expires_at = expires_at
+        self.watch = None
+
+
+class DocumentCache:
+    """
+    LRU + TTL cache of document data by (collection, document ID).
+
+    Args:
+        collections: Collections whose documents are cached
+        max_entries: Documents kept before the least recently used is evicted
+        ttl: Seconds an entry is served before it is read again
+        watch_client: Optional synchronous Firestore client; when given,
+            cached documents are kept current by on_snapshot listeners
+        max_watched: Listeners open at once; documents cached while all are
+            in use are only refreshed by the TTL
+    """
+
+    def __init__(
+        self,
+        collections: Iterable[str],
+        max_entries: int = 1000,
+        ttl: float = 60.0,
+        watch_client=None,
+        max_watched: int = 100,
+    ):
+        self.collections = frozenset(collections)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.watch_client = watch_client
+        self.max_watched = max_watched
+        self._watching = 0
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        # Reads in flight per key, and keys written while a read was in
+        # flight, whose read result may already be stale
+        self._reading: Dict[Key, int] = {}
+        self._stale: Set[Key] = set()
+        # Updates in flight per key, and keys with overlapping updates, whose
+        # commit order is unknown
+        self._writing: Dict[Key, int] = {}
+        self._overlapped: Set[Key] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits: Dict[str, int] = {name: 0 for name in self.collections}
+        self.misses: Dict[str, int] = {name: 0 for name in self.collections}
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.write_throughs = 0
+        self.watch_updates = 0
+        self.unwatched = 0
+
+    def caches(self, collection: str) -> bool:
+        return collection in self.collections
+
+    def lookup(self, key: Key) -> Optional[Dict[str, Any]]:
+        """A copy of the cached document, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses[key[0]] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits[key[0]] += 1
+        # Handlers edit the lists they read, so never hand out the cached copy
+        return copy.deepcopy(entry.data)
+
+    def begin_read(self, key: Key) -> None:
+        """Note a Firestore read of key about to start after a miss."""
+        self._reading[key] = self._reading.get(key, 0) + 1
+
+    def finish_read(self, key: Key, data: Optional[Dict[str, Any]]) -> None:
+        """Cache what a read returned, unless the document was written meanwhile."""
+        stale = key in self._stale
+        if self._reading[key] > 1:
+            self._reading[key] -= 1
+        else:
+            del self._reading[key]
+            self._stale.discard(key)
+        if data is not None and not stale:
+            self.put(key, data)
+
+    def put(self, key: Key, data: Dict[str, Any]) -> None:
+        entry = self._entries.get(key)
+        added = entry is None
+        if added:
+            entry = _Entry(copy.deepcopy(data), time.monotonic() + self.ttl)
+            self._entries[key] = entry
+        else:
+            entry.data = copy.deepcopy(data)
+            entry.expires_at = time.monotonic() + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+        # Watch after evicting, so a listener freed by the eviction is reused
+        if added and key in self._entries:
+            self._watch(key, entry)
+
+    def begin_write(self, key: Key) -> None:
+        """Note a write of key about to be sent."""
+        if self._writing.get(key):
+            self._overlapped.add(key)
+        self._writing[key] = self._writing.get(key, 0) + 1
+
+    def finish_write(self, key: Key, update: Optional[Dict[str, Any]]) -> None:
+        """
+        Apply a committed update to the cached document. The document is
+        forgotten instead when update is None (a failed write, or one that
+        was not an update), when it cannot be applied here, or when writes or
+        reads of the same document overlapped it.
+        """
+        overlapped = key in self._overlapped
+        if self._writing[key] > 1:
+            self._writing[key] -= 1
+        else:
+            del self._writing[key]
+            self._overlapped.discard(key)
+        entry = self._entries.get(key)
+        data = None
+        if update is not None and entry is not None and not overlapped and key not in self._reading:
+            data = _applied(entry.data, update)
+        if data is None:
+            self.invalidate(key)
+            return
+        entry.data = data
+        self.write_throughs += 1
+
+    def invalidate(self, key: Key) -> None:
+        """Forget a document this backend has written."""
+        if key in self._reading:
+            self._stale.add(key)
+        if key in self._entries:
+            self._drop(key)
+            self.invalidations += 1
+
+    def invalidate_collection(self, collection: str) -> None:
+        for key in [key for key in self._entries if key[0] == collection]:
+            self.invalidate(key)
+        self._stale.update(key for key in self._reading if key[0] == collection)
+
+    def _drop(self, key: Key) -> None:
+        entry = self._entries.pop(key)
+        if entry.watch is not None:
+            entry.watch.unsubscribe()
+            self._watching -= 1
+
+    def _watch(self, key: Key, entry: _Entry) -> None:
+        if self.watch_client is None:
+            return
+        if self._watching >= self.max_watched:
+            self.unwatched += 1
+            return
+        self._loop = self._loop or asyncio.get_running_loop()
+        reference = self.watch_client.collection(key[0]).document(key[1])
+
+        def on_snapshot(snapshots, changes, read_time):
+            # Runs on the listener's thread; hand the change to the event loop
+            snapshot = snapshots[0] if snapshots else None
+            data = snapshot.to_dict() if snapshot is not None and snapshot.exists else None
+            self._loop.call_soon_threadsafe(self._refresh, key, entry, data)
+
+        try:
+            entry.watch = reference.on_snapshot(on_snapshot)
+            self._watching += 1
+        except Exception as e:
+            print(f"Failed to watch {key[0]}/{key[1]}: {e}")
+
+    def _refresh(self, key: Key, entry: _Entry, data: Optional[Dict[str, Any]]) -> None:
+        if self._entries.get(key) is not entry:
+            return
+        self.watch_updates += 1
+        if data is None:
+            self._drop(key)
+            return
+        entry.data = data
+        entry.expires_at = time.monotonic() + self.ttl
+
+    def stop(self) -> None:
+        """Stop every on_snapshot listener."""
+        for key in list(self._entries):
+            self._drop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        collections = {}
+        for name in sorted(self.collections):
+            lookups = self.hits[name] + self.misses[name]
+            collections[name] = {
+                'hits': self.hits[name],
+                'misses': self.misses[name],
+                'hit_rate': round(self.hits[name] / lookups, 3) if lookups else None,
+            }
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'collections': collections,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'write_throughs': self.write_throughs,
+            'watched': self._watching,
+            'max_watched': self.max_watched,
+            'unwatched': self.unwatched,
+            'watch_updates': self.watch_updates,
+        }
+
+
+def _applied(data: Dict[str, Any], update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """data with update applied, or None if only Firestore can apply it."""
+    result = copy.deepcopy(data)
+    for field, value in update.items():
+        if '.' in field:
+            return None
+        if isinstance(value, ArrayUnion):
+            current = result.get(field) or []
+            result[field] = current + [copy.deepcopy(item) for item in value.values if item not in current]
+        elif isinstance(value, ArrayRemove):
+            result[field] = [item for item in result.get(field) or [] if item not in value.values]
+        elif isinstance(value, (transforms.Sentinel, transforms._NumericValue, transforms._ValueList)):
+            return None
+        else:
+            result[field] = copy.deepcopy(value)
+    return result
+
+
+def _key(doc_ref) -> Key:
+    collection, _, doc_id = doc_ref.path.rpartition('/')
+    return collection, doc_id
+
+
+class CachedFirestoreStore(FirestoreStore):
+    """
+    FirestoreStore whose reads of cached collections go through a
+    DocumentCache, and whose writes invalidate it.
+
+    Writes made inside run_transaction() bypass the cache; call forget() for
+    cached documents a transaction wrote. get_many() reads bypass it too, so
+    bulk reads do not evict hot documents.
+    """
+
+    def __init__(self, client, cache: DocumentCache):
+        super().__init__(client)
+        self.cache = cache
+
+    async def get(self, collection: str, doc_id: str, transaction=None) -> Optional[Dict[str, Any]]:
+        if transaction is not None or not self.cache.caches(collection):
+            return await super().get(collection, doc_id, transaction)
+        key = (collection, doc_id)
+        data = self.cache.lookup(key)
+        if data is not None:
+            return data
+        self.cache.begin_read(key)
+        data = None
+        try:
+            data = await super().get(collection, doc_id)
+        finally:
+            self.cache.finish_read(key, data)
+        return data
+
+    async def get_all(self, keys: List[Key]) -> Dict[Key, Optional[Dict[str, Any]]]:
+        result: Dict[Key, Optional[Dict[str, Any]]] = {}
+        misses: List[Key] = []
+        for key in dict.fromkeys(keys):
+            if self.cache.caches(key[0]):
+                data = self.cache.lookup(key)
+                if data is not None:
+                    result[key] = data
+                    continue
+                self.cache.begin_read(key)
+            misses.append(key)
+        found: Dict[Key, Optional[Dict[str, Any]]] = {}
+        try:
+            found = await super().get_all(misses)
+        finally:
+            for key in misses:
+                if self.cache.caches(key[0]):
+                    self.cache.finish_read(key, found.get(key))
+        result.update(found)
+        return result
+
+    def forget(self, collection: str, doc_id: str) -> None:
+        self.cache.invalidate((collection, doc_id))
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        try:
+            await super().set(collection, doc_id, data)
+        finally:
+            self.cache.invalidate((collection, doc_id))
+
+    async def update(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        key = (collection, doc_id)
+        self.cache.begin_write(key)
+        committed = None
+        try:
+            await super().update(collection, doc_id, data)
+            committed = data
+        finally:
+            self.cache.finish_write(key, committed)
+
+    async def update_where(
+        self, collection: str, field: str, op: str, value: Any, data: Dict[str, Any]
+    ) -> int:
+        try:
+            return await super().update_where(collection, field, op, value, data)
+        finally:
+            self.cache.invalidate_collection(collection)
+
+    async def write_batch(self, writes: List[Tuple[str, Any, Dict[str, Any]]]) -> None:
+        for _, doc_ref, _ in writes:
+            self.cache.begin_write(_key(doc_ref))
+        committed = False
+        try:
+            await super().write_batch(writes)
+            committed = True
+        finally:
+            for operation, doc_ref, data in writes:
+                self.cache.finish_write(_key(doc_ref), data if committed and operation == 'update' else None)
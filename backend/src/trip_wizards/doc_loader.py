@@ -0,0 +1,79 @@
+# Request-scoped document loader
+# Handlers that need several documents used to await them one after another,
+# paying one round trip each. A DocumentLoader collects the reads requested
+# in the same event loop turn and sends them as one get_all (through the
+# document cache, so cached documents cost nothing). It also remembers what
+# it read, so asking for the same path twice in a request reads it once.
+# Create one per request; it never sees writes, so re-reading after a write
+# needs forget().
+
+import asyncio
+import copy
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .firestore_store import FirestoreStore
+
+Key = Tuple[str, str]
+
+
+class DocumentLoader:
+    """
+    Batching, de-duplicating document reader in the DataLoader style.
+
+    Args:
+        store: Firestore data-access layer whose get_all() serves the batches
+    """
+
+    def __init__(self, store: FirestoreStore):
+        self.store = store
+        self._futures: Dict[Key, asyncio.Future] = {}
+        self._pending: List[Tuple[Key, asyncio.Future]] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+
+    def load(self, collection: str, doc_id: str) -> "asyncio.Future[Optional[Dict[str, Any]]]":
+        """
+        Future of a document's data (None when missing), shared by every
+        load of the same path. Await it; callers must not modify the result.
+        """
+        key = (collection, doc_id)
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            if not self._pending:
+                # Let the rest of this turn queue its reads first
+                loop.call_soon(self._dispatch)
+            self._pending.append((key, future))
+        return future
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Like FirestoreStore.get(): a copy of the document the caller may edit."""
+        return copy.deepcopy(await self.load(collection, doc_id))
+
+    def forget(self, collection: str, doc_id: str) -> None:
+        """Read a document again on its next load, e.g. after writing it."""
+        self._futures.pop((collection, doc_id), None)
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, []
+        task = asyncio.create_task(self._fetch(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, pending: List[Tuple[Key, asyncio.Future]]) -> None:
+        self.batches += 1
+        try:
+            found = await self.store.get_all([key for key, _ in pending])
+        except Exception as e:
+            for key, future in pending:
+                # Failed reads are not remembered, so a later load retries
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in pending:
+            if not future.done():
+                future.set_result(found.get(key))
@@ -0,0 +1,206 @@
+# Async Firestore data-access layer for Trip Wizards
+# Every route goes through FirestoreStore so that Firestore round trips are
+# awaited on the AsyncClient instead of blocking the uvicorn event loop.
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from google.cloud.firestore import async_transactional
+
+T = TypeVar('T')
+
+
+class FirestoreStore:
+    """
+    Thin async wrapper around a Firestore AsyncClient.
+
+    Documents are returned as plain dictionaries (or None when missing) so
+    that handlers never touch snapshot objects directly.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def document(self, collection: str, doc_id: Optional[str] = None):
+        """Return a document reference, auto-generating an ID when omitted."""
+        if doc_id is None:
+            return self.client.collection(collection).document()
+        return self.client.collection(collection).document(doc_id)
+
+    async def get(self, collection: str, doc_id: str, transaction=None) -> Optional[Dict[str, Any]]:
+        """
+        Read a single document.
+
+        Args:
+            collection: The collection name
+            doc_id: The document ID
+            transaction: Optional transaction to read in
+
+        Returns:
+            The document data, or None if the document does not exist
+        """
+        snapshot = await self.document(collection, doc_id).get(transaction=transaction)
+        if not snapshot.exists:
+            return None
+        return snapshot.to_dict()
+
+    async def get_all(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[Dict[str, Any]]]:
+        """
+        Read documents from any collections in a single round trip.
+
+        Args:
+            keys: (collection, document ID) pairs
+
+        Returns:
+            Document data (or None when missing) by (collection, document ID)
+        """
+        result: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {key: None for key in keys}
+        if not result:
+            return result
+        refs = [self.document(collection, doc_id) for collection, doc_id in result]
+        async for snapshot in self.client.get_all(refs):
+            if snapshot.exists:
+                collection, _, doc_id = snapshot.reference.path.rpartition('/')
+                result[(collection, doc_id)] = snapshot.to_dict()
+        return result
+
+    async def get_many(self, collection: str, doc_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Read several documents of one collection in a single round trip.
+
+        Returns:
+            Document data (or None when missing) by document ID
+        """
+        refs = [self.document(collection, doc_id) for doc_id in doc_ids]
+        result: Dict[str, Optional[Dict[str, Any]]] = {doc_id: None for doc_id in doc_ids}
+        async for snapshot in self.client.get_all(refs):
+            if snapshot.exists:
+                result[snapshot.id] = snapshot.to_dict()
+        return result
+
+    def forget(self, collection: str, doc_id: str) -> None:
+        """Drop any cached copy of a document written in a transaction."""
+
+    async def add(self, collection: str, data: Dict[str, Any]) -> str:
+        """
+        Create a document with an auto-generated ID.
+
+        Returns:
+            The new document ID
+        """
+        doc_ref = self.document(collection)
+        await doc_ref.set(data)
+        return doc_ref.id
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        await self.document(collection, doc_id).set(data)
+
+    async def update(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        await self.document(collection, doc_id).update(data)
+
+    async def query(
+        self, collection: str, field: str, op: str, value: Any
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Run a single-field query.
+
+        Returns:
+            List of (document ID, document data) tuples
+        """
+        query = self.client.collection(collection).where(field, op, value)
+        return [(doc.id, doc.to_dict()) async for doc in query.stream()]
+
+    async def query_group(
+        self, collection_id: str, field: str, op: str, value: Any
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Run a single-field query over every collection named collection_id,
+        such as the members subcollections of all organizations.
+
+        Returns:
+            List of (document path, document data) tuples
+        """
+        query = self.client.collection_group(collection_id).where(field, op, value)
+        return [(doc.reference.path, doc.to_dict()) async for doc in query.stream()]
+
+    async def page(
+        self, collection: str, order_field: str, limit: int, start_after: Optional[Any] = None
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Read one page of a collection ordered by a field.
+
+        Args:
+            start_after: order_field value of the last document of the
+                previous page
+
+        Returns:
+            List of (document ID, document data) tuples
+        """
+        query = self.client.collection(collection).order_by(order_field)
+        if start_after is not None:
+            query = query.start_after({order_field: start_after})
+        return [(doc.id, doc.to_dict()) async for doc in query.limit(limit).stream()]
+
+    async def update_where(
+        self, collection: str, field: str, op: str, value: Any, data: Dict[str, Any]
+    ) -> int:
+        """
+        Apply the same update to every document matching a query in one batch.
+
+        Returns:
+            Number of documents updated
+        """
+        query = self.client.collection(collection).where(field, op, value)
+        batch = self.client.batch()
+        count = 0
+        async for doc in query.stream():
+            batch.update(doc.reference, data)
+            count += 1
+        if count:
+            await batch.commit()
+        return count
+
+    async def write_batch(self, writes: List[Tuple[str, Any, Dict[str, Any]]]) -> None:
+        """
+        Commit several writes atomically in a single round trip.
+
+        Args:
+            writes: List of (operation, document reference, data) tuples where
+                operation is 'set', 'merge' (set merging into the existing
+                document), 'create' (fails if the document exists), 'update'
+                (fails if it does not), 'delete' or 'delete_existing' (fails
+                if it does not exist); data is ignored for deletes
+
+        Raises:
+            google.api_core.exceptions.AlreadyExists: A 'create' found its
+                document; nothing was written
+            google.api_core.exceptions.NotFound: An 'update' or
+                'delete_existing' found no document; nothing was written
+        """
+        batch = self.client.batch()
+        for operation, doc_ref, data in writes:
+            if operation == 'delete':
+                batch.delete(doc_ref)
+            elif operation == 'delete_existing':
+                batch.delete(doc_ref, option=self.client.write_option(exists=True))
+            elif operation == 'merge':
+                batch.set(doc_ref, data, merge=True)
+            else:
+                getattr(batch, operation)(doc_ref, data)
+        await batch.commit()
+
+    async def run_transaction(self, fn: Callable[[Any], Awaitable[T]]) -> T:
+        """
+        Run fn(transaction) in a Firestore transaction.
+
+        fn reads through the transaction and queues its writes on it; the
+        writes commit together only if nothing it read changed meanwhile,
+        otherwise fn is run again.
+
+        Returns:
+            What fn returned on the attempt that committed
+        """
+        return await async_transactional(fn)(self.client.transaction())
+
+    async def ping(self) -> None:
+        """Perform a lightweight read to verify connectivity."""
+        await self.client.collection('_health_check').limit(1).get()
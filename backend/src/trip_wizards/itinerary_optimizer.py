@@ -0,0 +1,309 @@
+# Local itinerary optimizer
+# Reorders a day's stops to minimize travel time without an ADK round trip.
+# Travel times come from a haversine distance matrix computed with NumPy in
+# one vectorized step. A time-aware nearest-neighbour tour is built first,
+# then improved with 2-opt segment reversals; moves that would make a stop
+# miss its time window are rejected. Results use the ADK
+# itinerary_optimization response shape, so clients render either the same.
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_DURATION_MINUTES = 60
+# Travel minutes added per unit of lateness when comparing schedules
+LATENESS_PENALTY = 1000.0
+
+
+def parse_clock(value: Optional[str]) -> Optional[float]:
+    """Minutes after midnight for an 'HH:MM' string, or None."""
+    if not value:
+        return None
+    hours, _, minutes = value.partition(':')
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def format_clock(minutes: float) -> str:
+    minutes = int(round(minutes)) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def haversine_matrix(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distances between every pair of points.
+
+    Args:
+        lat: Latitudes in degrees
+        lng: Longitudes in degrees
+
+    Returns:
+        n x n matrix of distances in kilometres
+    """
+    lat = np.radians(lat)
+    lng = np.radians(lng)
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class Stop:
+    """One itinerary item to place in the day."""
+
+    def __init__(self, item: Dict[str, Any]):
+        self.id = item['id']
+        # The app stores location as a place name; only a map can carry coordinates
+        location = item.get('location')
+        nested = location.get('coordinates') if isinstance(location, dict) else None
+        coordinates = item.get('coordinates') or nested or {}
+        self.lat = float(coordinates['lat'])
+        self.lng = float(coordinates['lng'])
+        start = parse_clock(item.get('startTime'))
+        end = parse_clock(item.get('endTime'))
+        window = item.get('window') or {}
+        if start is not None:
+            # A booked start time is a window of zero width
+            self.earliest, self.latest, self.fixed = start, start, True
+        else:
+            self.earliest = parse_clock(window.get('start'))
+            self.latest = parse_clock(window.get('end'))
+            self.fixed = False
+        if item.get('duration_minutes') is not None:
+            self.duration = float(item['duration_minutes'])
+        elif start is not None and end is not None:
+            self.duration = float(end - start)
+        else:
+            self.duration = float(DEFAULT_DURATION_MINUTES)
+
+
+class ItineraryOptimizer:
+    """
+    Nearest-neighbour plus 2-opt day planner.
+
+    Args:
+        speed_kmh: Average door-to-door travel speed
+        max_passes: Upper bound on 2-opt improvement passes
+    """
+
+    def __init__(self, speed_kmh: float = 20.0, max_passes: int = 50):
+        self.speed_kmh = speed_kmh
+        self.max_passes = max_passes
+        self.runs = 0
+        self.total_ms = 0.0
+
+    def travel_minutes(self, stops: Sequence[Stop]) -> np.ndarray:
+        lat = np.fromiter((stop.lat for stop in stops), float, len(stops))
+        lng = np.fromiter((stop.lng for stop in stops), float, len(stops))
+        return haversine_matrix(lat, lng) / self.speed_kmh * 60.0
+
+    def optimize(
+        self,
+        items: List[Dict[str, Any]],
+        day_start: str = '09:00',
+        start_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Order a day's items.
+
+        Args:
+            items: Itinerary items with 'id' and 'coordinates' {lat, lng};
+                optional 'startTime'/'endTime' (a booked slot), 'window'
+                {'start', 'end'} (allowed start times) and 'duration_minutes'
+            day_start: When the day begins
+            start_id: Item the day starts from, e.g. the hotel
+
+        Returns:
+            ADK itinerary_optimization shaped response with optimized_order,
+            travel_time_estimates and before/after travel totals
+
+        Raises:
+            ValueError: On missing coordinates or an unknown start_id
+        """
+        started = time.perf_counter()
+        try:
+            stops = [Stop(item) for item in items]
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Every item needs an id and coordinates with lat and lng: {e}")
+        if not stops:
+            raise ValueError("No items to optimize")
+        ids = [stop.id for stop in stops]
+        if start_id is not None and start_id not in ids:
+            raise ValueError(f"Unknown start_id: {start_id}")
+
+        travel = self.travel_minutes(stops)
+        clock = float(parse_clock(day_start) or 0)
+        first = ids.index(start_id) if start_id is not None else None
+        order = self._nearest_neighbour(stops, travel, first, clock)
+        order = self._two_opt(stops, travel, order, clock)
+
+        starts, lateness = self._schedule(stops, travel, order, clock)
+        baseline = list(range(len(stops)))
+        if first is not None:
+            baseline.insert(0, baseline.pop(first))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.runs += 1
+        self.total_ms += elapsed_ms
+        return {
+            'type': 'itinerary_optimization',
+            'optimized_order': [
+                {
+                    'itinerary_item_id': stops[index].id,
+                    'recommended_time': format_clock(starts[position]),
+                    'reasoning': self._reasoning(stops, travel, order, position),
+                }
+                for position, index in enumerate(order)
+            ],
+            'travel_time_estimates': [
+                {
+                    'from': stops[a].id,
+                    'to': stops[b].id,
+                    'duration_minutes': int(round(travel[a, b])),
+                    'mode': 'estimated',
+                }
+                for a, b in zip(order, order[1:])
+            ],
+            'total_travel_minutes': round(self._path_minutes(travel, order), 1),
+            'baseline_travel_minutes': round(self._path_minutes(travel, baseline), 1),
+            'late_minutes': round(lateness, 1),
+            'metadata': {
+                'model': 'local-nearest-neighbour-2opt',
+                'response_time_ms': round(elapsed_ms, 2),
+            },
+        }
+
+    def _nearest_neighbour(
+        self, stops: Sequence[Stop], travel: np.ndarray, first: Optional[int], clock: float
+    ) -> List[int]:
+        n = len(stops)
+        duration = np.array([stop.duration for stop in stops])
+        earliest = np.array([-np.inf if stop.earliest is None else stop.earliest for stop in stops])
+        latest = np.array([np.inf if stop.latest is None else stop.latest for stop in stops])
+        windowed = np.flatnonzero(np.isfinite(latest))
+
+        visited = np.zeros(n, dtype=bool)
+        order: List[int] = []
+        now = clock
+        current = first
+        if current is None:
+            # No given start: the first pick comes from a virtual start with
+            # no travel, and ties go to the stop farthest from the middle of
+            # the day's stops so the path sweeps from one edge
+            spread = travel.mean(axis=1)
+            tie_break = -1e-6 * spread / (spread.max() or 1.0)
+        else:
+            order.append(current)
+            visited[current] = True
+            now = max(clock, earliest[current]) + duration[current]
+
+        while len(order) < n:
+            arrival = now + (travel[current] if current is not None else np.zeros(n))
+            begin = np.maximum(arrival, earliest)
+            # Time spent to get going at each candidate, waiting included
+            cost = begin - now
+            if current is None:
+                cost += tie_break
+            cost[visited] = np.inf
+            cost[arrival > latest] += LATENESS_PENALTY
+            pending = windowed[~visited[windowed]]
+            if pending.size:
+                # Avoid candidates after which a still-unvisited windowed stop
+                # can no longer be reached in time
+                reach = (begin + duration)[:, None] + travel[:, pending]
+                blocks = (reach > latest[pending][None, :]) & (pending[None, :] != np.arange(n)[:, None])
+                cost[blocks.any(axis=1)] += LATENESS_PENALTY
+            current = int(np.argmin(cost))
+            visited[current] = True
+            order.append(current)
+            now = begin[current] + duration[current]
+        return order
+
+    def _schedule(
+        self, stops: Sequence[Stop], travel: np.ndarray, order: Sequence[int], clock: float
+    ) -> Tuple[List[float], float]:
+        """Start time at each stop along the order, and total minutes late."""
+        starts = []
+        lateness = 0.0
+        now = clock
+        previous = None
+        for index in order:
+            stop = stops[index]
+            arrival = now if previous is None else now + travel[previous, index]
+            begin = arrival if stop.earliest is None else max(arrival, stop.earliest)
+            if stop.latest is not None and begin > stop.latest:
+                lateness += begin - stop.latest
+            starts.append(begin)
+            now = begin + stop.duration
+            previous = index
+        return starts, lateness
+
+    def _schedule_cost(
+        self, stops: Sequence[Stop], travel: np.ndarray, order: Sequence[int], clock: float
+    ) -> float:
+        # Lateness first, then when the day ends (travel plus waiting)
+        starts, lateness = self._schedule(stops, travel, order, clock)
+        return LATENESS_PENALTY * lateness + starts[-1] + stops[order[-1]].duration
+
+    def _two_opt(
+        self, stops: Sequence[Stop], travel: np.ndarray, order: List[int], clock: float
+    ) -> List[int]:
+        n = len(order)
+        if n < 4:
+            return order
+        has_windows = any(stop.latest is not None or stop.earliest is not None for stop in stops)
+        cost = self._schedule_cost(stops, travel, order, clock) if has_windows else 0.0
+        tour = np.array(order)
+        for _ in range(self.max_passes):
+            improved = False
+            # Reverse tour[i..j]; the first stop stays put and the day has an
+            # open end, so reversing up to the last stop changes one edge
+            for i in range(1, n - 1):
+                j = np.arange(i + 1, n - 1)
+                before = tour[i - 1]
+                removed = travel[before, tour[i]] + travel[tour[j], tour[j + 1]]
+                added = travel[before, tour[j]] + travel[tour[i], tour[j + 1]]
+                delta = np.append(added - removed, travel[before, tour[n - 1]] - travel[before, tour[i]])
+                if has_windows:
+                    # Shorter travel can still mean waiting for a booking or
+                    # arriving late, so check the schedule of the best few
+                    candidates = np.argsort(delta)[:3]
+                else:
+                    candidates = [int(np.argmin(delta))]
+                for candidate in candidates:
+                    if delta[candidate] >= -1e-9:
+                        break
+                    end = i + 1 + int(candidate)
+                    trial = np.concatenate([tour[:i], tour[i:end + 1][::-1], tour[end + 1:]])
+                    if has_windows:
+                        trial_cost = self._schedule_cost(stops, travel, trial, clock)
+                        if trial_cost >= cost - 1e-9:
+                            continue
+                        cost = trial_cost
+                    tour = trial
+                    improved = True
+                    break
+            if not improved:
+                break
+        return tour.tolist()
+
+    @staticmethod
+    def _path_minutes(travel: np.ndarray, order: Sequence[int]) -> float:
+        order = np.asarray(order)
+        return float(travel[order[:-1], order[1:]].sum())
+
+    @staticmethod
+    def _reasoning(stops: Sequence[Stop], travel: np.ndarray, order: Sequence[int], position: int) -> str:
+        stop = stops[order[position]]
+        if stop.fixed:
+            return f"Booked for {format_clock(stop.earliest)}"
+        if position == 0:
+            return "Start of the day"
+        previous = stops[order[position - 1]]
+        return f"{int(round(travel[order[position - 1], order[position]]))} min from {previous.id}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'avg_ms': round(self.total_ms / self.runs, 2) if self.runs else None,
+        }
@@ -1,27 +1,322 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Header
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
 import json
-from typing import Dict, List
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
 import os
 import httpx
 from .stripe_billing import (
+    PLAN_CREDITS,
     create_stripe_payment_intent,
     verify_payment_intent,
     verify_webhook_signature,
 )
-
-app = FastAPI(title="Trip Wizards API", version="0.1.0")
+from .doc_cache import CachedFirestoreStore, DocumentCache
+from .doc_loader import DocumentLoader
+from .org_index import OrgIndex
+from .org_members import OrgMembers, OrgNotFound
+from .chat_persistence import ChatWriteBehind
+from .chat_rooms import RoomBroadcaster
+from .backplane import create_backplane
+from .chat_history import FRAME_FIELDS, ChatHistory
+from .chat_codec import negotiate
+from .chat_presence import PresenceTracker, is_ephemeral
+from .chat_rate_limit import ChatRateLimiter, RateLimitExceeded, RATE_LIMIT_CLOSE_CODE
+from .chat_heartbeat import HeartbeatMonitor, IdleConnection, IDLE_CLOSE_CODE, PING, PONG
+from .adk_client import AdkClient, AdkError, suggestion_text
+from .ai_cache import SuggestionCache, trip_context
+from .circuit_breaker import CircuitBreaker
+from .credit_ledger import CreditLedger
+from .single_flight import SingleFlight
+from .ai_batch import SuggestionBatches
+from .ai_intents import IntentRouter
+from .ai_jobs import FirestoreJobStore, JobQueue, JobQueueFull, job_view
+from .itinerary_optimizer import ItineraryOptimizer
+from .ai_stream import AGENT_REQUEST, AgentReplies, sse_suggestion_events, suggestion_stream
 
 # Initialize Firebase
 if not firebase_admin._apps:
     cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS', 'firebase_credentials.json'))
     firebase_admin.initialize_app(cred)
 
-db = firestore.client()
+db = firestore_async.client()
+
+# Organization and user documents are served from a read-through cache that
+# this worker's writes invalidate; DOC_CACHE_WATCH=true also follows changes
+# made elsewhere through on_snapshot listeners (needs the sync client), at
+# most DOC_CACHE_MAX_WATCHED at a time
+store = CachedFirestoreStore(db, DocumentCache(
+    ['organizations', 'users'],
+    max_entries=int(os.getenv('DOC_CACHE_SIZE', '1000')),
+    ttl=float(os.getenv('DOC_CACHE_TTL_S', '60')),
+    watch_client=firestore.client() if os.getenv('DOC_CACHE_WATCH', 'false').lower() == 'true' else None,
+    max_watched=int(os.getenv('DOC_CACHE_MAX_WATCHED', '100')),
+))
+
+def document_loader() -> DocumentLoader:
+    # One per request: independent reads share a get_all, repeated reads of a
+    # path are made once
+    return DocumentLoader(store)
+
+# user_orgs/{user_id} maps each user to their organizations, written with
+# every membership change and held in memory for recent users
+org_index = OrgIndex(
+    store,
+    max_users=int(os.getenv('ORG_INDEX_SIZE', '10000')),
+    ttl=float(os.getenv('ORG_INDEX_TTL_S', '60')),
+)
+
+# Members and invites live in subcollections of each organization; bulk
+# changes are written ORG_BULK_CONCURRENCY batches at a time
+org_members = OrgMembers(
+    store,
+    org_index,
+    concurrency=int(os.getenv('ORG_BULK_CONCURRENCY', '8')),
+    max_bulk=int(os.getenv('ORG_BULK_MAX', '10000')),
+)
+
+# Chat messages are persisted write-behind, off the broadcast path
+chat_writer = ChatWriteBehind(
+    db,
+    flush_interval=float(os.getenv('CHAT_FLUSH_INTERVAL_MS', '50')) / 1000,
+    max_pending=int(os.getenv('CHAT_MAX_PENDING_WRITES', '10000')),
+)
+
+# Trip chat rooms on this worker
+rooms = RoomBroadcaster(
+    max_queue=int(os.getenv('CHAT_OUTBOUND_QUEUE', '64')),
+    slow_consumer_policy=os.getenv('CHAT_SLOW_CONSUMER_POLICY', 'evict'),
+    coalesce_window=float(os.getenv('CHAT_COALESCE_WINDOW_MS', '0')) / 1000,
+    coalesce_max_delay=float(os.getenv('CHAT_COALESCE_MAX_DELAY_MS', '50')) / 1000,
+)
+
+# Recent frames per room, for clients resuming with ?resume_from=<seq>
+history = ChatHistory(db, capacity=int(os.getenv('CHAT_HISTORY_SIZE', '200')))
+
+def deliver_frame(trip_id: str, seq: int, frame: str) -> None:
+    if seq:
+        history.record(trip_id, seq, frame)
+        rooms.broadcast_frame(trip_id, frame, seq)
+    else:
+        # Unsequenced typing/presence/cursor or streamed agent reply frame
+        presence.observe(trip_id, frame)
+        rooms.broadcast_frame(trip_id, frame)
+
+# Publishes room frames to every worker; set CHAT_BACKPLANE_URL=redis://host:port
+# when running more than one worker or replica
+backplane = create_backplane(
+    os.getenv('CHAT_BACKPLANE_URL'), deliver_frame, history.last_sequence
+)
+
+async def publish_ephemeral(trip_id: str, frame: str) -> None:
+    await backplane.publish(trip_id, 0, frame)
+
+# Typing, presence and cursor updates: throttled, in memory only
+presence = PresenceTracker(
+    publish_ephemeral,
+    min_interval=float(os.getenv('CHAT_PRESENCE_INTERVAL_MS', '250')) / 1000,
+)
+
+# Token buckets on inbound chat messages per socket and per trip
+rate_limiter = ChatRateLimiter(
+    socket_rate=float(os.getenv('CHAT_SOCKET_RATE', '5')),
+    socket_burst=float(os.getenv('CHAT_SOCKET_BURST', '10')),
+    trip_rate=float(os.getenv('CHAT_TRIP_RATE', '50')),
+    trip_burst=float(os.getenv('CHAT_TRIP_BURST', '100')),
+    policy=os.getenv('CHAT_RATE_LIMIT_POLICY', 'delay'),
+    max_delay=float(os.getenv('CHAT_RATE_LIMIT_MAX_DELAY_MS', '2000')) / 1000,
+    ephemeral_rate=float(os.getenv('CHAT_EPHEMERAL_RATE', '20')),
+    ephemeral_burst=float(os.getenv('CHAT_EPHEMERAL_BURST', '40')),
+    max_senders=int(os.getenv('CHAT_MAX_SENDERS_PER_SOCKET', '4')),
+)
+
+# Pings ?heartbeat=true sockets and reaps the ones that go silent; other
+# sockets are checked by uvicorn's protocol-level pings
+heartbeats = HeartbeatMonitor(
+    rooms,
+    interval=float(os.getenv('CHAT_HEARTBEAT_INTERVAL_S', '20')),
+    idle_timeout=float(os.getenv('CHAT_IDLE_TIMEOUT_S', '60')),
+)
+
+# ADK travel concierge; one pooled keep-alive HTTP client for the app's lifetime.
+# The circuit breaker stops calling ADK after repeated failures or when it asks
+# us to back off; set ADK_HEDGE_AFTER_MS to re-send slow suggestion calls
+adk = AdkClient(
+    os.getenv('ADK_URL', 'http://localhost:8001'),
+    api_key=os.getenv('ADK_API_KEY'),
+    deadline=float(os.getenv('ADK_DEADLINE_S', '10')),
+    http2=os.getenv('ADK_HTTP2', 'false').lower() == 'true',
+    health_url=os.getenv('ADK_SERVICE_URL'),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv('ADK_BREAKER_FAILURES', '5')),
+        cooldown=float(os.getenv('ADK_BREAKER_COOLDOWN_S', '30')),
+    ),
+    retries=int(os.getenv('ADK_RETRIES', '1')),
+    hedge_after=float(os.getenv('ADK_HEDGE_AFTER_MS', '0')) / 1000 or None,
+)
+
+# Caches ADK suggestions by normalized prompt and trip context; set
+# AI_CACHE_URL=redis://host:port to share answers between workers
+suggestion_cache = SuggestionCache(
+    max_bytes=int(os.getenv('AI_CACHE_MAX_BYTES', str(8 * 1024 * 1024))),
+    ttl=float(os.getenv('AI_CACHE_TTL_S', '900')),
+    shared_url=os.getenv('AI_CACHE_URL'),
+)
+
+# Identical suggestion requests in flight at the same time share one ADK call
+ai_requests = SingleFlight()
+
+async def fetch_suggestion(prompt: str, context: dict, cache_key: str) -> dict:
+    response = await adk.suggest(prompt, context)
+    await suggestion_cache.set(cache_key, response)
+    return response
+
+# Routes prompts to intents; small talk never reaches ADK
+intents = IntentRouter()
+
+# AI calls cost one credit each, debited from blocks of credits this worker
+# leases from user_credits; spending is flushed to Firestore in batches
+credits = CreditLedger(
+    store,
+    block=int(os.getenv('AI_CREDIT_BLOCK', '10')),
+    flush_interval=float(os.getenv('AI_CREDIT_FLUSH_S', '5')),
+    lease_ttl=float(os.getenv('AI_CREDIT_LEASE_TTL_S', '300')),
+    default_credits=PLAN_CREDITS['free'],
+)
+
+async def cached_suggestion(
+    prompt: str, context: dict, fallback: bool = True, user_id: Optional[str] = None
+) -> dict:
+    route = intents.route(prompt)
+    local = route.local_response(context)
+    if local is not None:
+        return local
+    cache_key = suggestion_cache.key(prompt, context, route.cache_intent)
+    response = await suggestion_cache.get(cache_key)
+    if response is None:
+        # Only the caller that starts the ADK call pays; cache hits and
+        # callers joining a call already in flight are free
+        charged = False
+        if user_id and not ai_requests.in_flight(cache_key):
+            await credits.debit(user_id)
+            charged = True
+            if ai_requests.in_flight(cache_key):
+                # Another caller started it while the lease was taken
+                credits.refund(user_id)
+                charged = False
+        try:
+            response = await ai_requests.do(
+                cache_key, lambda: fetch_suggestion(prompt, context, cache_key)
+            )
+        except AdkError as e:
+            # Failed calls and stand-in answers are free
+            if charged:
+                credits.refund(user_id)
+            if not fallback or e.error != 'circuit_open':
+                raise
+            # ADK is paused: answer at once with this trip's generic answer
+            # for the intent if one is cached, else a stand-in message
+            response = await suggestion_cache.get(suggestion_cache.key(prompt, context, route.intent))
+            if response is None:
+                response = route.fallback_response(context, e.retry_after)
+    return response
+
+# Many prompts for one trip in one request, sent to ADK concurrently
+ai_batches = SuggestionBatches(
+    concurrency=int(os.getenv('AI_BATCH_CONCURRENCY', '8')),
+    max_prompts=int(os.getenv('AI_BATCH_MAX_PROMPTS', '50')),
+)
+
+async def post_chat_message(trip_id: str, message_data: dict) -> None:
+    # Add timestamp, trip_id and per-trip sequence number to the message
+    message_data["timestamp"] = datetime.utcnow().isoformat()
+    message_data["trip_id"] = trip_id
+    message_data["seq"] = await backplane.next_sequence(trip_id)
+
+    # Queue message for batched persistence in Firestore, with the frame
+    # fields a replay needs to rebuild it as it was sent
+    document = {
+        'tripId': trip_id,
+        'message': message_data.get('message', ''),
+        'sender': message_data.get('sender', 'unknown'),
+        'isAgent': message_data.get('isAgent', False),
+        'timestamp': message_data['timestamp'],
+        'seq': message_data['seq']
+    }
+    document.update((field, message_data[field]) for field in FRAME_FIELDS if field in message_data)
+    chat_writer.enqueue(document)
+
+    # Broadcast to all connections in the trip, on every worker
+    await backplane.publish(trip_id, message_data['seq'], json.dumps(message_data))
+
+async def generate_itinerary(payload: dict) -> dict:
+    # A stand-in answer is no itinerary; let the job fail instead
+    response = await cached_suggestion(
+        payload['prompt'], payload.get('context', {}), fallback=False, user_id=payload.get('user_id')
+    )
+    return {'suggestion': suggestion_text(response), 'response': response}
+
+async def announce_job(job: dict) -> None:
+    # Unsequenced 'job' frame; clients that miss it poll /ai/jobs/{job_id}
+    if job['tripId']:
+        await publish_ephemeral(job['tripId'], json.dumps({'type': 'job', **job_view(job)}))
+
+# Full itineraries are generated as background jobs by a bounded worker pool;
+# set AI_JOBS_BACKEND=firestore to keep jobs in Firestore across workers
+ai_jobs = JobQueue(
+    {'itinerary': generate_itinerary},
+    workers=int(os.getenv('AI_JOB_WORKERS', '4')),
+    max_pending=int(os.getenv('AI_JOB_MAX_PENDING', '100')),
+    result_ttl=float(os.getenv('AI_JOB_RESULT_TTL_S', '600')),
+    store=FirestoreJobStore(store) if os.getenv('AI_JOBS_BACKEND', 'memory') == 'firestore' else None,
+    on_finish=announce_job,
+    lease_ttl=float(os.getenv('AI_JOB_LEASE_TTL_S', '60')),
+)
+
+# Reorders a day's itinerary locally, without an ADK call or credit spend
+optimizer = ItineraryOptimizer(speed_kmh=float(os.getenv('ITINERARY_TRAVEL_SPEED_KMH', '20')))
+ITINERARY_MAX_STOPS = int(os.getenv('ITINERARY_MAX_STOPS', '1000'))
+# Larger days are optimized in a thread so the event loop stays responsive
+ITINERARY_INLINE_STOPS = 100
+
+# Agent replies streamed into chat rooms as partial frames, then one message;
+# replies that reach ADK are charged to the user who asked
+agent_replies = AgentReplies(
+    lambda prompt, context, user_id: suggestion_stream(
+        adk, suggestion_cache, prompt, context, intents, credits, user_id
+    ),
+    publish_ephemeral,
+    post_chat_message,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    chat_writer.start()
+    await backplane.start()
+    heartbeats.start()
+    await suggestion_cache.start()
+    await credits.start()
+    await ai_jobs.start()
+    yield
+    await ai_jobs.stop()
+    await heartbeats.stop()
+    await agent_replies.stop()
+    await backplane.stop()
+    await adk.close()
+    await suggestion_cache.stop()
+    # Return leased credits and record what was spent
+    await credits.stop()
+    store.cache.stop()
+    # Flush queued chat messages before the worker exits
+    await chat_writer.stop()
+
+app = FastAPI(title="Trip Wizards API", version="0.1.0", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -32,11 +327,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# WebSocket connections storage
-active_connections: Dict[str, List[WebSocket]] = {}
-
 class AISuggestRequest(BaseModel):
     prompt: str
+    trip_id: Optional[str] = None
+    # Charged one credit per answer when given
+    user_id: Optional[str] = None
+
+class AIJobRequest(BaseModel):
+    prompt: str = 'Plan our trip day by day'
+    trip_id: Optional[str] = None
+    kind: str = 'itinerary'
+    user_id: Optional[str] = None
+
+class OptimizeItineraryRequest(BaseModel):
+    items: List[dict]
+    day_start: str = '09:00'
+    start_id: Optional[str] = None
+
+class AISuggestBatchRequest(BaseModel):
+    prompts: List[str]
+    trip_id: Optional[str] = None
+    stream: bool = False
+    user_id: Optional[str] = None
 
 class PublishTripRequest(BaseModel):
     trip_id: str
@@ -56,27 +368,115 @@ class ConfirmPaymentRequest(BaseModel):
 
 @app.post("/ai/suggest")
 async def ai_suggest(request: AISuggestRequest):
-    # Mock AI response - in production, integrate with ADK
-    prompt = request.prompt.lower()
-    if 'restaurant' in prompt:
-        return {"suggestion": 'I recommend trying local cuisine at "The Golden Fork" - a highly rated restaurant specializing in regional dishes.'}
-    elif 'activity' in prompt:
-        return {"suggestion": 'For outdoor activities, consider hiking in the nearby national park or visiting the local museum.'}
-    else:
-        return {"suggestion": 'Based on your trip details, I suggest planning your itinerary around the main attractions and local transportation options.'}
+    # Destination and dates of the trip shape the answer and the cache key
+    context = trip_context(await store.get('trips', request.trip_id)) if request.trip_id else {}
+    try:
+        response = await cached_suggestion(request.prompt, context, user_id=request.user_id)
+    except AdkError as e:
+        headers = {'Retry-After': str(int(e.retry_after))} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=e.message, headers=headers)
+    return {"suggestion": suggestion_text(response)}
+
+@app.post("/ai/suggest/batch")
+async def ai_suggest_batch(request: AISuggestBatchRequest):
+    """
+    Suggestions for many prompts sharing one trip context.
+    Returns {"results": [...]} in prompt order; with "stream": true, results
+    are sent as newline-delimited JSON as each one completes, tagged with
+    their index. Failed items carry error, message and status.
+    """
+    if not request.prompts:
+        raise HTTPException(status_code=400, detail="No prompts given")
+    if len(request.prompts) > ai_batches.max_prompts:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {ai_batches.max_prompts} prompts per batch",
+        )
+    context = trip_context(await store.get('trips', request.trip_id)) if request.trip_id else {}
+
+    async def suggest(prompt: str) -> dict:
+        return await cached_suggestion(prompt, context, user_id=request.user_id)
+
+    if request.stream:
+        async def lines():
+            async for result in ai_batches.as_completed(request.prompts, suggest):
+                yield json.dumps(result) + '\n'
+
+        return StreamingResponse(lines(), media_type='application/x-ndjson')
+    return {"results": await ai_batches.ordered(request.prompts, suggest)}
+
+@app.post("/ai/suggest/stream")
+async def ai_suggest_stream(request: AISuggestRequest):
+    """
+    Stream a suggestion as Server-Sent Events while ADK produces it.
+    Emits 'delta' and 'item' events with partial text, then 'done' with the
+    full suggestion, or 'error' if ADK fails mid-stream.
+    """
+    context = trip_context(await store.get('trips', request.trip_id)) if request.trip_id else {}
+    chunks = suggestion_stream(
+        adk, suggestion_cache, request.prompt, context, intents, credits, request.user_id
+    )
+    return StreamingResponse(
+        sse_suggestion_events(chunks),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.post("/ai/itinerary/optimize")
+async def optimize_itinerary(request: OptimizeItineraryRequest):
+    """
+    Reorder a day's items to minimize travel time within their time windows.
+    Items need an id and coordinates {lat, lng}; startTime/endTime mark a
+    booked slot, window {start, end} the allowed start times. The answer has
+    the ADK itinerary_optimization shape.
+    """
+    if len(request.items) > ITINERARY_MAX_STOPS:
+        raise HTTPException(status_code=400, detail=f"At most {ITINERARY_MAX_STOPS} items per day")
+    try:
+        if len(request.items) <= ITINERARY_INLINE_STOPS:
+            return optimizer.optimize(request.items, request.day_start, request.start_id)
+        return await asyncio.to_thread(
+            optimizer.optimize, request.items, request.day_start, request.start_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/ai/jobs", status_code=202)
+async def submit_ai_job(request: AIJobRequest):
+    """
+    Queue a long-running AI job, such as full itinerary generation.
+    Poll GET /ai/jobs/{job_id} for the result; when trip_id is given, a 'job'
+    frame is also pushed to the trip's chat room once the job finishes.
+    """
+    context = trip_context(await store.get('trips', request.trip_id)) if request.trip_id else {}
+    try:
+        job = await ai_jobs.submit(
+            request.kind,
+            {'prompt': request.prompt, 'context': context, 'user_id': request.user_id},
+            request.trip_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '5'})
+    return {"job_id": job['id'], "status": job['status']}
+
+@app.get("/ai/jobs/{job_id}")
+async def get_ai_job(job_id: str):
+    job = await ai_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_view(job)
 
 @app.post("/api/v1/community/publish")
 async def publish_trip(request: PublishTripRequest):
     try:
         # Get the original trip
-        trip_ref = db.collection('trips').document(request.trip_id)
-        trip_doc = trip_ref.get()
+        trip_data = await store.get('trips', request.trip_id)
 
-        if not trip_doc.exists:
+        if trip_data is None:
             raise HTTPException(status_code=404, detail="Trip not found")
 
-        trip_data = trip_doc.to_dict()
-
         # Sanitize the trip data (remove PII)
         sanitized_data = {
             'originalTripId': request.trip_id,
@@ -94,65 +494,111 @@ async def publish_trip(request: PublishTripRequest):
         }
 
         # Create community trip
-        community_ref = db.collection('community_trips').document()
-        community_ref.set(sanitized_data)
+        community_trip_id = await store.add('community_trips', sanitized_data)
 
-        return {"message": "Trip published successfully", "community_trip_id": community_ref.id}
+        return {"message": "Trip published successfully", "community_trip_id": community_trip_id}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    # Mock AI response - in production, integrate with ADK
-    prompt = request.prompt.lower()
-    if 'restaurant' in prompt:
-        return {"suggestion": 'I recommend trying local cuisine at "The Golden Fork" - a highly rated restaurant specializing in regional dishes.'}
-    elif 'activity' in prompt:
-        return {"suggestion": 'For outdoor activities, consider hiking in the nearby national park or visiting the local museum.'}
-    else:
-        return {"suggestion": 'Based on your trip details, I suggest planning your itinerary around the main attractions and local transportation options.'}
 
 @app.websocket("/ws/chat/{trip_id}")
-async def chat_websocket(websocket: WebSocket, trip_id: str):
-    await websocket.accept()
-    if trip_id not in active_connections:
-        active_connections[trip_id] = []
-    active_connections[trip_id].append(websocket)
+async def chat_websocket(
+    websocket: WebSocket,
+    trip_id: str,
+    resume_from: Optional[int] = None,
+    batch: bool = False,
+    heartbeat: bool = False,
+):
+    # JSON unless the client offers a binary subprotocol we support
+    requested = websocket.scope.get('subprotocols', [])
+    codec = negotiate(requested)
+    await websocket.accept(subprotocol=codec.protocol if codec.protocol in requested else None)
+    # Join paused so live frames queue up behind any replayed history;
+    # ?batch=true clients accept coalesced array frames, ?heartbeat=true
+    # clients answer pings and are reaped when they go silent
+    connection = rooms.join(
+        trip_id, websocket, start=False, codec=codec, batched=batch, heartbeat=heartbeat
+    )
+    history.track(trip_id)
+    presence.track(trip_id)
+    await backplane.subscribe(trip_id)
+
+    # Senders seen on this socket, announced offline when it closes
+    senders = set()
+    bucket = rate_limiter.socket_bucket()
+    ephemeral_bucket = rate_limiter.ephemeral_bucket()
+    close_code = None
 
     try:
+        replayed_through = 0
+        if resume_from is not None:
+            for seq, frame in await history.replay(trip_id, resume_from):
+                await connection.send(codec.encode_frame(frame))
+                replayed_through = seq
+        connection.start(skip_through=replayed_through)
+
         while True:
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
-
-            # Add timestamp and trip_id to the message
-            message_data["timestamp"] = datetime.utcnow().isoformat()
-            message_data["trip_id"] = trip_id
-
-            # Store message in Firestore for persistence
-            try:
-                db.collection('chat_messages').add({
-                    'tripId': trip_id,
-                    'message': message_data.get('message', ''),
-                    'sender': message_data.get('sender', 'unknown'),
-                    'isAgent': message_data.get('isAgent', False),
-                    'timestamp': message_data['timestamp']
-                })
-            except Exception as e:
-                print(f"Failed to store message: {e}")
-
-            # Broadcast to all connections in the trip
-            for connection in active_connections[trip_id]:
-                try:
-                    await connection.send_text(json.dumps(message_data))
-                except Exception as e:
-                    print(f"Failed to send message to connection: {e}")
-                    # Remove broken connections
-                    if connection in active_connections[trip_id]:
-                        active_connections[trip_id].remove(connection)
+            received = await heartbeats.receive(websocket, connection)
+            if received['type'] == 'websocket.disconnect':
+                raise WebSocketDisconnect(received.get('code', 1000))
+            message_data = codec.decode(received.get('bytes') or received.get('text'))
+
+            # Liveness frames only refresh the connection's last-seen time
+            if message_data.get('type') == PONG:
+                continue
+            if message_data.get('type') == PING:
+                connection.offer(codec.encode({'type': PONG}))
+                continue
+
+            if is_ephemeral(message_data):
+                # Never persisted or sequenced, only fanned out; cheaper than
+                # messages, but still limited along with the senders spoken for
+                sender = message_data.get('sender', 'unknown')
+                speaking = sender in senders
+                if not rate_limiter.admit_ephemeral(ephemeral_bucket, senders, sender):
+                    continue
+                if not speaking:
+                    presence.join(trip_id, sender)
+                await presence.update(trip_id, sender, message_data['type'], message_data.get('state'))
+                continue
+
+            # Each message costs a write and a fan-out; over the limit it is
+            # dropped, delayed or the socket is closed, per policy
+            if not await rate_limiter.admit(trip_id, bucket):
+                continue
+
+            await post_chat_message(trip_id, message_data)
+
+            # {"type": "agent"} messages also get a reply streamed into the room
+            if message_data.get('type') == AGENT_REQUEST:
+                trip = await store.get('trips', trip_id)
+                agent_replies.start(
+                    trip_id, message_data.get('message', ''), trip_context(trip), message_data.get('sender')
+                )
 
     except WebSocketDisconnect:
-        if trip_id in active_connections and websocket in active_connections[trip_id]:
-            active_connections[trip_id].remove(websocket)
-            if not active_connections[trip_id]:
-                del active_connections[trip_id]
+        pass
+    except RateLimitExceeded:
+        close_code = RATE_LIMIT_CLOSE_CODE
+    except IdleConnection:
+        close_code = IDLE_CLOSE_CODE
+    finally:
+        await rooms.leave(connection, close_code)
+        for sender in senders:
+            await presence.leave(trip_id, sender)
+        if not rooms.connection_count(trip_id):
+            await backplane.unsubscribe(trip_id)
+            history.forget(trip_id)
+            presence.forget(trip_id)
+            rate_limiter.forget(trip_id)
+
+@app.get("/api/v1/chat/{trip_id}/presence")
+async def chat_presence(trip_id: str):
+    """
+    Latest typing, presence and cursor state per user in a trip chat room.
+    Served from memory; only rooms with connections on this worker are known.
+    """
+    return {"trip_id": trip_id, "users": presence.snapshot(trip_id)}
 
 @app.post("/api/v1/billing/subscribe")
 async def subscribe(request: SubscribeRequest):
@@ -188,36 +634,35 @@ async def confirm_payment(request: ConfirmPaymentRequest):
         if not payment_verified:
             raise HTTPException(status_code=400, detail="Payment verification failed")
 
-        # Update user subscription in Firestore
-        user_ref = db.collection('users').document(request.userId)
-        user_ref.update({
-            'subscriptionPlan': request.plan,
-            'updatedAt': datetime.utcnow()
-        })
-
-        # Update or initialize user credits
-        credits_ref = db.collection('user_credits').document(request.userId)
+        # Update subscription, credits and billing record in one batched commit
         plan_credits = {'free': 10, 'pro': 100, 'enterprise': 1000}
-        credits_ref.set({
-            'remainingCredits': plan_credits.get(request.plan, 10),
-            'totalCredits': plan_credits.get(request.plan, 10),
-            'lastReset': datetime.utcnow(),
-            'updatedAt': datetime.utcnow()
-        })
-
-        # Create billing record
-        billing_ref = db.collection('billing').document()
         amount_map = {'pro': 9.99, 'enterprise': 49.99, 'free': 0.0}
-        billing_ref.set({
-            'userId': request.userId,
-            'amount': amount_map.get(request.plan, 0.0),
-            'currency': 'USD',
-            'period': 'monthly',
-            'status': 'paid',
-            'stripePaymentId': request.paymentIntentId,
-            'createdAt': datetime.utcnow(),
-            'paidAt': datetime.utcnow()
-        })
+        await store.write_batch([
+            ('update', store.document('users', request.userId), {
+                'subscriptionPlan': request.plan,
+                'updatedAt': datetime.utcnow()
+            }),
+            # Update or initialize user credits; merged, so leasedCredits
+            # still accounts for leases workers hold
+            ('merge', store.document('user_credits', request.userId), {
+                'remainingCredits': plan_credits.get(request.plan, 10),
+                'totalCredits': plan_credits.get(request.plan, 10),
+                'usedCredits': 0,
+                'lastReset': datetime.utcnow(),
+                'updatedAt': datetime.utcnow()
+            }),
+            # Create billing record
+            ('set', store.document('billing'), {
+                'userId': request.userId,
+                'amount': amount_map.get(request.plan, 0.0),
+                'currency': 'USD',
+                'period': 'monthly',
+                'status': 'paid',
+                'stripePaymentId': request.paymentIntentId,
+                'createdAt': datetime.utcnow(),
+                'paidAt': datetime.utcnow()
+            }),
+        ])
 
         return {"message": "Payment confirmed and subscription activated successfully"}
     except HTTPException as e:
@@ -232,59 +677,98 @@ class CreateOrganizationRequest(BaseModel):
 class InviteUserRequest(BaseModel):
     email: str
 
+class BulkInviteRequest(BaseModel):
+    emails: List[str]
+
+class BulkMembersRequest(BaseModel):
+    userIds: List[str]
+
+def check_email(email: str) -> None:
+    # Invites are stored under the email as document ID
+    if not email or '/' in email:
+        raise HTTPException(status_code=400, detail="Invalid email")
+
+def check_bulk_size(items: list) -> None:
+    if len(items) > org_members.max_bulk:
+        raise HTTPException(status_code=400, detail=f"At most {org_members.max_bulk} per request")
+
 # Organization endpoints
 @app.post("/api/v1/orgs")
 async def create_organization(request: CreateOrganizationRequest):
     try:
         # Check if user has enterprise plan
-        user_ref = db.collection('users').document(request.adminId)
-        user_doc = user_ref.get()
-        if not user_doc.exists:
+        user_data = await store.get('users', request.adminId)
+        if user_data is None:
             raise HTTPException(status_code=404, detail="User not found")
 
-        user_data = user_doc.to_dict()
         if user_data.get('subscriptionPlan') != 'enterprise':
             raise HTTPException(status_code=403, detail="Enterprise plan required to create organizations")
 
-        # Create organization
-        org_ref = db.collection('organizations').document()
-        org_ref.set({
+        # Create organization with its admin as first member in one commit
+        org_ref = store.document('organizations')
+        org_data = {
             'name': request.name,
             'adminId': request.adminId,
-            'memberIds': [request.adminId],
-            'pendingInvites': [],
             'createdAt': datetime.utcnow(),
             'updatedAt': datetime.utcnow()
-        })
+        }
+        await store.write_batch(
+            [('set', org_ref, org_data)]
+            + org_members.member_writes(org_ref.id, org_data, request.adminId, role='admin')
+        )
+        org_id = org_ref.id
+        org_index.added(request.adminId, org_id, org_data)
 
-        return {"id": org_ref.id, "message": "Organization created successfully"}
+        return {"id": org_id, "message": "Organization created successfully"}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/orgs/{org_id}")
 async def get_organization(org_id: str):
     try:
-        org_ref = db.collection('organizations').document(org_id)
-        org_doc = org_ref.get()
-
-        if not org_doc.exists:
-            raise HTTPException(status_code=404, detail="Organization not found")
-
-        return {"id": org_doc.id, **org_doc.to_dict()}
+        org_data = await org_members.organization(org_id)
+        return {"id": org_id, **org_data}
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/orgs")
 async def get_user_organizations(user_id: str):
     try:
-        orgs_ref = db.collection('organizations').where('memberIds', 'array_contains', user_id)
-        orgs = orgs_ref.stream()
+        return {"organizations": await org_index.organizations(user_id)}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        result = []
-        for org in orgs:
-            result.append({"id": org.id, **org.to_dict()})
+@app.get("/api/v1/orgs/{org_id}/members")
+async def list_org_members(org_id: str, limit: int = 100, start_after: Optional[str] = None):
+    """
+    One page of members ordered by user ID; pass nextPageToken as
+    start_after for the next page.
+    """
+    try:
+        members, next_token = await org_members.members(org_id, max(1, min(limit, 1000)), start_after)
+        return {"members": members, "nextPageToken": next_token}
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"organizations": result}
+@app.get("/api/v1/orgs/{org_id}/invites")
+async def list_org_invites(org_id: str, limit: int = 100, start_after: Optional[str] = None):
+    """
+    One page of pending invites ordered by email; pass nextPageToken as
+    start_after for the next page.
+    """
+    try:
+        invites, next_token = await org_members.invites(org_id, max(1, min(limit, 1000)), start_after)
+        return {"invites": invites, "nextPageToken": next_token}
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -292,25 +776,15 @@ async def get_user_organizations(user_id: str):
 async def invite_user_to_org(org_id: str, request: InviteUserRequest):
     try:
         # Check if user is admin (for now, we'll assume the request comes from admin)
-        org_ref = db.collection('organizations').document(org_id)
-        org_doc = org_ref.get()
-
-        if not org_doc.exists:
-            raise HTTPException(status_code=404, detail="Organization not found")
-
-        org_data = org_doc.to_dict()
-
-        # Add to pending invites
-        current_invites = org_data.get('pendingInvites', [])
-        if request.email in current_invites:
+        check_email(request.email)
+        if not await org_members.invite(org_id, request.email):
             raise HTTPException(status_code=400, detail="Invite already sent")
 
-        org_ref.update({
-            'pendingInvites': current_invites + [request.email],
-            'updatedAt': datetime.utcnow()
-        })
-
         return {"message": f"Invite sent to {request.email}"}
+    except HTTPException as e:
+        raise e
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -318,68 +792,93 @@ async def invite_user_to_org(org_id: str, request: InviteUserRequest):
 async def cancel_invite(org_id: str, request: InviteUserRequest):
     try:
         # Check if user is admin (for now, we'll assume the request comes from admin)
-        org_ref = db.collection('organizations').document(org_id)
-        org_doc = org_ref.get()
-
-        if not org_doc.exists:
-            raise HTTPException(status_code=404, detail="Organization not found")
-
-        org_data = org_doc.to_dict()
-
-        # Remove from pending invites
-        current_invites = org_data.get('pendingInvites', [])
-        if request.email not in current_invites:
+        check_email(request.email)
+        if not await org_members.cancel_invite(org_id, request.email):
             raise HTTPException(status_code=404, detail="Invite not found")
 
-        current_invites.remove(request.email)
-        org_ref.update({
-            'pendingInvites': current_invites,
-            'updatedAt': datetime.utcnow()
-        })
-
         return {"message": f"Invite cancelled for {request.email}"}
+    except HTTPException as e:
+        raise e
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/orgs/{org_id}/invites/bulk")
+async def bulk_invite_to_org(org_id: str, request: BulkInviteRequest):
+    """
+    Invite up to ORG_BULK_MAX emails; invites already pending are renewed.
+    """
+    try:
+        check_bulk_size(request.emails)
+        for email in request.emails:
+            check_email(email)
+        return await org_members.bulk_invite(org_id, request.emails)
+    except HTTPException as e:
+        raise e
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/v1/orgs/{org_id}/members")
-async def add_member_to_org(org_id: str, request: dict):
+async def add_member_to_org(org_id: str, request: dict, loader: DocumentLoader = Depends(document_loader)):
     try:
         # Check if user is admin (for now, we'll assume the request comes from admin)
-        org_ref = db.collection('organizations').document(org_id)
-        org_doc = org_ref.get()
-
-        if not org_doc.exists:
-            raise HTTPException(status_code=404, detail="Organization not found")
-
-        org_data = org_doc.to_dict()
-
         member_id = request.get('userId')
         if not member_id:
             raise HTTPException(status_code=400, detail="userId required")
 
-        # Check if user exists
-        user_ref = db.collection('users').document(member_id)
-        if not user_ref.get().exists:
+        # Read the user and the organization in one get_all
+        user_data, org_data = await asyncio.gather(
+            loader.load('users', member_id),
+            loader.load('organizations', org_id),
+        )
+        if org_data is None:
+            raise HTTPException(status_code=404, detail="Organization not found")
+        if user_data is None:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Add member
-        current_members = org_data.get('memberIds', [])
-        if member_id in current_members:
+        # Add member and remove their invite if present
+        if not await org_members.add(org_id, member_id, request.get('email'), loader=loader):
             raise HTTPException(status_code=400, detail="User is already a member")
 
-        # Remove from pending invites if present
-        current_invites = org_data.get('pendingInvites', [])
-        email_to_remove = request.get('email')
-        if email_to_remove and email_to_remove in current_invites:
-            current_invites.remove(email_to_remove)
+        return {"message": f"User {member_id} added to organization"}
+    except HTTPException as e:
+        raise e
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        org_ref.update({
-            'memberIds': current_members + [member_id],
-            'pendingInvites': current_invites,
-            'updatedAt': datetime.utcnow()
-        })
+@app.post("/api/v1/orgs/{org_id}/members/bulk")
+async def bulk_add_members_to_org(org_id: str, request: BulkMembersRequest):
+    """
+    Add up to ORG_BULK_MAX users; unknown users and existing members are
+    reported instead of failing the request.
+    """
+    try:
+        check_bulk_size(request.userIds)
+        return await org_members.bulk_add(org_id, request.userIds)
+    except HTTPException as e:
+        raise e
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"message": f"User {member_id} added to organization"}
+@app.delete("/api/v1/orgs/{org_id}/members")
+async def bulk_remove_members_from_org(org_id: str, request: BulkMembersRequest):
+    """
+    Remove up to ORG_BULK_MAX users; users who were not members are reported.
+    """
+    try:
+        check_bulk_size(request.userIds)
+        return await org_members.bulk_remove(org_id, request.userIds)
+    except HTTPException as e:
+        raise e
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -407,8 +906,7 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None))
 
             # Update user subscription
             if user_id and plan:
-                user_ref = db.collection('users').document(user_id)
-                user_ref.update({
+                await store.update('users', user_id, {
                     'subscriptionPlan': plan,
                     'updatedAt': datetime.utcnow()
                 })
@@ -419,12 +917,10 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None))
 
             # Downgrade user to free plan
             # Find user by Stripe customer ID and update
-            users_ref = db.collection('users').where('stripeCustomerId', '==', customer_id)
-            for user_doc in users_ref.stream():
-                user_doc.reference.update({
-                    'subscriptionPlan': 'free',
-                    'updatedAt': datetime.utcnow()
-                })
+            await store.update_where('users', 'stripeCustomerId', '==', customer_id, {
+                'subscriptionPlan': 'free',
+                'updatedAt': datetime.utcnow()
+            })
 
         return {"status": "success"}
     except Exception as e:
@@ -434,26 +930,14 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None))
 async def remove_member_from_org(org_id: str, member_id: str):
     try:
         # Check if user is admin (for now, we'll assume the request comes from admin)
-        org_ref = db.collection('organizations').document(org_id)
-        org_doc = org_ref.get()
-
-        if not org_doc.exists:
-            raise HTTPException(status_code=404, detail="Organization not found")
-
-        org_data = org_doc.to_dict()
-
-        # Remove member
-        current_members = org_data.get('memberIds', [])
-        if member_id not in current_members:
+        if not await org_members.remove(org_id, member_id):
             raise HTTPException(status_code=404, detail="User is not a member")
 
-        current_members.remove(member_id)
-        org_ref.update({
-            'memberIds': current_members,
-            'updatedAt': datetime.utcnow()
-        })
-
         return {"message": f"User {member_id} removed from organization"}
+    except HTTPException as e:
+        raise e
+    except OrgNotFound:
+        raise HTTPException(status_code=404, detail="Organization not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -462,6 +946,66 @@ async def remove_member_from_org(org_id: str, member_id: str):
 async def root():
     return {"message": "Trip Wizards API"}
 
+@app.get("/api/v1/admin/metrics")
+async def admin_metrics():
+    """
+    Internal counters for background subsystems of this worker.
+    """
+    return {
+        "chat_persistence": chat_writer.stats(),
+        "chat_rooms": rooms.stats(),
+        "chat_backplane": backplane.stats(),
+        "chat_history": history.stats(),
+        "chat_presence": presence.stats(),
+        "chat_rate_limits": rate_limiter.stats(),
+        "chat_heartbeats": heartbeats.stats(),
+        "adk": adk.stats(),
+        "ai_cache": suggestion_cache.stats(),
+        "ai_single_flight": ai_requests.stats(),
+        "ai_agent_replies": agent_replies.stats(),
+        "ai_batches": ai_batches.stats(),
+        "ai_intents": intents.stats(),
+        "ai_jobs": ai_jobs.stats(),
+        "ai_credits": credits.stats(),
+        "doc_cache": store.cache.stats(),
+        "org_index": org_index.stats(),
+        "org_members": org_members.stats(),
+        "itinerary_optimizer": optimizer.stats(),
+    }
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident memory of this worker, where the platform exposes it."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+@app.get("/api/v1/admin/connections")
+async def admin_connections():
+    """
+    Chat connections on this worker: counts, buffered bytes and an estimate
+    of the memory held per room, for sizing the per-worker connection ceiling.
+    """
+    history_by_room = history.room_stats()
+    room_stats = rooms.room_stats()
+    for trip_id, stats in room_stats.items():
+        buffered = history_by_room.get(trip_id, {'frames': 0, 'bytes': 0})
+        stats['history_frames'] = buffered['frames']
+        stats['history_bytes'] = buffered['bytes']
+        stats['buffered_bytes'] = stats['queued_bytes'] + buffered['bytes']
+
+    connections = rooms.connection_count()
+    rss = process_rss_bytes()
+    return {
+        "connections": connections,
+        "rooms": room_stats,
+        "buffered_bytes": sum(stats['buffered_bytes'] for stats in room_stats.values()),
+        "process_rss_bytes": rss,
+        "rss_bytes_per_connection": rss // connections if rss and connections else None,
+        "heartbeats": heartbeats.stats(),
+    }
+
 @app.get("/health")
 async def health():
     """
@@ -477,7 +1021,7 @@ async def health():
     # Check Firestore connectivity
     try:
         # Attempt a lightweight read operation
-        db.collection('_health_check').limit(1).get()
+        await store.ping()
         health_status["services"]["firestore"] = {
             "status": "healthy",
             "message": "Firestore connection successful"
@@ -491,23 +1035,19 @@ async def health():
 
     # Check ADK connectivity (via HTTP request to ADK service if available)
     try:
-        adk_url = os.getenv('ADK_SERVICE_URL', 'http://localhost:8001/health')
-        timeout = httpx.Timeout(5.0, connect=3.0)
-
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(adk_url)
-            if response.status_code == 200:
-                health_status["services"]["adk"] = {
-                    "status": "healthy",
-                    "message": "ADK service reachable"
-                }
-            else:
-                health_status["services"]["adk"] = {
-                    "status": "unhealthy",
-                    "message": f"ADK service returned status {response.status_code}"
-                }
-                health_status["status"] = "degraded"
-    except httpx.TimeoutException:
+        status_code = await adk.health(deadline=5.0)
+        if status_code == 200:
+            health_status["services"]["adk"] = {
+                "status": "healthy",
+                "message": "ADK service reachable"
+            }
+        else:
+            health_status["services"]["adk"] = {
+                "status": "unhealthy",
+                "message": f"ADK service returned status {status_code}"
+            }
+            health_status["status"] = "degraded"
+    except (httpx.TimeoutException, asyncio.TimeoutError):
         health_status["services"]["adk"] = {
             "status": "unhealthy",
             "message": "ADK service timeout"
@@ -0,0 +1,158 @@
+# User -> organizations index
+# Listing a user's organizations used to scan organizations with an
+# array_contains query and return every full document, member arrays
+# included. The index keeps one user_orgs/{user_id} document per user
+# mapping org IDs to a small summary. It is written in the same batch as the
+# membership change it records. Each worker also holds recent users' entries
+# in memory, so a listing is a dictionary lookup. Users whose memberships
+# predate the index are backfilled the first time they are listed, from a
+# collection group query over members subcollections plus an array_contains
+# query for organizations still keeping memberIds arrays.
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.cloud.firestore import DELETE_FIELD
+
+from .firestore_store import FirestoreStore
+
+# org ID -> (name, adminId)
+Summaries = Dict[str, Tuple[str, str]]
+
+
+def org_summary(org_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of an organization kept in the index."""
+    return {'name': org_data.get('name', ''), 'adminId': org_data.get('adminId')}
+
+
+class OrgIndex:
+    """
+    Maintains and serves the user -> organizations mapping.
+
+    Args:
+        store: Firestore data-access layer
+        max_users: Users whose entries are kept in memory
+        ttl: Seconds an in-memory entry is trusted; memberships changed by
+            other workers are seen after at most this long
+        collection: Collection of index documents
+    """
+
+    def __init__(
+        self,
+        store: FirestoreStore,
+        max_users: int = 10000,
+        ttl: float = 60.0,
+        collection: str = 'user_orgs',
+    ):
+        self.store = store
+        self.max_users = max_users
+        self.ttl = ttl
+        self.collection = collection
+        # user ID -> (expires at, summaries), least recently used first
+        self._users: "OrderedDict[str, Tuple[float, Summaries]]" = OrderedDict()
+        self.hits = 0
+        self.loads = 0
+        self.backfills = 0
+
+    def add_writes(self, user_id: str, org_id: str, org_data: Dict[str, Any]) -> List[Tuple[str, Any, Dict[str, Any]]]:
+        """Batch writes recording that user_id belongs to org_id."""
+        return [('merge', self.store.document(self.collection, user_id), {
+            'orgs': {org_id: org_summary(org_data)},
+            'updatedAt': datetime.utcnow(),
+        })]
+
+    def remove_writes(self, user_id: str, org_id: str) -> List[Tuple[str, Any, Dict[str, Any]]]:
+        """Batch writes recording that user_id left org_id."""
+        return [('merge', self.store.document(self.collection, user_id), {
+            'orgs': {org_id: DELETE_FIELD},
+            'updatedAt': datetime.utcnow(),
+        })]
+
+    def added(self, user_id: str, org_id: str, org_data: Dict[str, Any]) -> None:
+        """Reflect a committed add_writes() in memory."""
+        cached = self._users.get(user_id)
+        if cached is not None:
+            summary = org_summary(org_data)
+            cached[1][org_id] = (summary['name'], summary['adminId'])
+
+    def removed(self, user_id: str, org_id: str) -> None:
+        """Reflect a committed remove_writes() in memory."""
+        cached = self._users.get(user_id)
+        if cached is not None:
+            cached[1].pop(org_id, None)
+
+    async def organizations(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        A user's organizations.
+
+        Returns:
+            [{'id', 'name', 'adminId', 'role'}] where role is 'admin' or
+            'member'
+        """
+        summaries = self._lookup(user_id)
+        if summaries is None:
+            summaries = await self._load(user_id)
+        return [
+            {'id': org_id, 'name': name, 'adminId': admin_id, 'role': 'admin' if admin_id == user_id else 'member'}
+            for org_id, (name, admin_id) in summaries.items()
+        ]
+
+    def _lookup(self, user_id: str) -> Optional[Summaries]:
+        cached = self._users.get(user_id)
+        if cached is None or cached[0] <= time.monotonic():
+            return None
+        self._users.move_to_end(user_id)
+        self.hits += 1
+        return cached[1]
+
+    async def _load(self, user_id: str) -> Summaries:
+        self.loads += 1
+        data = await self.store.get(self.collection, user_id)
+        if data is not None and data.get('complete'):
+            orgs = data.get('orgs', {})
+        else:
+            orgs = await self._backfill(user_id)
+        summaries = {org_id: (summary.get('name', ''), summary.get('adminId')) for org_id, summary in orgs.items()}
+        self._users[user_id] = (time.monotonic() + self.ttl, summaries)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return summaries
+
+    async def _backfill(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Build a user's entry from membership queries and persist it."""
+        self.backfills += 1
+        memberships, legacy = await asyncio.gather(
+            self.store.query_group('members', 'userId', '==', user_id),
+            self.store.query('organizations', 'memberIds', 'array_contains', user_id),
+        )
+        # organizations/{org_id}/members/{user_id}
+        org_ids = [path.split('/')[1] for path, _ in memberships if path.startswith('organizations/')]
+        orgs = {org_id: org_summary(org_data) for org_id, org_data in legacy}
+        if org_ids:
+            for org_id, org_data in (await self.store.get_many('organizations', org_ids)).items():
+                if org_data is not None:
+                    orgs[org_id] = org_summary(org_data)
+        try:
+            # Merged, so an add committed meanwhile is kept
+            await self.store.write_batch([('merge', self.store.document(self.collection, user_id), {
+                'orgs': orgs,
+                'complete': True,
+                'updatedAt': datetime.utcnow(),
+            })])
+        except Exception as e:
+            print(f"Failed to store organization index for user {user_id}: {e}")
+        return orgs
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.loads
+        return {
+            'users': len(self._users),
+            'hits': self.hits,
+            'loads': self.loads,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'backfills': self.backfills,
+        }
@@ -0,0 +1,289 @@
+# Organization members and invites
+# Members and pending invites used to be memberIds and pendingInvites arrays
+# on the organization document. Every change rewrote the array, and the 1 MiB
+# document limit capped how large an organization could grow. They now live
+# in subcollections, one document per member and per invite:
+#
+#   organizations/{org_id}/members/{user_id}  {userId, role, addedAt}
+#   organizations/{org_id}/invites/{email}    {email, invitedAt}
+#
+# Single changes are one batch whose create/exists preconditions make
+# "already a member" and "not a member" checks atomic. Bulk changes read
+# and write in chunks, several chunks at a time. Organizations that still
+# carry the arrays are moved over the first time their members are touched.
+
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore import DELETE_FIELD
+
+from .doc_loader import DocumentLoader
+from .firestore_store import FirestoreStore
+from .org_index import OrgIndex
+
+Write = Tuple[str, Any, Optional[Dict[str, Any]]]
+
+# Writes per Firestore batch or transaction
+BATCH_LIMIT = 500
+
+
+class OrgNotFound(Exception):
+    """Raised when the organization being read or changed does not exist."""
+
+
+class OrgMembers:
+    """
+    Reads and changes organization membership.
+
+    Args:
+        store: Firestore data-access layer
+        org_index: User -> organizations index, written with every change
+        chunk_size: Documents per get_all call or per batch of member writes
+        concurrency: Chunks read or written at the same time
+        max_bulk: Most users or emails accepted by one bulk call
+    """
+
+    def __init__(
+        self,
+        store: FirestoreStore,
+        org_index: OrgIndex,
+        chunk_size: int = 250,
+        concurrency: int = 8,
+        max_bulk: int = 10000,
+    ):
+        self.store = store
+        self.org_index = org_index
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.max_bulk = max_bulk
+        self.batches = 0
+        self.migrated = 0
+
+    def _members(self, org_id: str) -> str:
+        return f"organizations/{org_id}/members"
+
+    def _invites(self, org_id: str) -> str:
+        return f"organizations/{org_id}/invites"
+
+    def member_writes(
+        self, org_id: str, org_data: Dict[str, Any], user_id: str, role: str = 'member', operation: str = 'set'
+    ) -> List[Write]:
+        """Writes adding user_id to an organization, index entry included."""
+        return [(operation, self.store.document(self._members(org_id), user_id), {
+            'userId': user_id,
+            'role': role,
+            'addedAt': datetime.utcnow(),
+        })] + self.org_index.add_writes(user_id, org_id, org_data)
+
+    async def organization(self, org_id: str, loader: Optional[DocumentLoader] = None) -> Dict[str, Any]:
+        """
+        The organization document, with any legacy member arrays moved to the
+        subcollections first.
+
+        Args:
+            loader: The request's loader, to share its read of the organization
+
+        Raises:
+            OrgNotFound: If the organization does not exist
+        """
+        org_data = await (loader or self.store).get('organizations', org_id)
+        if org_data is None:
+            raise OrgNotFound(org_id)
+        if 'memberIds' in org_data or 'pendingInvites' in org_data:
+            await self._migrate(org_id)
+            org_data.pop('memberIds', None)
+            org_data.pop('pendingInvites', None)
+        return org_data
+
+    async def _migrate(self, org_id: str) -> None:
+        # Each transaction moves one chunk off the arrays, so two workers
+        # migrating at once never move the same entry twice
+        org_ref = self.store.document('organizations', org_id)
+
+        async def move_chunk(transaction) -> bool:
+            org_data = await self.store.get('organizations', org_id, transaction=transaction)
+            if org_data is None:
+                return False
+            members = org_data.get('memberIds') or []
+            invites = org_data.get('pendingInvites') or []
+            if 'memberIds' not in org_data and 'pendingInvites' not in org_data:
+                return False
+            take = BATCH_LIMIT - 1
+            moved_members, members = members[:take], members[take:]
+            moved_invites, invites = invites[:take - len(moved_members)], invites[take - len(moved_members):]
+            for user_id in moved_members:
+                role = 'admin' if user_id == org_data.get('adminId') else 'member'
+                transaction.set(self.store.document(self._members(org_id), user_id), {
+                    'userId': user_id, 'role': role, 'addedAt': org_data.get('createdAt') or datetime.utcnow(),
+                })
+            for email in moved_invites:
+                transaction.set(self.store.document(self._invites(org_id), email), {
+                    'email': email, 'invitedAt': datetime.utcnow(),
+                })
+            transaction.update(org_ref, {
+                'memberIds': members or DELETE_FIELD,
+                'pendingInvites': invites or DELETE_FIELD,
+                'updatedAt': datetime.utcnow(),
+            })
+            return bool(members or invites)
+
+        try:
+            while await self.store.run_transaction(move_chunk):
+                pass
+        finally:
+            self.store.forget('organizations', org_id)
+        self.migrated += 1
+
+    async def members(
+        self, org_id: str, limit: int, start_after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of members ordered by user ID.
+
+        Returns:
+            (members, user ID to pass as start_after for the next page, or
+            None on the last page)
+        """
+        await self.organization(org_id)
+        page = await self.store.page(self._members(org_id), 'userId', limit, start_after)
+        members = [data for _, data in page]
+        return members, (members[-1]['userId'] if len(members) == limit else None)
+
+    async def invites(
+        self, org_id: str, limit: int, start_after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of pending invites ordered by email, like members()."""
+        await self.organization(org_id)
+        page = await self.store.page(self._invites(org_id), 'email', limit, start_after)
+        invites = [data for _, data in page]
+        return invites, (invites[-1]['email'] if len(invites) == limit else None)
+
+    async def invite(self, org_id: str, email: str) -> bool:
+        """Record an invite; returns False if one is already pending."""
+        await self.organization(org_id)
+        try:
+            await self.store.write_batch([('create', self.store.document(self._invites(org_id), email), {
+                'email': email,
+                'invitedAt': datetime.utcnow(),
+            })])
+        except AlreadyExists:
+            return False
+        return True
+
+    async def cancel_invite(self, org_id: str, email: str) -> bool:
+        """Drop a pending invite; returns False if there was none."""
+        await self.organization(org_id)
+        try:
+            await self.store.write_batch([('delete_existing', self.store.document(self._invites(org_id), email), None)])
+        except NotFound:
+            return False
+        return True
+
+    async def add(
+        self, org_id: str, user_id: str, email: Optional[str] = None, loader: Optional[DocumentLoader] = None
+    ) -> bool:
+        """
+        Add a member, dropping their invite for email if given; returns False
+        if they are already a member.
+        """
+        org_data = await self.organization(org_id, loader)
+        writes = self.member_writes(org_id, org_data, user_id, operation='create')
+        if email:
+            writes.append(('delete', self.store.document(self._invites(org_id), email), None))
+        try:
+            await self.store.write_batch(writes)
+        except AlreadyExists:
+            return False
+        self.org_index.added(user_id, org_id, org_data)
+        return True
+
+    async def remove(self, org_id: str, user_id: str) -> bool:
+        """Remove a member; returns False if they were not one."""
+        await self.organization(org_id)
+        writes = [('delete_existing', self.store.document(self._members(org_id), user_id), None)]
+        try:
+            await self.store.write_batch(writes + self.org_index.remove_writes(user_id, org_id))
+        except NotFound:
+            return False
+        self.org_index.removed(user_id, org_id)
+        return True
+
+    async def bulk_invite(self, org_id: str, emails: List[str]) -> Dict[str, Any]:
+        """Record invites for many emails; existing invites are renewed."""
+        await self.organization(org_id)
+        emails = list(dict.fromkeys(emails))
+        invited_at = datetime.utcnow()
+        await self._commit([
+            ('set', self.store.document(self._invites(org_id), email), {'email': email, 'invitedAt': invited_at})
+            for email in emails
+        ])
+        return {'invited': len(emails)}
+
+    async def bulk_add(self, org_id: str, user_ids: List[str]) -> Dict[str, Any]:
+        """
+        Add many members at once. Unknown users and existing members are
+        skipped and reported.
+        """
+        org_data = await self.organization(org_id)
+        user_ids = list(dict.fromkeys(user_ids))
+        users, members = await asyncio.gather(
+            self._get_many('users', user_ids),
+            self._get_many(self._members(org_id), user_ids),
+        )
+        not_found = [user_id for user_id in user_ids if users[user_id] is None]
+        already = [user_id for user_id in user_ids if users[user_id] is not None and members[user_id] is not None]
+        added = [user_id for user_id in user_ids if users[user_id] is not None and members[user_id] is None]
+        writes: List[Write] = []
+        for user_id in added:
+            writes.extend(self.member_writes(org_id, org_data, user_id))
+        await self._commit(writes)
+        for user_id in added:
+            self.org_index.added(user_id, org_id, org_data)
+        return {'added': len(added), 'alreadyMembers': already, 'notFound': not_found}
+
+    async def bulk_remove(self, org_id: str, user_ids: List[str]) -> Dict[str, Any]:
+        """Remove many members at once; users who were not members are reported."""
+        await self.organization(org_id)
+        user_ids = list(dict.fromkeys(user_ids))
+        members = await self._get_many(self._members(org_id), user_ids)
+        removed = [user_id for user_id in user_ids if members[user_id] is not None]
+        writes: List[Write] = []
+        for user_id in removed:
+            writes.append(('delete', self.store.document(self._members(org_id), user_id), None))
+            writes.extend(self.org_index.remove_writes(user_id, org_id))
+        await self._commit(writes)
+        for user_id in removed:
+            self.org_index.removed(user_id, org_id)
+        return {'removed': len(removed), 'notMembers': [user_id for user_id in user_ids if members[user_id] is None]}
+
+    async def _get_many(self, collection: str, doc_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        chunks = [doc_ids[start:start + self.chunk_size] for start in range(0, len(doc_ids), self.chunk_size)]
+        result: Dict[str, Optional[Dict[str, Any]]] = {}
+        for found in await self._bounded([lambda chunk=chunk: self.store.get_many(collection, chunk) for chunk in chunks]):
+            result.update(found)
+        return result
+
+    async def _commit(self, writes: List[Write]) -> None:
+        # Member writes come in (member, index) pairs; an even batch size keeps
+        # each pair in one batch
+        size = min(BATCH_LIMIT, 2 * self.chunk_size)
+        chunks = [writes[start:start + size] for start in range(0, len(writes), size)]
+        await self._bounded([lambda chunk=chunk: self.store.write_batch(chunk) for chunk in chunks])
+        self.batches += len(chunks)
+
+    async def _bounded(self, calls: List[Callable[[], Awaitable[Any]]]) -> List[Any]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(call):
+            async with semaphore:
+                return await call()
+
+        return await asyncio.gather(*(run(call) for call in calls))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'migrated': self.migrated,
+        }
@@ -0,0 +1,146 @@
+# Local stand-in for Redis
+# Speaks enough RESP2 for the chat backplane so multi-worker setups can be run
+# and tested without a Redis server:
+#     python -m trip_wizards.resp_broker --port 6380
+# then start workers with CHAT_BACKPLANE_URL=redis://localhost:6380
+
+import argparse
+import asyncio
+import time
+from contextlib import suppress
+from typing import Dict, Optional, Set, Tuple
+
+from .resp_client import encode_command, read_reply
+
+
+class LocalPubSubBroker:
+    """
+    In-memory RESP server supporting PING, GET, SET (NX/EX), INCR, PUBLISH,
+    SUBSCRIBE and UNSUBSCRIBE.
+    """
+
+    def __init__(self):
+        self.channels: Dict[str, Set[asyncio.StreamWriter]] = {}
+        # key -> (value, expiry as time.monotonic() or None)
+        self.values: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 6380) -> int:
+        """Start listening. Returns the bound port (useful with port=0)."""
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscriptions: Set[str] = set()
+        self._clients.add(writer)
+        try:
+            while True:
+                command = await read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    continue
+                name = command[0].decode().upper()
+                args = command[1:]
+                self._dispatch(name, args, writer, subscriptions)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            for channel in subscriptions:
+                self._unsubscribe(channel, writer)
+            self._clients.discard(writer)
+            writer.close()
+
+    def _dispatch(self, name: str, args, writer: asyncio.StreamWriter, subscriptions: Set[str]) -> None:
+        if name == 'PING':
+            writer.write(b"+PONG\r\n")
+        elif name == 'GET':
+            value = self._get(args[0])
+            writer.write(b"$-1\r\n" if value is None else encode_bulk(value))
+        elif name == 'SET':
+            key, value = args[0], args[1]
+            options = [arg.decode().upper() for arg in args[2:]]
+            if 'NX' in options and self._get(key) is not None:
+                writer.write(b"$-1\r\n")
+                return
+            expiry = None
+            if 'EX' in options:
+                expiry = time.monotonic() + int(options[options.index('EX') + 1])
+            self.values[key] = (value, expiry)
+            writer.write(b"+OK\r\n")
+        elif name == 'INCR':
+            current = int(self._get(args[0]) or 0) + 1
+            self.values[args[0]] = (str(current).encode(), None)
+            writer.write(f":{current}\r\n".encode())
+        elif name == 'PUBLISH':
+            channel, payload = args[0].decode(), args[1]
+            receivers = self.channels.get(channel, set())
+            for receiver in receivers:
+                receiver.write(encode_command('message', channel, payload))
+            writer.write(f":{len(receivers)}\r\n".encode())
+        elif name == 'SUBSCRIBE':
+            for channel in (arg.decode() for arg in args):
+                subscriptions.add(channel)
+                self.channels.setdefault(channel, set()).add(writer)
+                writer.write(self._subscription_reply('subscribe', channel, len(subscriptions)))
+        elif name == 'UNSUBSCRIBE':
+            for channel in [arg.decode() for arg in args] or list(subscriptions):
+                subscriptions.discard(channel)
+                self._unsubscribe(channel, writer)
+                writer.write(self._subscription_reply('unsubscribe', channel, len(subscriptions)))
+        else:
+            writer.write(f"-ERR unknown command '{name}'\r\n".encode())
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.values.get(key)
+        if entry is None:
+            return None
+        value, expiry = entry
+        if expiry is not None and expiry <= time.monotonic():
+            del self.values[key]
+            return None
+        return value
+
+    def _unsubscribe(self, channel: str, writer: asyncio.StreamWriter) -> None:
+        writers = self.channels.get(channel)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.channels[channel]
+
+    @staticmethod
+    def _subscription_reply(kind: str, channel: str, count: int) -> bytes:
+        return (
+            f"*3\r\n${len(kind)}\r\n{kind}\r\n"
+            f"${len(channel.encode())}\r\n{channel}\r\n:{count}\r\n"
+        ).encode()
+
+
+def encode_bulk(value: bytes) -> bytes:
+    return f"${len(value)}\r\n".encode() + value + b"\r\n"
+
+
+async def serve(host: str, port: int) -> None:
+    broker = LocalPubSubBroker()
+    bound = await broker.start(host, port)
+    print(f"Local RESP broker listening on {host}:{bound}")
+    with suppress(asyncio.CancelledError):
+        await asyncio.Event().wait()
+    await broker.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local RESP broker')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6380)
+    args = parser.parse_args()
+    with suppress(KeyboardInterrupt):
+        asyncio.run(serve(args.host, args.port))
@@ -0,0 +1,141 @@
+# Minimal asyncio client for the Redis serialization protocol (RESP2)
+# Used for cross-worker features without adding a Redis client dependency.
+# Commands are pipelined: replies are matched to callers in FIFO order.
+
+import asyncio
+from collections import deque
+from contextlib import suppress
+from typing import Any, Deque, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """Error reply returned by the server."""
+
+
+def encode_command(*args: Any) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode()
+        parts.append(f"${len(data)}\r\n".encode())
+        parts.append(data)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Read one RESP reply. Bulk strings are returned as bytes."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    prefix, payload = line[:1], line[1:-2]
+    if prefix == b"+":
+        return payload.decode()
+    if prefix == b"-":
+        return RespError(payload.decode())
+    if prefix == b":":
+        return int(payload)
+    if prefix == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if prefix == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected RESP prefix: {prefix!r}")
+
+
+def parse_url(url: str) -> Tuple[str, int]:
+    parsed = urlparse(url)
+    return parsed.hostname or 'localhost', parsed.port or 6379
+
+
+class RespConnection:
+    """
+    A single pipelined connection for request/response commands.
+
+    Not for SUBSCRIBE: subscriber connections read pushed messages directly
+    with read_reply().
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Deque[asyncio.Future] = deque()
+        self._read_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RespConnection":
+        return cls(*parse_url(url))
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        async with self._connect_lock:
+            if self.connected:
+                return
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._read_task = asyncio.create_task(self._read_loop())
+
+    async def execute(self, *args: Any) -> Any:
+        """
+        Send a command and wait for its reply.
+
+        Raises:
+            RespError: If the server replies with an error
+            ConnectionError: If the connection drops before the reply arrives
+        """
+        if not self.connected:
+            await self.connect()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        self._writer.write(encode_command(*args))
+        reply = await future
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                reply = await read_reply(self._reader)
+                if self._pending:
+                    future = self._pending.popleft()
+                    if not future.done():
+                        future.set_result(reply)
+        except (ConnectionError, asyncio.IncompleteReadError, OSError) as e:
+            self._fail_pending(ConnectionError(str(e) or "Connection lost"))
+            if self._writer is not None:
+                self._writer.close()
+
+    def _fail_pending(self, error: Exception) -> None:
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        if self._read_task is not None:
+            self._read_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._read_task
+            self._read_task = None
+        if self._writer is not None:
+            self._writer.close()
+            with suppress(Exception):
+                await self._writer.wait_closed()
+            self._writer = None
+        self._fail_pending(ConnectionError("Connection closed"))
+
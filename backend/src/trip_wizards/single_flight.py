@@ -0,0 +1,79 @@
+# Single-flight coalescing of identical concurrent calls
+# The first caller for a key starts the upstream call; callers arriving while
+# it is in flight await the same task and share its result or exception.
+# A caller that is cancelled only stops waiting. The upstream call is
+# cancelled once every caller waiting on it has gone.
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run call() once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the request, e.g. a cache key
+            call: Zero-argument coroutine function doing the upstream work
+
+        Returns:
+            The shared result
+
+        Raises:
+            Whatever call() raised, to every caller waiting on it
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to use the result; later callers start afresh
+                self.abandoned += 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+            raise
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a call for key is running, so do() would join it."""
+        return key in self._flights
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception as retrieved when every waiter was cancelled
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'in_flight': len(self._flights),
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'abandoned': self.abandoned,
+        }
@@ -4,6 +4,8 @@ Test fixtures package for Trip Wizards backend.
 This package contains sample data and mock responses for testing:
 - sample_data.py: Realistic mock data for Trips, Itineraries, Bookings, etc.
 - adk_mock_responses.py: Mock responses from ADK AI service for testing
+- adk_stub_server.py: Local stand-in ADK HTTP service serving those responses
+- fake_firestore.py: In-memory async Firestore client
 
 Usage:
     from tests.fixtures.sample_data import get_sample_trip, get_complete_test_fixture
@@ -17,6 +19,10 @@ Usage:
 
     # Get mock ADK response
     restaurant_suggestion = get_adk_mock_response('restaurant')
+
+    # Serve the mock ADK responses over HTTP
+    from tests.fixtures import create_adk_stub_app
+    adk_app = create_adk_stub_app(delay='random')
 """
 
 from .sample_data import (
@@ -42,6 +48,8 @@ from .adk_mock_responses import (
     simulate_adk_delay,
 )
 
+from .adk_stub_server import create_adk_stub_app
+
 __all__ = [
     # Sample data
     "SAMPLE_USER_IDS",
@@ -62,4 +70,6 @@ __all__ = [
     "ADK_ERROR_RESPONSES",
     "get_adk_mock_response",
     "simulate_adk_delay",
+    # ADK stand-in server
+    "create_adk_stub_app",
 ]
@@ -0,0 +1,168 @@
+"""
+Local stand-in for the ADK service, serving the fixtures in adk_mock_responses.
+
+Used by tests (in-process through httpx.ASGITransport) and by load runs as a
+real HTTP server, so the backend can be exercised without ADK access:
+
+    python tests/fixtures/adk_stub_server.py --port 8001 [--delay 0.2 | --delay random]
+
+Endpoints:
+    POST /v1/suggest  {"prompt": str, "context": {}}  -> ADK_SUGGESTION_RESPONSES shape
+    POST /v1/chat     {"message": str, "context": {}} -> ADK_CHAT_RESPONSES shape
+    POST /v1/suggest/stream                           -> NDJSON chunks of the same
+                                                         fixture, then a 'done' chunk
+    GET  /health
+
+When streaming, the delay is spread across the chunks, so the first chunk
+arrives almost at once and the last one after the full delay.
+
+Send an `X-ADK-Error` header ('rate_limit', 'service_unavailable' or
+'invalid_input') to get the matching error response.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    from .adk_mock_responses import (
+        ADK_CHAT_RESPONSES,
+        get_adk_mock_response,
+        simulate_adk_delay,
+    )
+except ImportError:  # Run directly as a script
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from fixtures.adk_mock_responses import (
+        ADK_CHAT_RESPONSES,
+        get_adk_mock_response,
+        simulate_adk_delay,
+    )
+
+ERROR_STATUS = {
+    'rate_limit': 429,
+    'service_unavailable': 503,
+    'invalid_input': 400,
+}
+
+
+def classify(text: str) -> str:
+    """Pick the fixture that best matches a prompt."""
+    text = text.lower()
+    if 'restaurant' in text or 'food' in text or 'dinner' in text:
+        return 'restaurant'
+    if 'activit' in text or 'hike' in text or 'museum' in text:
+        return 'activity'
+    if 'plan our' in text or 'plan my' in text or 'generate' in text:
+        return 'itinerary_generation'
+    if 'itinerary' in text or 'optimi' in text:
+        return 'itinerary_optimization'
+    for topic in ADK_CHAT_RESPONSES:
+        if topic in text:
+            return topic
+    return 'general'
+
+
+def stream_chunks(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split a fixture response into the chunks ADK would stream for it."""
+    chunks = []
+    for item in response.get('suggestions', []):
+        chunks.append({'type': 'item', 'item': item})
+    for day in response.get('itinerary', {}).get('days', []):
+        chunks.append({'type': 'item', 'item': day})
+    for step in response.get('optimized_order', []):
+        chunks.append({'type': 'item', 'item': step})
+    text = response.get('suggestion') or response.get('message') or ''
+    words = text.split(' ') if text else []
+    for index, word in enumerate(words):
+        chunks.append({'type': 'delta', 'text': word if index == 0 else ' ' + word})
+    chunks.append({'type': 'done', 'response': response})
+    return chunks
+
+
+def create_adk_stub_app(delay: Union[float, str, None] = None) -> FastAPI:
+    """
+    Build the stub ADK app.
+
+    Args:
+        delay: Seconds to wait before each answer, 'random' for the realistic
+            150-800 ms from simulate_adk_delay(), or None for no delay
+    """
+    app = FastAPI(title="ADK stub")
+    app.state.requests = 0
+
+    def total_delay() -> float:
+        if delay == 'random':
+            return simulate_adk_delay()
+        return float(delay or 0)
+
+    async def respond(query_type: str, error: Optional[str]):
+        app.state.requests += 1
+        seconds = total_delay()
+        if seconds:
+            await asyncio.sleep(seconds)
+        if error:
+            return JSONResponse(
+                get_adk_mock_response(query_type, error=error),
+                status_code=ERROR_STATUS.get(error, 503),
+            )
+        return get_adk_mock_response(query_type)
+
+    @app.post("/v1/suggest")
+    async def suggest(request: Request, x_adk_error: Optional[str] = Header(None)):
+        body = await request.json()
+        return await respond(classify(body.get('prompt', '')), x_adk_error)
+
+    @app.post("/v1/suggest/stream")
+    async def suggest_stream(request: Request, x_adk_error: Optional[str] = Header(None)):
+        app.state.requests += 1
+        body = await request.json()
+        if x_adk_error:
+            return JSONResponse(
+                get_adk_mock_response('general', error=x_adk_error),
+                status_code=ERROR_STATUS.get(x_adk_error, 503),
+            )
+        chunks = stream_chunks(get_adk_mock_response(classify(body.get('prompt', ''))))
+        pause = total_delay() / max(1, len(chunks) - 1)
+
+        async def lines():
+            for index, chunk in enumerate(chunks):
+                if pause and index:
+                    await asyncio.sleep(pause)
+                yield json.dumps(chunk) + '\n'
+
+        return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+    @app.post("/v1/chat")
+    async def chat(request: Request, x_adk_error: Optional[str] = Header(None)):
+        body = await request.json()
+        query_type = classify(body.get('message', ''))
+        if query_type not in ADK_CHAT_RESPONSES:
+            query_type = 'general_help'
+        return await respond(query_type, x_adk_error)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "requests": app.state.requests}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', default=None, help="seconds, or 'random'")
+    args = parser.parse_args()
+    uvicorn.run(create_adk_stub_app(args.delay), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
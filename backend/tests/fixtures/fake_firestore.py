@@ -0,0 +1,330 @@
+"""
+In-memory stand-in for the Firestore AsyncClient.
+Implements the subset of the async API used by the backend so that the
+data-access layer can be tested and benchmarked without a Firebase project.
+Every simulated RPC awaits `latency` seconds and increments `rpc_count`.
+Transactions are optimistic: a commit is aborted when a document read in the
+transaction was written since, and the transactional decorator retries it.
+"""
+
+import asyncio
+import copy
+import itertools
+from typing import Any, Dict, List, Optional
+
+from google.api_core.exceptions import Aborted, AlreadyExists, NotFound
+from google.cloud.firestore import DELETE_FIELD, ArrayRemove, ArrayUnion, Increment
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = copy.deepcopy(data)
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeAsyncFirestore", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    async def get(self, transaction: Optional["FakeTransaction"] = None) -> FakeSnapshot:
+        await self._client._rpc()
+        if transaction is not None:
+            transaction._reads[self.path] = self._client._versions.get(self.path, 0)
+        return FakeSnapshot(self, self._client._docs.get(self.path))
+
+    async def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        await self._client._rpc()
+        self._client._apply_set(self.path, data, merge)
+
+    async def update(self, data: Dict[str, Any]) -> None:
+        await self._client._rpc()
+        self._client._apply_update(self.path, data)
+
+    async def delete(self) -> None:
+        await self._client._rpc()
+        self._client._apply_delete(self.path)
+
+
+class FakeWriteOption:
+    def __init__(self, exists: bool):
+        self.exists = exists
+
+
+class FakeQuery:
+    def __init__(
+        self, client: "FakeAsyncFirestore", path: str, filters=None, limit=None, order=None,
+        start_after=None, group: bool = False,
+    ):
+        self._client = client
+        self._path = path
+        self._filters = filters or []
+        self._limit = limit
+        self._order = order
+        self._start_after = start_after
+        # Collection group queries match every collection named path
+        self._group = group
+
+    def _copy(self, **changes) -> "FakeQuery":
+        state = {
+            "filters": self._filters, "limit": self._limit, "order": self._order,
+            "start_after": self._start_after, "group": self._group,
+        }
+        state.update(changes)
+        return FakeQuery(self._client, self._path, **state)
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        return self._copy(filters=self._filters + [(field, op, value)])
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(limit=count)
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._copy(order=(field, direction))
+
+    def start_after(self, fields: Dict[str, Any]) -> "FakeQuery":
+        return self._copy(start_after=fields)
+
+    def _in_collection(self, path: str) -> bool:
+        if self._group:
+            segments = path.split("/")
+            return len(segments) % 2 == 0 and segments[-2] == self._path
+        prefix = self._path + "/"
+        return path.startswith(prefix) and "/" not in path[len(prefix):]
+
+    def _matches(self, data: Dict[str, Any]) -> bool:
+        for field, op, value in self._filters:
+            current = data.get(field)
+            if op == "==" and current != value:
+                return False
+            if op == "array_contains" and value not in (current or []):
+                return False
+            if op == ">" and not (current is not None and current > value):
+                return False
+            if op == "<=" and not (current is not None and current <= value):
+                return False
+        return True
+
+    def _snapshots(self) -> List[FakeSnapshot]:
+        results = []
+        for path, data in sorted(self._client._docs.items()):
+            if not self._in_collection(path):
+                continue
+            if self._matches(data):
+                results.append(FakeSnapshot(FakeDocumentReference(self._client, path), data))
+        if self._order is not None:
+            field, direction = self._order
+            results = [snapshot for snapshot in results if field in snapshot._data]
+            results.sort(key=lambda snapshot: snapshot._data[field], reverse=direction == "DESCENDING")
+            if self._start_after is not None:
+                cursor = self._start_after[field]
+                results = [snapshot for snapshot in results if snapshot._data[field] > cursor]
+        if self._limit is not None:
+            results = results[: self._limit]
+        return results
+
+    async def get(self) -> List[FakeSnapshot]:
+        await self._client._rpc()
+        return self._snapshots()
+
+    async def stream(self):
+        await self._client._rpc()
+        for snapshot in self._snapshots():
+            yield snapshot
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client: "FakeAsyncFirestore", path: str):
+        super().__init__(client, path)
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentReference:
+        if doc_id is None:
+            doc_id = f"auto_{next(self._client._ids)}"
+        return FakeDocumentReference(self._client, f"{self._path}/{doc_id}")
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeAsyncFirestore"):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(("set", reference.path, data, merge))
+
+    def create(self, reference: FakeDocumentReference, data: Dict[str, Any]) -> None:
+        self._writes.append(("create", reference.path, data, False))
+
+    def update(self, reference: FakeDocumentReference, data: Dict[str, Any]) -> None:
+        self._writes.append(("update", reference.path, data, False))
+
+    def delete(self, reference: FakeDocumentReference, option: Optional[FakeWriteOption] = None) -> None:
+        operation = "delete_existing" if option is not None and option.exists else "delete"
+        self._writes.append((operation, reference.path, None, False))
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    async def commit(self) -> None:
+        await self._client._rpc()
+        self._client.batch_sizes.append(len(self._writes))
+        self._client._apply_writes(self._writes)
+
+
+class FakeTransaction(FakeWriteBatch):
+    """Write batch that commits only if the documents it read are unchanged."""
+
+    def __init__(self, client: "FakeAsyncFirestore", max_attempts: int = 5):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = False
+        self._id = None
+        self._reads: Dict[str, int] = {}
+
+    def _clean_up(self) -> None:
+        self._writes = []
+        self._reads = {}
+        self._id = None
+
+    async def _begin(self, retry_id=None) -> None:
+        await self._client._rpc()
+        self._id = next(self._client._ids)
+
+    async def _rollback(self) -> None:
+        self._clean_up()
+
+    async def _commit(self) -> None:
+        await self._client._rpc()
+        for path, version in self._reads.items():
+            if self._client._versions.get(path, 0) != version:
+                self._client.aborted += 1
+                self._clean_up()
+                raise Aborted(f"Contention on {path}")
+        self._client.batch_sizes.append(len(self._writes))
+        self._client._apply_writes(self._writes)
+        self._clean_up()
+
+
+class FakeAsyncFirestore:
+    """Minimal async Firestore client backed by a dictionary of document paths."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.rpc_count = 0
+        self.batch_sizes: List[int] = []
+        self.aborted = 0
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        # Writes per document path, for detecting transaction conflicts
+        self._versions: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+
+    async def _rpc(self) -> None:
+        self.rpc_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            await asyncio.sleep(0)
+
+    @classmethod
+    def _merge(cls, current: Dict[str, Any], data: Dict[str, Any], deep: bool = False) -> Dict[str, Any]:
+        """Apply fields and sentinels; deep merges nested maps as set(merge=True) does."""
+        merged = dict(current)
+        for field, value in data.items():
+            if value is DELETE_FIELD:
+                merged.pop(field, None)
+            elif isinstance(value, Increment):
+                merged[field] = merged.get(field, 0) + value.value
+            elif isinstance(value, ArrayUnion):
+                current_values = list(merged.get(field) or [])
+                merged[field] = current_values + [
+                    copy.deepcopy(item) for item in value.values if item not in current_values
+                ]
+            elif isinstance(value, ArrayRemove):
+                merged[field] = [item for item in merged.get(field) or [] if item not in value.values]
+            elif deep and isinstance(value, dict) and isinstance(merged.get(field), dict):
+                merged[field] = cls._merge(merged[field], value, deep=True)
+            elif deep and isinstance(value, dict):
+                merged[field] = cls._merge({}, value, deep=True)
+            else:
+                merged[field] = copy.deepcopy(value)
+        return merged
+
+    def _apply_set(self, path: str, data: Dict[str, Any], merge: bool) -> None:
+        self._docs[path] = self._merge(self._docs.get(path, {}), data, deep=True) if merge else self._merge({}, data)
+        self._versions[path] = self._versions.get(path, 0) + 1
+
+    def _apply_update(self, path: str, data: Dict[str, Any]) -> None:
+        if path not in self._docs:
+            raise NotFound(f"No document to update: {path}")
+        # Dotted keys address fields inside nested maps; the leaf is replaced
+        document = copy.deepcopy(self._docs[path])
+        for field, value in data.items():
+            target = document
+            *parents, leaf = field.split('.')
+            for parent in parents:
+                if not isinstance(target.get(parent), dict):
+                    target[parent] = {}
+                target = target[parent]
+            merged = self._merge(target, {leaf: value})
+            target.clear()
+            target.update(merged)
+        self._docs[path] = document
+        self._versions[path] = self._versions.get(path, 0) + 1
+
+    def _apply_delete(self, path: str) -> None:
+        self._docs.pop(path, None)
+        self._versions[path] = self._versions.get(path, 0) + 1
+
+    def _apply_writes(self, writes) -> None:
+        # Preconditions are checked up front so that a failed batch writes nothing
+        for operation, path, _, _ in writes:
+            if operation == "create" and path in self._docs:
+                raise AlreadyExists(f"Document already exists: {path}")
+            if operation in ("update", "delete_existing") and path not in self._docs:
+                raise NotFound(f"No document to {operation.split('_')[0]}: {path}")
+        for operation, path, data, merge in writes:
+            if operation in ("set", "create"):
+                self._apply_set(path, data, merge)
+            elif operation == "update":
+                self._apply_update(path, data)
+            else:
+                self._apply_delete(path)
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def collection_group(self, collection_id: str) -> FakeQuery:
+        return FakeQuery(self, collection_id, group=True)
+
+    @staticmethod
+    def write_option(exists: bool) -> FakeWriteOption:
+        return FakeWriteOption(exists)
+
+    def document(self, path: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, path)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5) -> FakeTransaction:
+        return FakeTransaction(self, max_attempts)
+
+    async def get_all(self, references):
+        await self._rpc()
+        for reference in references:
+            yield FakeSnapshot(reference, self._docs.get(reference.path))
+
+    def seed(self, path: str, data: Dict[str, Any]) -> None:
+        """Insert a document directly, without counting an RPC."""
+        self._docs[path] = copy.deepcopy(data)
+
+    def data(self, path: str) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._docs.get(path))
@@ -0,0 +1,179 @@
+"""
+Tests for the pooled ADK client
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+
+import httpx
+import pytest
+from fixtures.adk_mock_responses import get_adk_mock_response
+from fixtures.adk_stub_server import create_adk_stub_app
+from trip_wizards.adk_client import AdkClient, AdkError, suggestion_text
+from trip_wizards.circuit_breaker import OPEN, CircuitBreaker
+
+
+def make_client(delay=None, **kwargs):
+    transport = httpx.ASGITransport(app=create_adk_stub_app(delay))
+    return AdkClient('http://adk.test', transport=transport, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_suggest_returns_adk_response_shape():
+    """Test that suggestions come back in the ADK fixture shape"""
+    adk = make_client()
+
+    response = await adk.suggest('any good restaurant near the hotel?')
+
+    assert response['type'] == 'restaurant_suggestion'
+    assert response['suggestions'][0]['name'] == 'The Golden Fork'
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_client_is_reused_across_calls():
+    """Test that every call shares one pooled HTTP client"""
+    adk = make_client()
+
+    await adk.suggest('activities')
+    first = adk.client
+    await adk.chat('@agent what is the weather like?')
+
+    assert adk.client is first
+    assert adk.stats()['requests'] == 2
+    await adk.close()
+    assert not adk.stats()['pool_open']
+
+
+@pytest.mark.asyncio
+async def test_error_payload_is_surfaced():
+    """Test that ADK error responses become AdkError with status and retry"""
+    adk = make_client()
+    adk.client.headers['X-ADK-Error'] = 'rate_limit'
+
+    with pytest.raises(AdkError) as excinfo:
+        await adk.suggest('restaurant')
+
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retry_after == 60
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_deadline_is_enforced_per_call():
+    """Test that a slow ADK answer fails with a timeout error"""
+    adk = make_client(delay=0.2)
+
+    with pytest.raises(AdkError) as excinfo:
+        await adk.suggest('restaurant', deadline=0.02)
+
+    assert excinfo.value.status_code == 504
+    assert adk.stats()['timeouts'] == 1
+    await adk.close()
+
+
+def scripted_client(answers, **kwargs):
+    """Client whose nth request gets answers[n] as (delay, status, payload)."""
+    calls = []
+
+    async def handler(request):
+        delay, status, payload = answers[min(len(calls), len(answers) - 1)]
+        calls.append(request)
+        await asyncio.sleep(delay)
+        return httpx.Response(status, json=payload)
+
+    adk = AdkClient('http://adk.test', transport=httpx.MockTransport(handler), **kwargs)
+    return adk, calls
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast():
+    """Test that repeated failures open the circuit and later calls skip ADK"""
+    adk = make_client(breaker=CircuitBreaker(failure_threshold=2, cooldown=30))
+    adk.client.headers['X-ADK-Error'] = 'service_unavailable'
+
+    for _ in range(2):
+        with pytest.raises(AdkError):
+            await adk.suggest('restaurant')
+    with pytest.raises(AdkError) as excinfo:
+        await adk.suggest('restaurant')
+
+    assert excinfo.value.error == 'circuit_open'
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.retry_after == pytest.approx(30, abs=1)
+    assert adk.stats()['requests'] == 2
+    assert adk.stats()['circuit']['state'] == OPEN
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_holds_circuit_open_for_retry_after():
+    """Test that a rate-limit answer pauses calls for its retry_after"""
+    adk = make_client(breaker=CircuitBreaker(failure_threshold=5), retries=1)
+    adk.client.headers['X-ADK-Error'] = 'rate_limit'
+
+    with pytest.raises(AdkError) as excinfo:
+        await adk.suggest('restaurant')
+    assert excinfo.value.error == 'rate_limit_exceeded'
+    with pytest.raises(AdkError) as excinfo:
+        await adk.suggest('restaurant')
+
+    # retry_after (60 s) is past the deadline, so the call was not retried
+    assert excinfo.value.error == 'circuit_open'
+    assert excinfo.value.retry_after == pytest.approx(60, abs=1)
+    assert adk.stats()['retried'] == 0
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_transient_failure_is_retried_within_deadline():
+    """Test that a 503 is retried after retry_after and the retry's answer returned"""
+    adk, calls = scripted_client(
+        [
+            (0, 503, {'error': 'service_unavailable', 'message': 'busy', 'retry_after_seconds': 0.05}),
+            (0, 200, get_adk_mock_response('restaurant')),
+        ],
+        breaker=CircuitBreaker(),
+        retries=1,
+    )
+
+    response = await adk.suggest('restaurant')
+
+    assert response['type'] == 'restaurant_suggestion'
+    assert len(calls) == 2
+    assert adk.stats()['retried'] == 1
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged():
+    """Test that a second request is sent after hedge_after and the faster one wins"""
+    adk, calls = scripted_client(
+        [(0, 200, {'message': 'warm'})] * 10 + [(1.0, 200, {'message': 'slow'}), (0, 200, {'message': 'hedge'})],
+        hedge_after=0.05,
+    )
+    for _ in range(10):
+        await adk.chat('warm up')
+
+    started = asyncio.get_running_loop().time()
+    response = await adk.suggest('restaurant')
+
+    assert response['message'] == 'hedge'
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert adk.stats()['hedges'] == 1
+    assert adk.stats()['hedge_wins'] == 1
+    await adk.close()
+
+
+def test_suggestion_text_flattens_every_shape():
+    """Test that each ADK response shape becomes one suggestion string"""
+    assert 'The Golden Fork' in suggestion_text(get_adk_mock_response('restaurant'))
+    assert 'Mountain Hiking Trail' in suggestion_text(get_adk_mock_response('activity'))
+    assert suggestion_text(get_adk_mock_response('general')).startswith('Based on your trip details')
+    assert 'JR Pass' in suggestion_text(get_adk_mock_response('transportation'))
+    assert 'itinerary_001' in suggestion_text(get_adk_mock_response('itinerary_optimization'))
+    assert 'Day 2 (Cultural Exploration)' in suggestion_text(get_adk_mock_response('itinerary_generation'))
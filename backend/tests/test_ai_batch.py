@@ -0,0 +1,96 @@
+"""
+Tests for batched AI suggestions
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import pytest
+from trip_wizards.adk_client import AdkError
+from trip_wizards.ai_batch import SuggestionBatches
+
+
+def make_suggest(delays, active=None, peak=None):
+    async def suggest(prompt):
+        if active is not None:
+            active.append(prompt)
+            peak.append(len(active))
+        try:
+            await asyncio.sleep(delays.get(prompt, 0))
+        finally:
+            if active is not None:
+                active.remove(prompt)
+        if prompt == 'broken':
+            raise AdkError('rate_limit_exceeded', 'Too many requests', 60)
+        return {'suggestion': f'answer to {prompt}'}
+    return suggest
+
+
+@pytest.mark.asyncio
+async def test_results_come_back_in_prompt_order():
+    """Test that ordered results follow the prompts, not completion order"""
+    batches = SuggestionBatches()
+    suggest = make_suggest({'day 1': 0.03, 'day 2': 0.01, 'day 3': 0})
+
+    results = await batches.ordered(['day 1', 'day 2', 'day 3'], suggest)
+
+    assert [result['suggestion'] for result in results] == [
+        'answer to day 1', 'answer to day 2', 'answer to day 3'
+    ]
+    assert [result['index'] for result in results] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    """Test that no more than the limit of prompts are in flight at once"""
+    batches = SuggestionBatches(concurrency=3)
+    active, peak = [], []
+    prompts = [f'day {i}' for i in range(10)]
+    suggest = make_suggest({prompt: 0.01 for prompt in prompts}, active, peak)
+
+    started = asyncio.get_running_loop().time()
+    await batches.ordered(prompts, suggest)
+    elapsed = asyncio.get_running_loop().time() - started
+
+    assert max(peak) == 3
+    # Ten 10 ms calls three at a time take four rounds, not ten
+    assert elapsed < 0.08
+    assert batches.stats()['in_flight'] == 0
+
+
+@pytest.mark.asyncio
+async def test_failures_are_reported_per_item():
+    """Test that one failed prompt does not fail the rest of the batch"""
+    batches = SuggestionBatches()
+
+    results = await batches.ordered(['day 1', 'broken', 'day 3'], make_suggest({}))
+
+    assert results[0]['suggestion'] == 'answer to day 1'
+    assert results[1] == {
+        'index': 1,
+        'prompt': 'broken',
+        'error': 'rate_limit_exceeded',
+        'message': 'Too many requests',
+        'status': 429,
+    }
+    assert results[2]['suggestion'] == 'answer to day 3'
+    assert batches.stats()['failed_items'] == 1
+
+
+@pytest.mark.asyncio
+async def test_streamed_results_arrive_as_completed_and_stop_on_close():
+    """Test that streamed results come fastest first and closing cancels the rest"""
+    batches = SuggestionBatches()
+    suggest = make_suggest({'slow': 5, 'fast': 0, 'medium': 0.01})
+
+    stream = batches.as_completed(['slow', 'fast', 'medium'], suggest)
+    first = await stream.__anext__()
+    second = await stream.__anext__()
+    await stream.aclose()
+    await asyncio.sleep(0)
+
+    assert (first['prompt'], second['prompt']) == ('fast', 'medium')
+    assert batches.stats()['in_flight'] == 0
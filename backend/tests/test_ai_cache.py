@@ -0,0 +1,92 @@
+"""
+Tests for the AI suggestion response cache
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+from datetime import datetime
+import pytest
+from trip_wizards.ai_cache import SuggestionCache, normalize_prompt, trip_context
+from trip_wizards.resp_broker import LocalPubSubBroker
+
+RESPONSE = {'type': 'general_suggestion', 'suggestion': 'Visit the old town.'}
+
+
+def test_near_identical_prompts_share_a_key():
+    """Test that case, punctuation and @agent do not change the key"""
+    cache = SuggestionCache()
+    context = {'destination': 'tokyo'}
+
+    assert normalize_prompt('@agent  Restaurants near Shibuya??') == 'restaurants near shibuya'
+    assert cache.key('Restaurants near Shibuya?', context) == cache.key('restaurants near shibuya', context)
+    assert cache.key('restaurants near shibuya', context) != cache.key('restaurants near shibuya', {})
+
+
+def test_trip_context_uses_destination_and_dates():
+    """Test that only destination and dates from the trip enter the key"""
+    trip = {
+        'title': 'Spring break',
+        'destination': ' Tokyo, Japan ',
+        'startDate': datetime(2024, 4, 15, 9, 30),
+        'endDate': '2024-04-22T00:00:00',
+    }
+
+    assert trip_context(trip) == {
+        'destination': 'tokyo, japan',
+        'startDate': '2024-04-15',
+        'endDate': '2024-04-22',
+    }
+
+
+@pytest.mark.asyncio
+async def test_hit_miss_and_ttl_expiry():
+    """Test that entries are served until their TTL runs out"""
+    cache = SuggestionCache(ttl=0.02)
+    key = cache.key('museums')
+
+    assert await cache.get(key) is None
+    await cache.set(key, RESPONSE)
+    assert await cache.get(key) == RESPONSE
+    await asyncio.sleep(0.03)
+    assert await cache.get(key) is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_byte_bound_evicts_least_recently_used():
+    """Test that the byte budget evicts the least recently used entry"""
+    cache = SuggestionCache(max_bytes=200)
+    for name in ('a', 'b', 'c'):
+        await cache.set(name, {'suggestion': name * 40})
+    await cache.get('a')
+    await cache.set('d', {'suggestion': 'd' * 40})
+
+    assert await cache.get('b') is None
+    assert await cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size_bytes'] <= 200
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_serves_other_workers():
+    """Test that an answer cached by one worker is a hit on another"""
+    broker = LocalPubSubBroker()
+    port = await broker.start(port=0)
+    worker_a = SuggestionCache(shared_url=f'redis://127.0.0.1:{port}', shared_timeout=1.0)
+    worker_b = SuggestionCache(shared_url=f'redis://127.0.0.1:{port}', shared_timeout=1.0)
+    await worker_a.start()
+    await worker_b.start()
+
+    await worker_a.set(worker_a.key('museums'), RESPONSE)
+
+    assert await worker_b.get(worker_b.key('Museums!')) == RESPONSE
+    assert worker_b.stats()['shared_hits'] == 1
+    await worker_a.stop()
+    await worker_b.stop()
+    await broker.stop()
@@ -0,0 +1,97 @@
+"""
+Tests for the AI prompt intent router
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+from trip_wizards.ai_cache import SuggestionCache
+from trip_wizards.ai_intents import IntentRouter
+
+
+@pytest.mark.parametrize('prompt, intent', [
+    ('@agent where should we eat tonight?', 'restaurant'),
+    ('Any hiking trails or museums nearby', 'activity'),
+    ('Will it rain on Tuesday?', 'weather'),
+    ('How much should we budget per day?', 'budget'),
+    ('Is the JR Pass worth it for getting around', 'transportation'),
+    ('Can you optimize our itinerary', 'itinerary_optimization'),
+    ('Plan our trip to Tokyo day by day', 'itinerary_generation'),
+    ('What is the capital of Peru', 'general'),
+])
+def test_prompts_route_to_fixture_intents(prompt, intent):
+    """Test that prompts reach the intent whose ADK fixture answers them"""
+    assert IntentRouter().route(prompt).intent == intent
+
+
+def test_keywords_match_whole_words_or_declared_stems():
+    """Test that keywords do not fire inside unrelated words"""
+    router = IntentRouter()
+
+    # 'eat' inside 'weather', 'bar' inside 'barcelona', 'hot' inside 'hotel'
+    assert router.route('weather in barcelona').intent == 'weather'
+    assert router.route('quiet hotel in barcelona').intent == 'general'
+    assert router.route('hikes').matches == ['hik*']
+
+
+def test_small_talk_is_answered_locally():
+    """Test that greetings and thanks skip ADK, unless a real question follows"""
+    router = IntentRouter()
+
+    help_route = router.route('Hi!')
+    assert help_route.intent == 'help'
+    assert 'Tokyo' in help_route.local_response({'destination': 'tokyo'})['message']
+    assert router.route('thank you!!').local_response()['message'].startswith("You're welcome")
+    assert router.route('hi, any good restaurants?').local_response() is None
+    assert router.stats()['local'] == 2
+
+
+@pytest.mark.parametrize('prompt', [
+    'Can you help me book a hotel in Paris?',
+    'hey, any ideas for Kyoto day trips?',
+    'thanks! now what about hotels in Osaka?',
+    'Help me plan visas for Japan',
+])
+def test_small_talk_around_a_question_goes_to_adk(prompt):
+    """Test that a greeting, thanks or help around a real question is not answered locally"""
+    router = IntentRouter()
+
+    assert router.route(prompt).local_response() is None
+    assert router.stats()['local'] == 0
+
+
+def test_generic_prompts_share_a_cache_entry():
+    """Test that prompts asking only for an intent by its head keyword key the cache by intent"""
+    router = IntentRouter()
+    cache = SuggestionCache()
+    context = {'destination': 'tokyo'}
+
+    first = router.route('Any good restaurants?')
+    second = router.route('can you recommend some restaurants nearby')
+    specific = router.route('vegan restaurants in Shibuya')
+
+    assert first.cache_intent == second.cache_intent == 'restaurant'
+    assert specific.cache_intent is None
+    assert (cache.key('Any good restaurants?', context, first.cache_intent)
+            == cache.key('can you recommend some restaurants nearby', context, second.cache_intent))
+    assert router.route('what is the capital of peru').cache_intent is None
+
+
+@pytest.mark.parametrize('prompts', [
+    ['sushi', 'ramen', 'cheap restaurants', 'expensive dinner', 'dinner places'],
+    ['hiking', 'museums', 'activities'],
+    ['hot weather', 'cold weather'],
+    ['jr pass', 'taxi'],
+])
+def test_prompts_naming_different_things_get_their_own_entries(prompts):
+    """Test that prompts matching keywords beyond the head keyword are cached by their text"""
+    router = IntentRouter()
+    cache = SuggestionCache()
+    context = {'destination': 'tokyo'}
+
+    keys = {cache.key(prompt, context, router.route(prompt).cache_intent) for prompt in prompts}
+
+    assert len(keys) == len(prompts)
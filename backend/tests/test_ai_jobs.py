@@ -0,0 +1,189 @@
+"""
+Tests for the background AI job queue
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import pytest
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.adk_client import AdkError
+from trip_wizards.ai_jobs import DONE, FAILED, QUEUED, RUNNING, FirestoreJobStore, JobQueue, JobQueueFull
+from trip_wizards.firestore_store import FirestoreStore
+
+
+async def wait_for_status(jobs, job_id, status):
+    for _ in range(200):
+        job = await jobs.get(job_id)
+        if job is not None and job['status'] == status:
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+async def itinerary(payload):
+    await asyncio.sleep(0.01)
+    return {'suggestion': f"Itinerary for {payload['prompt']}"}
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_at_once_and_result_can_be_polled():
+    """Test that a job is queued immediately and its result stored and announced"""
+    finished = []
+
+    async def on_finish(job):
+        finished.append(job)
+
+    jobs = JobQueue({'itinerary': itinerary}, on_finish=on_finish)
+    await jobs.start()
+
+    job = await jobs.submit('itinerary', {'prompt': 'Tokyo'}, trip_id='trip_1')
+    assert job['status'] == QUEUED
+
+    done = await wait_for_status(jobs, job['id'], DONE)
+    assert done['result'] == {'suggestion': 'Itinerary for Tokyo'}
+    assert finished[0]['id'] == job['id'] and finished[0]['tripId'] == 'trip_1'
+    await jobs.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_bounds_concurrency_and_queue():
+    """Test that only `workers` jobs run at once and a full queue refuses jobs"""
+    running = []
+    peak = []
+    release = asyncio.Event()
+
+    async def slow(payload):
+        running.append(payload)
+        peak.append(len(running))
+        await release.wait()
+        running.remove(payload)
+        return {}
+
+    jobs = JobQueue({'itinerary': slow}, workers=2, max_pending=3)
+    await jobs.start()
+    submitted = [await jobs.submit('itinerary', {'n': n}) for n in range(2)]
+    await asyncio.sleep(0.01)
+    submitted += [await jobs.submit('itinerary', {'n': n}) for n in range(2, 5)]
+
+    with pytest.raises(JobQueueFull):
+        await jobs.submit('itinerary', {'n': 5})
+    with pytest.raises(ValueError):
+        await jobs.submit('packing_list', {})
+
+    release.set()
+    for job in submitted:
+        await wait_for_status(jobs, job['id'], DONE)
+    assert max(peak) == 2
+    assert jobs.stats()['rejected'] == 1
+    await jobs.stop()
+
+
+@pytest.mark.asyncio
+async def test_failures_and_expiry():
+    """Test that handler errors are recorded and finished jobs expire after the TTL"""
+    async def failing(payload):
+        raise AdkError('service_unavailable', 'ADK is down')
+
+    jobs = JobQueue({'itinerary': failing}, result_ttl=0.05)
+    await jobs.start()
+
+    job = await jobs.submit('itinerary', {})
+    failed = await wait_for_status(jobs, job['id'], FAILED)
+    assert failed['error'] == {'error': 'service_unavailable', 'message': 'ADK is down'}
+
+    await asyncio.sleep(0.06)
+    assert await jobs.get(job['id']) is None
+    await jobs.submit('itinerary', {})
+    assert job['id'] not in jobs._jobs
+    await jobs.stop()
+
+
+@pytest.mark.asyncio
+async def test_firestore_backend_recovers_and_serves_other_workers():
+    """Test that persisted jobs survive a restart and can be polled from another worker"""
+    store = FirestoreStore(FakeAsyncFirestore())
+    first = JobQueue({'itinerary': itinerary}, store=FirestoreJobStore(store))
+    job = await first.submit('itinerary', {'prompt': 'Kyoto'})
+    assert (await store.get('ai_jobs', job['id']))['status'] == QUEUED
+
+    # The first worker stops before running the job and releases it; a new
+    # one picks it up
+    await first.stop()
+    restarted = JobQueue({'itinerary': itinerary}, store=FirestoreJobStore(store))
+    await restarted.start()
+    await wait_for_status(restarted, job['id'], DONE)
+
+    other = JobQueue({'itinerary': itinerary}, store=FirestoreJobStore(store))
+    polled = await other.get(job['id'])
+    assert polled['result'] == {'suggestion': 'Itinerary for Kyoto'}
+    assert 'expireAt' in await store.get('ai_jobs', job['id'])
+    await restarted.stop()
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_stored_before_a_worker_can_claim_them():
+    """Test that a job submitted to a running queue with a slow store is run, not skipped"""
+    class SlowSaves(FirestoreJobStore):
+        async def save(self, job):
+            await asyncio.sleep(0.05)
+            await super().save(job)
+
+    jobs = JobQueue({'itinerary': itinerary}, store=SlowSaves(FirestoreStore(FakeAsyncFirestore())), max_pending=1)
+    await jobs.start()
+
+    submitted = await asyncio.gather(
+        jobs.submit('itinerary', {'prompt': 'Nara'}),
+        jobs.submit('itinerary', {'prompt': 'Kobe'}),
+        return_exceptions=True,
+    )
+    job = submitted[0]
+
+    # The second submit found the first one's place taken while it was saved
+    assert isinstance(submitted[1], JobQueueFull)
+    done = await wait_for_status(jobs, job['id'], DONE)
+    assert done['result'] == {'suggestion': 'Itinerary for Nara'}
+    assert jobs.stats()['skipped'] == 0
+    await jobs.stop()
+
+
+@pytest.mark.asyncio
+async def test_jobs_claimed_by_a_live_worker_are_not_run_twice():
+    """Test that a starting worker leaves running jobs alone and recovers only expired claims"""
+    store = FirestoreStore(FakeAsyncFirestore())
+    runs = []
+    release = asyncio.Event()
+
+    async def slow(payload):
+        runs.append(payload['prompt'])
+        await release.wait()
+        return {}
+
+    first = JobQueue({'itinerary': slow}, store=FirestoreJobStore(store), lease_ttl=0.06, worker_id='a')
+    await first.start()
+    job = await first.submit('itinerary', {'prompt': 'Osaka'})
+    await wait_for_status(first, job['id'], RUNNING)
+
+    # Long past the first lease: the running job is kept alive by renewals
+    await asyncio.sleep(0.1)
+    second = JobQueue({'itinerary': slow}, store=FirestoreJobStore(store), lease_ttl=0.06, worker_id='b')
+    await second.start()
+    await asyncio.sleep(0.02)
+    assert second.stats()['recovered'] == 0
+
+    release.set()
+    await wait_for_status(first, job['id'], DONE)
+    assert runs == ['Osaka']
+
+    # A job whose worker died without releasing it is recovered once its lease runs out
+    orphan = dict(job, id='orphan', status=RUNNING, workerId='crashed', leaseExpiresAt=0, expiresAt=None)
+    await store.set('ai_jobs', 'orphan', orphan)
+    third = JobQueue({'itinerary': slow}, store=FirestoreJobStore(store), worker_id='c')
+    await asyncio.gather(second._recover(), third.start())
+    await wait_for_status(second, 'orphan', DONE)
+    assert runs == ['Osaka', 'Osaka']
+    assert second.stats()['skipped'] + third.stats()['skipped'] == 1
+    await asyncio.gather(first.stop(), second.stop(), third.stop())
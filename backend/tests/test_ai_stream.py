@@ -0,0 +1,257 @@
+"""
+Tests for streaming AI suggestions
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import json
+import httpx
+import pytest
+from fixtures.adk_stub_server import create_adk_stub_app
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.adk_client import AdkClient, AdkError
+from trip_wizards.circuit_breaker import CircuitBreaker
+from trip_wizards.ai_cache import SuggestionCache
+from trip_wizards.ai_intents import IntentRouter
+from trip_wizards.ai_stream import (
+    AGENT_CHUNK,
+    AGENT_NO_CREDITS,
+    AGENT_UNAVAILABLE,
+    AgentReplies,
+    sse_suggestion_events,
+    suggestion_stream,
+)
+from trip_wizards.credit_ledger import CreditLedger
+from trip_wizards.firestore_store import FirestoreStore
+
+
+def make_client(delay=None):
+    transport = httpx.ASGITransport(app=create_adk_stub_app(delay))
+    return AdkClient('http://adk.test', transport=transport)
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_items_then_done():
+    """Test that structured responses stream one item per place, then the whole response"""
+    adk = make_client()
+
+    chunks = await collect(adk.stream_suggest('restaurants for dinner'))
+
+    assert [chunk['type'] for chunk in chunks] == ['item', 'item', 'done']
+    assert chunks[0]['item']['name'] == 'The Golden Fork'
+    assert chunks[-1]['response']['type'] == 'restaurant_suggestion'
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_text_deltas_rebuild_the_message():
+    """Test that text answers stream word by word and join back to the full message"""
+    adk = make_client()
+
+    chunks = await collect(adk.stream_suggest('what will the weather be like?'))
+
+    text = ''.join(chunk['text'] for chunk in chunks if chunk['type'] == 'delta')
+    assert len(chunks) > 10
+    assert text == chunks[-1]['response']['message']
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_error_raises_adk_error():
+    """Test that an ADK error response on a stream becomes AdkError"""
+    adk = make_client()
+    adk.client.headers['X-ADK-Error'] = 'service_unavailable'
+
+    with pytest.raises(AdkError) as excinfo:
+        await collect(adk.stream_suggest('restaurant'))
+
+    assert excinfo.value.status_code == 503
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_completed_stream_fills_the_cache():
+    """Test that a repeat prompt is served from the cache as a single done chunk"""
+    adk = make_client()
+    cache = SuggestionCache()
+
+    first = await collect(suggestion_stream(adk, cache, 'plan my trip', {'destination': 'tokyo'}))
+    second = await collect(suggestion_stream(adk, cache, 'Plan my trip!', {'destination': 'tokyo'}))
+
+    assert first[-1]['cached'] is False
+    assert len(second) == 1 and second[0]['cached'] is True
+    assert second[0]['response'] == first[-1]['response']
+    assert adk.stats()['requests'] == 1
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_streams_a_fallback_answer():
+    """Test that a paused ADK gets a stand-in answer at once, which is not cached"""
+    adk = make_client()
+    adk.breaker = CircuitBreaker()
+    adk.breaker.hold_off(30)
+    cache = SuggestionCache()
+
+    chunks = await collect(suggestion_stream(adk, cache, 'restaurants for dinner', {}, IntentRouter()))
+
+    assert len(chunks) == 1
+    assert chunks[0]['response']['type'] == 'restaurant_fallback'
+    assert 'in about 30 seconds' in chunks[0]['response']['message']
+    assert adk.stats()['requests'] == 0
+    assert cache.stats()['entries'] == 0
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_sse_events_open_immediately_and_end_with_done():
+    """Test the SSE rendering of a stream, including a mid-stream failure"""
+    adk = make_client()
+
+    events = await collect(sse_suggestion_events(suggestion_stream(adk, SuggestionCache(), 'activities')))
+
+    assert events[0].startswith(':')
+    assert events[1].startswith('event: item\ndata: ')
+    assert events[-1].startswith('event: done\n')
+    done = json.loads(events[-1].split('data: ', 1)[1])
+    assert 'Mountain Hiking Trail' in done['suggestion']
+
+    adk.client.headers['X-ADK-Error'] = 'rate_limit'
+    events = await collect(sse_suggestion_events(suggestion_stream(adk, SuggestionCache(), 'activities')))
+    assert json.loads(events[-1].split('data: ', 1)[1])['status'] == 429
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_agent_reply_streams_chunks_then_posts_message():
+    """Test that agent replies publish partial frames and then one final message"""
+    adk = make_client()
+    cache = SuggestionCache()
+    published = []
+    posted = asyncio.Queue()
+
+    async def publish_chunk(trip_id, frame):
+        published.append(json.loads(frame))
+
+    async def post_message(trip_id, message):
+        await posted.put(message)
+
+    replies = AgentReplies(
+        lambda prompt, context, user_id: suggestion_stream(adk, cache, prompt, context),
+        publish_chunk,
+        post_message,
+    )
+    stream_id = replies.start('trip_1', '@agent plan my trip')
+    message = await asyncio.wait_for(posted.get(), 1)
+
+    assert all(frame['type'] == AGENT_CHUNK and frame['stream_id'] == stream_id for frame in published)
+    assert published[0]['text'].startswith('Day 1')
+    assert message['message'].startswith('Tokyo Adventure 2024')
+    assert message['isAgent'] and message['stream_id'] == stream_id
+
+    adk.client.headers['X-ADK-Error'] = 'service_unavailable'
+    replies.start('trip_1', 'anything else')
+    message = await asyncio.wait_for(posted.get(), 1)
+    assert message['message'] == AGENT_UNAVAILABLE
+    assert replies.stats()['failures'] == 1
+    await replies.stop()
+    await adk.close()
+
+
+def make_ledger(remaining):
+    client = FakeAsyncFirestore()
+    client.seed('user_credits/u1', {'remainingCredits': remaining, 'totalCredits': 10})
+    return CreditLedger(FirestoreStore(client), block=1)
+
+
+@pytest.mark.asyncio
+async def test_only_streams_that_reach_adk_are_charged():
+    """Test that cached and failed streams are free and a stream reaching ADK costs one credit"""
+    adk = make_client()
+    cache = SuggestionCache()
+    ledger = make_ledger(10)
+
+    await collect(suggestion_stream(adk, cache, 'plan my trip', {}, IntentRouter(), ledger, 'u1'))
+    await collect(suggestion_stream(adk, cache, 'plan my trip', {}, IntentRouter(), ledger, 'u1'))
+    await collect(suggestion_stream(adk, cache, 'thanks!', {}, IntentRouter(), ledger, 'u1'))
+    adk.client.headers['X-ADK-Error'] = 'service_unavailable'
+    with pytest.raises(AdkError):
+        await collect(suggestion_stream(adk, cache, 'museums', {}, IntentRouter(), ledger, 'u1'))
+
+    assert ledger.stats()['debits'] == 2
+    assert ledger.stats()['refunds'] == 1
+    await adk.close()
+
+
+@pytest.mark.asyncio
+async def test_agent_replies_are_charged_to_the_given_user():
+    """Test that an agent reply debits its payer and says so when credits run out"""
+    adk = make_client()
+    cache = SuggestionCache()
+    ledger = make_ledger(1)
+    posted = asyncio.Queue()
+
+    async def publish_chunk(trip_id, frame):
+        pass
+
+    async def post_message(trip_id, message):
+        await posted.put(message)
+
+    replies = AgentReplies(
+        lambda prompt, context, user_id: suggestion_stream(adk, cache, prompt, context, None, ledger, user_id),
+        publish_chunk,
+        post_message,
+    )
+    replies.start('trip_1', '@agent plan my trip', user_id='u1')
+    assert (await asyncio.wait_for(posted.get(), 1))['message'].startswith('Tokyo Adventure 2024')
+    replies.start('trip_1', '@agent find museums', user_id='u1')
+    assert (await asyncio.wait_for(posted.get(), 1))['message'] == AGENT_NO_CREDITS
+
+    assert ledger.stats()['debits'] == 1
+    await replies.stop()
+    await adk.close()
+
+
+class BrokenAdk:
+    """ADK client stand-in whose stream fails with a non-ADK error."""
+
+    async def stream_suggest(self, prompt, context):
+        yield {'type': 'delta', 'text': 'Day 1'}
+        raise asyncio.TimeoutError()
+
+
+@pytest.mark.asyncio
+async def test_agent_reply_failing_unexpectedly_still_posts_and_refunds():
+    """Test that any failure of an agent reply posts an apology and refunds the credit"""
+    ledger = make_ledger(1)
+    posted = asyncio.Queue()
+
+    async def publish_chunk(trip_id, frame):
+        pass
+
+    async def post_message(trip_id, message):
+        await posted.put(message)
+
+    replies = AgentReplies(
+        lambda prompt, context, user_id: suggestion_stream(
+            BrokenAdk(), SuggestionCache(), prompt, context, IntentRouter(), ledger, user_id
+        ),
+        publish_chunk,
+        post_message,
+    )
+    stream_id = replies.start('trip_1', '@agent plan my trip', user_id='u1')
+    message = await asyncio.wait_for(posted.get(), 1)
+
+    assert message['message'] == AGENT_UNAVAILABLE and message['stream_id'] == stream_id
+    assert replies.stats()['failures'] == 1
+    assert ledger.stats()['debits'] == 1
+    assert ledger.stats()['refunds'] == 1
+    await replies.stop()
@@ -0,0 +1,164 @@
+"""
+Tests for the chat pub/sub backplane
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import pytest
+from trip_wizards.backplane import (
+    Backplane,
+    InProcessBackplane,
+    RedisBackplane,
+    create_backplane,
+)
+from trip_wizards.resp_broker import LocalPubSubBroker
+
+
+async def wait_for(condition, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.005)
+
+
+def test_create_backplane_defaults_to_in_process():
+    """Test that no URL selects the single-process backplane"""
+    assert isinstance(create_backplane(None, print), InProcessBackplane)
+    assert isinstance(create_backplane('redis://localhost:6380', print), RedisBackplane)
+    with pytest.raises(ValueError):
+        create_backplane('kafka://localhost', print)
+
+
+def test_backplane_without_publish_cannot_be_created():
+    """Test that a backplane missing an override fails when constructed"""
+    class Incomplete(Backplane):
+        async def next_sequence(self, trip_id):
+            return 1
+
+    with pytest.raises(TypeError):
+        Incomplete(print)
+
+
+@pytest.mark.asyncio
+async def test_in_process_publish_delivers_locally():
+    """Test that the in-process backplane delivers frames immediately"""
+    received = []
+    backplane = InProcessBackplane(lambda *args: received.append(args))
+
+    await backplane.publish('trip_001', 1, '{"message": "hi"}')
+
+    assert received == [('trip_001', 1, '{"message": "hi"}')]
+
+
+@pytest.mark.asyncio
+async def test_in_process_sequence_continues_after_persisted_history():
+    """Test that sequence numbers start after the last persisted one"""
+    async def last_sequence(trip_id):
+        return 41
+
+    backplane = InProcessBackplane(lambda *args: None, last_sequence)
+
+    assert await backplane.next_sequence('trip_001') == 42
+    assert await backplane.next_sequence('trip_001') == 43
+
+
+@pytest.mark.asyncio
+async def test_redis_backplane_fans_out_across_workers():
+    """Test that two workers subscribed to a room both receive a frame"""
+    broker = LocalPubSubBroker()
+    port = await broker.start(port=0)
+    url = f'redis://127.0.0.1:{port}'
+    received_a, received_b = [], []
+    worker_a = RedisBackplane(lambda *args: received_a.append(args), url)
+    worker_b = RedisBackplane(lambda *args: received_b.append(args), url)
+    await worker_a.start()
+    await worker_b.start()
+    await worker_a.subscribe('trip_001')
+    await worker_b.subscribe('trip_001')
+    await wait_for(lambda: len(broker.channels.get('tripwizards:chat:trip_001', ())) == 2)
+
+    await worker_a.publish('trip_001', 7, '{"message": "héllo"}')
+    await wait_for(lambda: received_a and received_b)
+
+    assert received_a == received_b == [('trip_001', 7, '{"message": "héllo"}')]
+    await worker_a.stop()
+    await worker_b.stop()
+    await broker.stop()
+
+
+@pytest.mark.asyncio
+async def test_unsubscribed_worker_stops_receiving():
+    """Test that a worker without local connections gets no frames"""
+    broker = LocalPubSubBroker()
+    port = await broker.start(port=0)
+    url = f'redis://127.0.0.1:{port}'
+    received = []
+    publisher = RedisBackplane(lambda *args: None, url)
+    worker = RedisBackplane(lambda *args: received.append(args), url)
+    await publisher.start()
+    await worker.start()
+    await worker.subscribe('trip_001')
+    await wait_for(lambda: 'tripwizards:chat:trip_001' in broker.channels)
+    await worker.unsubscribe('trip_001')
+    await wait_for(lambda: 'tripwizards:chat:trip_001' not in broker.channels)
+
+    await publisher.publish('trip_001', 1, 'frame')
+    await asyncio.sleep(0.02)
+
+    assert received == []
+    await publisher.stop()
+    await worker.stop()
+    await broker.stop()
+
+
+@pytest.mark.asyncio
+async def test_redis_sequences_are_shared_between_workers():
+    """Test that workers draw from one per-trip counter seeded once"""
+    broker = LocalPubSubBroker()
+    port = await broker.start(port=0)
+    url = f'redis://127.0.0.1:{port}'
+
+    async def last_sequence(trip_id):
+        return 10
+
+    worker_a = RedisBackplane(lambda *args: None, url, last_sequence)
+    worker_b = RedisBackplane(lambda *args: None, url, last_sequence)
+    await worker_a.start()
+    await worker_b.start()
+
+    assert await worker_a.next_sequence('trip_001') == 11
+    assert await worker_b.next_sequence('trip_001') == 12
+    assert await worker_a.next_sequence('trip_001') == 13
+    await worker_a.stop()
+    await worker_b.stop()
+    await broker.stop()
+
+
+@pytest.mark.asyncio
+async def test_unreachable_redis_falls_back_to_local_sequencing():
+    """Test that a worker keeps numbering and delivering its rooms when Redis goes away"""
+    broker = LocalPubSubBroker()
+    port = await broker.start(port=0)
+    delivered = []
+
+    async def last_sequence(trip_id):
+        return 10
+
+    worker = RedisBackplane(lambda *args: delivered.append(args), f'redis://127.0.0.1:{port}', last_sequence)
+    await worker.start()
+    assert await worker.next_sequence('trip_001') == 11
+    await broker.stop()
+    await worker._publisher.close()
+
+    seq = await worker.next_sequence('trip_001')
+    await worker.publish('trip_001', seq, '{"message": "still here"}')
+
+    assert seq == 12
+    assert delivered == [('trip_001', 12, '{"message": "still here"}')]
+    assert worker.stats()['failed'] == 2
+    await worker.stop()
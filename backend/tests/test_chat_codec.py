@@ -0,0 +1,94 @@
+"""
+Tests for chat wire formats and subprotocol negotiation
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import json
+import pytest
+from trip_wizards.chat_codec import (
+    JSON_CODEC,
+    ChatCodec,
+    MSGPACK_DEFLATE_PROTOCOL,
+    MSGPACK_PROTOCOL,
+    negotiate,
+)
+
+pytest.importorskip('msgpack')
+
+MESSAGE = {
+    'message': 'Shall we book the sushi place in Ginza for Thursday night?',
+    'sender': 'test_user_alice_123',
+    'isAgent': False,
+    'timestamp': '2024-04-15T10:30:00.123000',
+    'trip_id': 'trip_001',
+    'seq': 42,
+}
+
+
+def test_negotiate_defaults_to_json():
+    """Test that clients without a known subprotocol get JSON"""
+    assert negotiate([]) is JSON_CODEC
+    assert negotiate(['chat.superprotocol']) is JSON_CODEC
+
+
+def test_codec_without_batch_encoding_cannot_be_created():
+    """Test that a codec missing an override fails when constructed"""
+    class Incomplete(ChatCodec):
+        def encode(self, message):
+            return ''
+
+        def decode(self, data):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_negotiate_honours_client_preference_order():
+    """Test that the first supported subprotocol offered by the client wins"""
+    codec = negotiate(['unknown', MSGPACK_DEFLATE_PROTOCOL, MSGPACK_PROTOCOL])
+    assert codec.protocol == MSGPACK_DEFLATE_PROTOCOL
+
+
+def test_msgpack_frame_is_compact_and_round_trips():
+    """Test that binary frames drop trip_id and use integer timestamps"""
+    codec = negotiate([MSGPACK_PROTOCOL])
+
+    encoded = codec.encode(MESSAGE)
+    decoded = codec.decode(encoded)
+
+    assert len(encoded) < len(json.dumps(MESSAGE).encode())
+    assert 'trip_id' not in decoded
+    assert decoded['timestamp'] == 1713177000123
+    assert decoded['message'] == MESSAGE['message']
+    assert decoded['seq'] == 42
+
+
+def test_deflate_codec_round_trips():
+    """Test that deflated frames decode to the same message"""
+    codec = negotiate([MSGPACK_DEFLATE_PROTOCOL])
+
+    decoded = codec.decode(codec.encode({'message': 'hello ' * 50, 'sender': 'bob'}))
+
+    assert decoded == {'message': 'hello ' * 50, 'sender': 'bob'}
+
+
+def test_binary_codec_accepts_inbound_json_text():
+    """Test that text frames from binary clients are still parsed as JSON"""
+    codec = negotiate([MSGPACK_PROTOCOL])
+    assert codec.decode('{"message": "hi"}') == {'message': 'hi'}
+
+
+def test_binary_batch_is_one_packed_array():
+    """Test that a batch of frames encodes to a single MessagePack array"""
+    import msgpack
+
+    codec = negotiate([MSGPACK_PROTOCOL])
+    frames = [json.dumps({'message': 'a', 'seq': 1}), json.dumps({'message': 'b', 'seq': 2})]
+
+    assert msgpack.unpackb(codec.encode_batch(frames)) == [{'m': 'a', 'q': 1}, {'m': 'b', 'q': 2}]
+    assert json.loads(JSON_CODEC.encode_batch(frames))[1]['message'] == 'b'
@@ -0,0 +1,91 @@
+"""
+Tests for chat heartbeats and idle connection reaping
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import json
+import pytest
+from trip_wizards.chat_heartbeat import HeartbeatMonitor, IdleConnection
+from trip_wizards.chat_rooms import RoomBroadcaster
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+        self.inbound = asyncio.Queue()
+
+    async def send_text(self, frame):
+        self.frames.append(frame)
+
+    async def receive(self):
+        return await self.inbound.get()
+
+    async def close(self, code=1000):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_pings_only_heartbeat_connections():
+    """Test that legacy connections never see ping frames"""
+    rooms = RoomBroadcaster()
+    monitor = HeartbeatMonitor(rooms)
+    legacy, modern = FakeWebSocket(), FakeWebSocket()
+    rooms.join('trip_001', legacy)
+    rooms.join('trip_001', modern, heartbeat=True)
+
+    assert monitor.ping_all() == 1
+    await asyncio.sleep(0)
+
+    assert legacy.frames == []
+    assert json.loads(modern.frames[0])['type'] == 'ping'
+
+
+@pytest.mark.asyncio
+async def test_silent_heartbeat_connection_is_reaped():
+    """Test that a heartbeat connection without frames times out"""
+    rooms = RoomBroadcaster()
+    monitor = HeartbeatMonitor(rooms, idle_timeout=0.01)
+    socket = FakeWebSocket()
+    connection = rooms.join('trip_001', socket, heartbeat=True)
+
+    with pytest.raises(IdleConnection):
+        await monitor.receive(socket, connection)
+    assert monitor.stats()['reaped'] == 1
+
+
+@pytest.mark.asyncio
+async def test_receive_marks_connection_alive():
+    """Test that any inbound frame refreshes the last-seen time"""
+    rooms = RoomBroadcaster()
+    monitor = HeartbeatMonitor(rooms, idle_timeout=1.0)
+    socket = FakeWebSocket()
+    connection = rooms.join('trip_001', socket, heartbeat=True)
+    connection.last_seen -= 30
+    socket.inbound.put_nowait({'type': 'websocket.receive', 'text': '{"type": "pong"}'})
+
+    received = await monitor.receive(socket, connection)
+
+    assert received['text'] == '{"type": "pong"}'
+    assert rooms.room_stats()['trip_001']['max_idle_seconds'] < 1
+
+
+@pytest.mark.asyncio
+async def test_passive_connection_without_heartbeat_is_not_reaped():
+    """Test that connections that never opted in may stay silent past the idle timeout"""
+    rooms = RoomBroadcaster()
+    monitor = HeartbeatMonitor(rooms, idle_timeout=0.01)
+    socket = FakeWebSocket()
+    connection = rooms.join('trip_001', socket)
+
+    receiving = asyncio.create_task(monitor.receive(socket, connection))
+    await asyncio.sleep(0.05)
+    assert not receiving.done()
+
+    socket.inbound.put_nowait({'type': 'websocket.receive', 'text': '{"message": "hi"}'})
+    assert (await receiving)['text'] == '{"message": "hi"}'
+    assert monitor.stats()['reaped'] == 0
@@ -0,0 +1,132 @@
+"""
+Tests for per-trip chat ring buffers and resume-from-sequence
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import json
+import pytest
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.chat_history import HISTORY_GAP, ChatHistory, RoomHistory, frame_from_document
+
+
+def seed_messages(client, trip_id, count):
+    for seq in range(1, count + 1):
+        client.seed(f'chat_messages/{trip_id}_{seq}', {
+            'tripId': trip_id,
+            'message': f'msg {seq}',
+            'sender': 'alice',
+            'isAgent': False,
+            'timestamp': '2024-04-15T10:00:00',
+            'seq': seq,
+        })
+
+
+def test_ring_buffer_evicts_oldest_and_raises_floor():
+    """Test that overflowing the buffer moves the floor forward"""
+    room = RoomHistory(capacity=3)
+    for seq in range(1, 6):
+        room.record(seq, f'frame {seq}')
+
+    assert [seq for seq, _ in room.entries] == [3, 4, 5]
+    assert room.covers(2)
+    assert not room.covers(1)
+
+
+def test_ring_buffer_orders_late_frames():
+    """Test that frames arriving out of order are stored by sequence"""
+    room = RoomHistory(capacity=10)
+    for seq in (1, 3, 2, 3):
+        room.record(seq, f'frame {seq}')
+
+    assert [seq for seq, _ in room.entries] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_resume_served_from_live_buffer_without_reads():
+    """Test that a resume within the buffer costs no Firestore read"""
+    client = FakeAsyncFirestore()
+    history = ChatHistory(client, capacity=10)
+    history.track('trip_001')
+    for seq in range(5, 9):
+        history.record('trip_001', seq, f'frame {seq}')
+
+    entries = await history.replay('trip_001', 6)
+
+    assert entries == [(7, 'frame 7'), (8, 'frame 8')]
+    assert client.rpc_count == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_resumes_share_one_seed_read():
+    """Test that a reconnect storm seeds the buffer with a single read"""
+    client = FakeAsyncFirestore(latency=0.01)
+    seed_messages(client, 'trip_001', 5)
+    history = ChatHistory(client, capacity=10)
+    history.track('trip_001')
+
+    results = await asyncio.gather(*(history.replay('trip_001', 3) for _ in range(20)))
+
+    assert client.rpc_count == 1
+    assert all([seq for seq, _ in entries] == [4, 5] for entries in results)
+    assert json.loads(results[0][0][1])['message'] == 'msg 4'
+
+
+@pytest.mark.asyncio
+async def test_overrun_buffer_falls_back_to_firestore():
+    """Test that a client behind the buffer is served from Firestore"""
+    client = FakeAsyncFirestore()
+    seed_messages(client, 'trip_001', 8)
+    history = ChatHistory(client, capacity=3)
+    history.track('trip_001')
+    for seq in range(6, 9):
+        history.record('trip_001', seq, f'frame {seq}')
+
+    entries = await history.replay('trip_001', 2)
+
+    assert [seq for seq, _ in entries] == [3, 4, 5, 6, 7, 8]
+    assert entries[-1] == (8, 'frame 8')
+    assert history.stats()['firestore_reads'] == 1
+
+
+@pytest.mark.asyncio
+async def test_capped_replay_starts_with_a_gap_frame():
+    """Test that a client behind more than max_replay frames is told what it missed"""
+    client = FakeAsyncFirestore()
+    seed_messages(client, 'trip_001', 8)
+    history = ChatHistory(client, capacity=3, max_replay=2)
+    history.track('trip_001')
+    for seq in range(6, 9):
+        history.record('trip_001', seq, f'frame {seq}')
+
+    entries = await history.replay('trip_001', 1)
+
+    assert [seq for seq, _ in entries] == [3, 4, 5, 6, 7, 8]
+    assert json.loads(entries[0][1]) == {'type': HISTORY_GAP, 'trip_id': 'trip_001', 'from': 2, 'through': 3}
+    assert history.stats()['gaps'] == 1
+
+
+def test_rebuilt_frame_keeps_type_and_stream_id():
+    """Test that frames rebuilt from Firestore keep their type and stream_id"""
+    frame = json.loads(frame_from_document({
+        'tripId': 'trip_001', 'message': 'Day 1', 'sender': 'agent', 'isAgent': True,
+        'seq': 4, 'type': 'agent', 'stream_id': 'abc',
+    }))
+
+    assert frame['type'] == 'agent' and frame['stream_id'] == 'abc'
+    assert 'type' not in json.loads(frame_from_document({'tripId': 'trip_001', 'seq': 5}))
+
+
+@pytest.mark.asyncio
+async def test_last_sequence_reads_highest_persisted():
+    """Test that the last persisted sequence number is found"""
+    client = FakeAsyncFirestore()
+    seed_messages(client, 'trip_001', 12)
+    history = ChatHistory(client)
+
+    assert await history.last_sequence('trip_001') == 12
+    assert await history.last_sequence('trip_002') == 0
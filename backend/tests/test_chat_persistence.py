@@ -0,0 +1,94 @@
+"""
+Tests for write-behind chat message persistence
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import pytest
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.chat_persistence import ChatWriteBehind
+
+
+def chat_docs(client):
+    return [data for path, data in client._docs.items() if path.startswith('chat_messages/')]
+
+
+@pytest.mark.asyncio
+async def test_messages_flushed_in_one_batch_after_interval():
+    """Test that messages arriving together are committed as one batch"""
+    client = FakeAsyncFirestore()
+    writer = ChatWriteBehind(client, flush_interval=0.01)
+    writer.start()
+
+    for i in range(5):
+        writer.enqueue({'tripId': 'trip_001', 'message': f'msg {i}'})
+    await asyncio.sleep(0.05)
+
+    assert client.batch_sizes == [5]
+    assert len(chat_docs(client)) == 5
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_batch_flushed_when_full():
+    """Test that a full batch is committed without waiting for the interval"""
+    client = FakeAsyncFirestore()
+    writer = ChatWriteBehind(client, max_batch=3, flush_interval=10)
+    writer.start()
+
+    for i in range(3):
+        writer.enqueue({'message': f'msg {i}'})
+    await asyncio.sleep(0.01)
+
+    assert client.batch_sizes == [3]
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_queue_is_bounded():
+    """Test that messages beyond max_pending are dropped and counted"""
+    writer = ChatWriteBehind(FakeAsyncFirestore(), max_pending=2)
+
+    results = [writer.enqueue({'message': str(i)}) for i in range(3)]
+
+    assert results == [True, True, False]
+    assert writer.stats()['dropped'] == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending_messages():
+    """Test that shutdown writes everything still queued"""
+    client = FakeAsyncFirestore()
+    writer = ChatWriteBehind(client, max_batch=2, flush_interval=10)
+
+    for i in range(5):
+        writer.enqueue({'message': str(i)})
+    await writer.stop()
+
+    assert client.batch_sizes == [2, 2, 1]
+    assert writer.stats()['written'] == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_commit_is_counted():
+    """Test that a failing commit increments the failed counter"""
+    client = FakeAsyncFirestore()
+
+    async def failing_commit():
+        raise RuntimeError("unavailable")
+
+    client.batch = lambda: type('Batch', (), {
+        'set': lambda self, ref, data: None,
+        'commit': lambda self: failing_commit(),
+    })()
+    writer = ChatWriteBehind(client)
+
+    writer.enqueue({'message': 'hello'})
+    await writer.stop()
+
+    assert writer.stats()['failed'] == 1
+    assert writer.stats()['written'] == 0
@@ -0,0 +1,109 @@
+"""
+Tests for ephemeral typing, presence and cursor updates
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import json
+import pytest
+from trip_wizards.chat_presence import PresenceTracker, is_ephemeral
+
+
+def make_tracker(**kwargs):
+    published = []
+    tracker = None
+
+    async def publish(trip_id, frame):
+        published.append(json.loads(frame))
+        tracker.observe(trip_id, frame)
+
+    tracker = PresenceTracker(publish, **kwargs)
+    tracker.track('trip_001')
+    return tracker, published
+
+
+def test_only_signal_types_are_ephemeral():
+    """Test that chat messages are not treated as ephemeral"""
+    assert is_ephemeral({'type': 'typing', 'sender': 'alice'})
+    assert not is_ephemeral({'message': 'hi', 'sender': 'alice'})
+    assert not is_ephemeral({'type': 'message', 'message': 'hi'})
+
+
+@pytest.mark.asyncio
+async def test_burst_collapses_to_latest_state():
+    """Test that updates within the interval collapse into one trailing frame"""
+    tracker, published = make_tracker(min_interval=0.02)
+
+    for x in range(10):
+        await tracker.update('trip_001', 'alice', 'cursor', {'x': x})
+    await asyncio.sleep(0.04)
+
+    assert [frame['state'] for frame in published] == [{'x': 0}, {'x': 9}]
+    assert tracker.stats()['collapsed'] == 8
+    assert tracker.snapshot('trip_001') == {'alice': {'cursor': {'x': 9}}}
+
+
+@pytest.mark.asyncio
+async def test_throttle_is_per_sender_and_kind():
+    """Test that different senders and kinds are not throttled together"""
+    tracker, published = make_tracker(min_interval=1.0)
+
+    await tracker.update('trip_001', 'alice', 'typing', True)
+    await tracker.update('trip_001', 'alice', 'presence', 'online')
+    await tracker.update('trip_001', 'bob', 'typing', True)
+
+    assert len(published) == 3
+    assert tracker.snapshot('trip_001') == {
+        'alice': {'typing': True, 'presence': 'online'},
+        'bob': {'typing': True},
+    }
+
+
+@pytest.mark.asyncio
+async def test_leave_publishes_offline_and_clears_snapshot():
+    """Test that a closing sender is announced offline and dropped"""
+    tracker, published = make_tracker(min_interval=1.0)
+    await tracker.update('trip_001', 'alice', 'typing', True)
+    await tracker.update('trip_001', 'alice', 'typing', False)
+
+    await tracker.leave('trip_001', 'alice')
+    await asyncio.sleep(0)
+
+    assert published[-1]['type'] == 'presence'
+    assert published[-1]['state'] == 'offline'
+    assert tracker.snapshot('trip_001') == {}
+    assert tracker.stats()['pending'] == 0
+
+
+@pytest.mark.asyncio
+async def test_user_stays_online_while_another_socket_is_open():
+    """Test that only the last socket of a user to close announces them offline"""
+    tracker, published = make_tracker()
+    tracker.join('trip_001', 'alice')
+    tracker.join('trip_001', 'alice')
+    await tracker.update('trip_001', 'alice', 'presence', 'online')
+
+    assert not await tracker.leave('trip_001', 'alice')
+    assert tracker.snapshot('trip_001') == {'alice': {'presence': 'online'}}
+    assert tracker.stats()['connections'] == 1
+
+    assert await tracker.leave('trip_001', 'alice')
+    assert published[-1]['state'] == 'offline'
+    assert tracker.snapshot('trip_001') == {}
+    assert tracker.stats()['connections'] == 0
+
+
+@pytest.mark.asyncio
+async def test_untracked_rooms_keep_no_state():
+    """Test that frames for rooms without local connections are ignored"""
+    tracker, _ = make_tracker()
+    tracker.forget('trip_001')
+
+    await tracker.update('trip_001', 'alice', 'typing', True)
+
+    assert tracker.snapshot('trip_001') == {}
+    assert tracker.stats()['rooms'] == 0
@@ -0,0 +1,102 @@
+"""
+Tests for chat ingestion rate limits
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import time
+import pytest
+from trip_wizards.chat_rate_limit import (
+    CLOSE,
+    DELAY,
+    DROP,
+    ChatRateLimiter,
+    RateLimitExceeded,
+)
+
+
+@pytest.mark.asyncio
+async def test_drop_policy_allows_burst_then_drops():
+    """Test that messages beyond the burst are dropped"""
+    limiter = ChatRateLimiter(socket_rate=1, socket_burst=3, policy=DROP)
+    bucket = limiter.socket_bucket()
+
+    results = [await limiter.admit('trip_001', bucket) for _ in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert limiter.stats()['dropped'] == 2
+
+
+@pytest.mark.asyncio
+async def test_delay_policy_paces_messages():
+    """Test that delayed messages are admitted at the refill rate"""
+    limiter = ChatRateLimiter(socket_rate=100, socket_burst=1, policy=DELAY)
+    bucket = limiter.socket_bucket()
+
+    started = time.monotonic()
+    results = [await limiter.admit('trip_001', bucket) for _ in range(4)]
+
+    assert all(results)
+    assert time.monotonic() - started >= 0.025
+    assert limiter.stats()['delayed'] == 3
+
+
+@pytest.mark.asyncio
+async def test_delay_policy_drops_beyond_max_delay():
+    """Test that a message is dropped rather than waiting too long"""
+    limiter = ChatRateLimiter(socket_rate=0.1, socket_burst=1, policy=DELAY, max_delay=0.01)
+    bucket = limiter.socket_bucket()
+
+    assert await limiter.admit('trip_001', bucket)
+    assert not await limiter.admit('trip_001', bucket)
+
+
+@pytest.mark.asyncio
+async def test_trip_bucket_is_shared_between_sockets():
+    """Test that sockets in one trip share the trip limit"""
+    limiter = ChatRateLimiter(socket_burst=10, trip_rate=1, trip_burst=2, policy=DROP)
+    first, second = limiter.socket_bucket(), limiter.socket_bucket()
+
+    assert await limiter.admit('trip_001', first)
+    assert await limiter.admit('trip_001', second)
+    assert not await limiter.admit('trip_001', second)
+    assert await limiter.admit('trip_002', second)
+
+
+@pytest.mark.asyncio
+async def test_close_policy_raises():
+    """Test that the close policy signals the socket should be closed"""
+    limiter = ChatRateLimiter(socket_rate=1, socket_burst=1, policy=CLOSE)
+    bucket = limiter.socket_bucket()
+    await limiter.admit('trip_001', bucket)
+
+    with pytest.raises(RateLimitExceeded):
+        await limiter.admit('trip_001', bucket)
+    assert limiter.stats()['closed'] == 1
+
+
+def test_ephemeral_frames_are_limited_separately():
+    """Test that ephemeral frames draw from their own bucket and are dropped over it"""
+    limiter = ChatRateLimiter(socket_burst=1, ephemeral_rate=1, ephemeral_burst=3, policy=DELAY)
+    bucket, senders = limiter.ephemeral_bucket(), set()
+
+    results = [limiter.admit_ephemeral(bucket, senders, 'alice') for _ in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert limiter.stats()['ephemeral_dropped'] == 2
+    assert limiter.stats()['allowed'] == 0
+
+
+def test_socket_speaks_for_a_bounded_number_of_senders():
+    """Test that frames naming new senders are dropped once a socket hits the cap"""
+    limiter = ChatRateLimiter(max_senders=2)
+    bucket, senders = limiter.ephemeral_bucket(), set()
+
+    assert limiter.admit_ephemeral(bucket, senders, 'alice')
+    assert limiter.admit_ephemeral(bucket, senders, 'bob')
+    assert not limiter.admit_ephemeral(bucket, senders, 'mallory')
+    assert limiter.admit_ephemeral(bucket, senders, 'alice')
+    assert senders == {'alice', 'bob'}
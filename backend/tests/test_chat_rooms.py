@@ -0,0 +1,180 @@
+"""
+Tests for trip chat room fan-out
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import json
+import pytest
+from trip_wizards.chat_rooms import (
+    DROP_OLDEST,
+    SLOW_CONSUMER_CLOSE_CODE,
+    RoomBroadcaster,
+)
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False):
+        self.frames = []
+        self.close_code = None
+        self._unblocked = asyncio.Event()
+        if not blocked:
+            self._unblocked.set()
+
+    async def send_text(self, frame):
+        await self._unblocked.wait()
+        self.frames.append(frame)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_every_connection_with_same_frame():
+    """Test that the frame is encoded once and shared by all recipients"""
+    rooms = RoomBroadcaster()
+    sockets = [FakeWebSocket() for _ in range(3)]
+    for socket in sockets:
+        rooms.join('trip_001', socket)
+
+    assert rooms.broadcast('trip_001', {'message': 'hi'}) == 3
+    await asyncio.sleep(0)
+
+    frames = [socket.frames[0] for socket in sockets]
+    assert json.loads(frames[0]) == {'message': 'hi'}
+    assert all(frame is frames[0] for frame in frames)
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_evicted_without_blocking_room():
+    """Test that a stalled client is closed while others keep receiving"""
+    rooms = RoomBroadcaster(max_queue=2)
+    fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+    rooms.join('trip_001', fast)
+    rooms.join('trip_001', slow)
+
+    for i in range(5):
+        rooms.broadcast('trip_001', {'message': i})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    assert len(fast.frames) == 5
+    assert slow.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert rooms.connection_count('trip_001') == 1
+    assert rooms.stats()['evicted'] == 1
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_policy_keeps_connection():
+    """Test that drop_oldest discards queued frames instead of evicting"""
+    rooms = RoomBroadcaster(max_queue=1, slow_consumer_policy=DROP_OLDEST)
+    slow = FakeWebSocket(blocked=True)
+    connection = rooms.join('trip_001', slow)
+    await asyncio.sleep(0)
+
+    for i in range(4):
+        rooms.broadcast('trip_001', {'message': i})
+
+    assert rooms.connection_count('trip_001') == 1
+    assert connection.dropped == 3
+    await rooms.leave(connection)
+
+
+@pytest.mark.asyncio
+async def test_leave_removes_empty_room():
+    """Test that the room is deleted once its last connection leaves"""
+    rooms = RoomBroadcaster()
+    connection = rooms.join('trip_001', FakeWebSocket())
+
+    await rooms.leave(connection)
+
+    assert 'trip_001' not in rooms.rooms
+    assert rooms.broadcast('trip_001', {'message': 'hi'}) == 0
+
+
+@pytest.mark.asyncio
+async def test_coalesced_frames_arrive_as_one_ordered_array():
+    """Test that frames within the window are sent as a single array frame"""
+    rooms = RoomBroadcaster(coalesce_window=0.01)
+    batched, plain = FakeWebSocket(), FakeWebSocket()
+    rooms.join('trip_001', batched, batched=True)
+    rooms.join('trip_001', plain)
+
+    for i in range(1, 6):
+        rooms.broadcast('trip_001', {'message': i, 'seq': i})
+    await asyncio.sleep(0.03)
+
+    assert len(batched.frames) == 1
+    assert [item['seq'] for item in json.loads(batched.frames[0])] == [1, 2, 3, 4, 5]
+    assert len(plain.frames) == 5
+    assert rooms.stats()['coalesced_batches'] == 1
+
+
+@pytest.mark.asyncio
+async def test_coalescing_respects_latency_cap():
+    """Test that a steady stream is flushed once the max delay is reached"""
+    rooms = RoomBroadcaster(coalesce_window=0.02, coalesce_max_delay=0.03)
+    socket = FakeWebSocket()
+    rooms.join('trip_001', socket, batched=True)
+
+    for i in range(8):
+        rooms.broadcast('trip_001', {'message': i, 'seq': i + 1})
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+
+    assert len(socket.frames) >= 2
+    sequences = []
+    for frame in socket.frames:
+        decoded = json.loads(frame)
+        sequences += [item['seq'] for item in decoded] if isinstance(decoded, list) else [decoded['seq']]
+    assert sequences == list(range(1, 9))
+
+
+@pytest.mark.asyncio
+async def test_batch_skips_frames_already_replayed():
+    """Test that a batch overlapping replayed history only sends newer frames"""
+    rooms = RoomBroadcaster(coalesce_window=0.01)
+    socket = FakeWebSocket()
+    connection = rooms.join('trip_001', socket, start=False, batched=True)
+
+    for i in range(1, 4):
+        rooms.broadcast('trip_001', {'message': i, 'seq': i})
+    connection.start(skip_through=2)
+    await asyncio.sleep(0.03)
+
+    assert [json.loads(frame)['seq'] for frame in socket.frames] == [3]
+
+
+@pytest.mark.asyncio
+async def test_batching_ignored_when_coalescing_disabled():
+    """Test that batch clients get plain frames when the window is zero"""
+    rooms = RoomBroadcaster()
+    socket = FakeWebSocket()
+    rooms.join('trip_001', socket, batched=True)
+
+    rooms.broadcast('trip_001', {'message': 'hi'})
+    await asyncio.sleep(0)
+
+    assert json.loads(socket.frames[0]) == {'message': 'hi'}
+
+
+@pytest.mark.asyncio
+async def test_queued_bytes_track_outbound_buffer():
+    """Test that queued bytes grow with the backlog and drain when sent"""
+    rooms = RoomBroadcaster()
+    socket = FakeWebSocket(blocked=True)
+    connection = rooms.join('trip_001', socket)
+
+    rooms.broadcast_frame('trip_001', 'x' * 100)
+    rooms.broadcast_frame('trip_001', 'y' * 50)
+    await asyncio.sleep(0)
+    assert rooms.room_stats()['trip_001']['queued_bytes'] == 50
+
+    socket._unblocked.set()
+    await asyncio.sleep(0.01)
+    assert connection.queued_bytes == 0
+    assert rooms.stats()['queued_bytes'] == 0
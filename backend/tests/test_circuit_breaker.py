@@ -0,0 +1,96 @@
+"""
+Tests for the circuit breaker
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from trip_wizards.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_opens_after_consecutive_failures():
+    """Test that the circuit opens at the failure threshold and turns calls away"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10, clock=clock)
+
+    for _ in range(2):
+        assert breaker.acquire() == 0
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.acquire() == 0
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.acquire() == 10
+    assert breaker.stats()['rejected'] == 1
+    assert breaker.stats()['opened'] == 1
+
+
+def test_success_resets_failure_count():
+    """Test that failures must be consecutive to open the circuit"""
+    breaker = CircuitBreaker(failure_threshold=2, clock=FakeClock())
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    """Test that after the cooldown one probe decides whether the circuit closes"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+    breaker.record_failure()
+
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.acquire() == 0
+    assert breaker.acquire() > 0
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.acquire() == 0
+
+
+def test_failed_probe_doubles_cooldown():
+    """Test that a failed probe reopens the circuit for longer, up to the cap"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10, max_cooldown=15, clock=clock)
+    breaker.record_failure()
+
+    clock.now += 10
+    breaker.acquire()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.stats()['cooldown_s'] == 15
+    clock.now += 14
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+
+
+def test_hold_off_honours_retry_after():
+    """Test that retry_after from the upstream keeps the circuit open that long"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=5, cooldown=10, clock=clock)
+
+    breaker.hold_off(60)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()['retry_after_s'] == 60
+    clock.now += 59
+    assert breaker.acquire() == 1
+    clock.now += 1
+    assert breaker.acquire() == 0
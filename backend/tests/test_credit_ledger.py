@@ -0,0 +1,164 @@
+"""
+Tests for the credit reservation ledger
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import pytest
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.credit_ledger import CreditLedger, InsufficientCredits
+from trip_wizards.firestore_store import FirestoreStore
+
+
+def make_store(remaining=100, latency=0.0):
+    client = FakeAsyncFirestore(latency=latency)
+    client.seed('user_credits/u1', {'remainingCredits': remaining, 'totalCredits': 100})
+    return client, FirestoreStore(client)
+
+
+@pytest.mark.asyncio
+async def test_debits_spend_a_leased_block_and_flush_in_one_batch():
+    """Test that debits share one lease transaction and are flushed together"""
+    client, store = make_store()
+    ledger = CreditLedger(store, block=10, worker_id='w1')
+
+    for _ in range(3):
+        await ledger.debit('u1')
+    rpcs = client.rpc_count
+    await ledger.flush()
+
+    assert client.rpc_count == rpcs + 1
+    assert client.data('user_credits/u1')['remainingCredits'] == 97
+    assert client.data('user_credits/u1')['leasedCredits'] == 7
+    assert client.data('user_credits/u1')['usedCredits'] == 3
+    assert client.data('credit_leases/u1_w1')['credits'] == 7
+    assert ledger.stats()['leased'] == 10
+
+
+@pytest.mark.asyncio
+async def test_insufficient_credits_raises_402():
+    """Test that a user without enough credits is refused and nothing is taken"""
+    client, store = make_store(remaining=0)
+    ledger = CreditLedger(store, worker_id='w1')
+
+    with pytest.raises(InsufficientCredits) as excinfo:
+        await ledger.debit('u1')
+
+    assert excinfo.value.status_code == 402
+    assert client.data('credit_leases/u1_w1') is None
+    assert ledger.stats()['refused'] == 1
+
+
+@pytest.mark.asyncio
+async def test_workers_never_spend_more_than_the_balance():
+    """Test that concurrent workers leasing from one balance spend it exactly once"""
+    client, store = make_store(remaining=25, latency=0.001)
+    workers = [CreditLedger(store, block=10, worker_id=f"w{i}") for i in range(3)]
+
+    async def spend(ledger):
+        spent = 0
+        while True:
+            try:
+                await ledger.debit('u1')
+            except InsufficientCredits:
+                return spent
+            spent += 1
+
+    spent = await asyncio.gather(*(spend(ledger) for ledger in workers))
+
+    assert sum(spent) == 25
+    assert client.aborted > 0
+    for ledger in workers:
+        await ledger.stop()
+    assert client.data('user_credits/u1')['remainingCredits'] == 0
+    assert client.data('user_credits/u1')['leasedCredits'] == 0
+    assert client.data('user_credits/u1')['usedCredits'] == 25
+
+
+@pytest.mark.asyncio
+async def test_a_small_balance_is_not_parked_on_one_worker():
+    """Test that a balance of one block or less is leased per call, so other workers can spend it"""
+    client, store = make_store(remaining=10)
+    first = CreditLedger(store, block=10, worker_id='w1')
+    second = CreditLedger(store, block=10, worker_id='w2')
+
+    await first.debit('u1')
+    await first.flush()
+    for _ in range(9):
+        await second.debit('u1')
+    with pytest.raises(InsufficientCredits):
+        await first.debit('u1')
+
+    assert client.data('user_credits/u1')['remainingCredits'] == 9
+    await second.flush()
+    assert client.data('user_credits/u1')['remainingCredits'] == 0
+
+
+@pytest.mark.asyncio
+async def test_a_lease_takes_at_most_half_the_unleased_balance():
+    """Test that a worker leasing from a larger balance leaves the other half to the rest"""
+    client, store = make_store(remaining=12)
+    ledger = CreditLedger(store, block=10, worker_id='w1')
+
+    await ledger.debit('u1')
+
+    assert client.data('user_credits/u1')['leasedCredits'] == 6
+    assert client.data('user_credits/u1')['remainingCredits'] == 12
+
+
+@pytest.mark.asyncio
+async def test_new_allowance_keeps_outstanding_leases_and_late_refunds():
+    """Test that writing a new allowance over a leased balance and refunding after release stay consistent"""
+    client, store = make_store(remaining=100)
+    ledger = CreditLedger(store, block=10, worker_id='w1')
+    await ledger.debit('u1')
+    await ledger.debit('u1')
+    await ledger.flush()
+
+    # What confirm_payment writes for a new plan
+    await store.write_batch([('merge', store.document('user_credits', 'u1'), {
+        'remainingCredits': 1000, 'totalCredits': 1000, 'usedCredits': 0,
+    })])
+    await ledger.release(['u1'])
+    ledger.refund('u1')
+    await ledger.stop()
+
+    assert client.data('user_credits/u1')['remainingCredits'] == 1001
+    assert client.data('user_credits/u1')['leasedCredits'] == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_returns_unspent_credits():
+    """Test that shutdown flushes spending and gives back the rest of the lease"""
+    client, store = make_store()
+    ledger = CreditLedger(store, block=10, worker_id='w1')
+    await ledger.debit('u1')
+    await ledger.debit('u1')
+    ledger.refund('u1')
+
+    await ledger.stop()
+
+    assert client.data('user_credits/u1')['remainingCredits'] == 99
+    assert client.data('user_credits/u1')['usedCredits'] == 1
+    assert client.data('credit_leases/u1_w1') is None
+
+
+@pytest.mark.asyncio
+async def test_startup_reconciles_leases_of_dead_workers():
+    """Test that expired leases left by a crashed worker go back to the user"""
+    client, store = make_store()
+    crashed = CreditLedger(store, block=10, lease_ttl=-1, worker_id='dead')
+    await crashed.debit('u1')
+    await crashed.flush()
+
+    ledger = CreditLedger(store, worker_id='w2')
+    await ledger.start()
+    await ledger.stop()
+
+    assert client.data('user_credits/u1')['remainingCredits'] == 99
+    assert client.data('credit_leases/u1_dead') is None
+    assert ledger.stats()['reconciled'] == 1
@@ -0,0 +1,204 @@
+"""
+Tests for the read-through document cache
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import threading
+import pytest
+from google.cloud.firestore import ArrayRemove, ArrayUnion, Increment
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.doc_cache import CachedFirestoreStore, DocumentCache
+
+
+def make_store(**kwargs):
+    client = FakeAsyncFirestore()
+    client.seed('organizations/org_1', {'name': 'Wizards', 'memberIds': ['alice']})
+    client.seed('users/alice', {'subscriptionPlan': 'enterprise'})
+    return client, CachedFirestoreStore(client, DocumentCache(['organizations', 'users'], **kwargs))
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_hit_the_cache():
+    """Test that a cached document is read from Firestore once"""
+    client, store = make_store()
+
+    for _ in range(5):
+        org = await store.get('organizations', 'org_1')
+
+    assert org['name'] == 'Wizards'
+    assert client.rpc_count == 1
+    assert store.cache.stats()['collections']['organizations'] == {'hits': 4, 'misses': 1, 'hit_rate': 0.8}
+
+
+@pytest.mark.asyncio
+async def test_callers_cannot_change_the_cached_copy():
+    """Test that editing a returned document leaves the cache untouched"""
+    _, store = make_store()
+
+    org = await store.get('organizations', 'org_1')
+    org['memberIds'].append('mallory')
+
+    assert (await store.get('organizations', 'org_1'))['memberIds'] == ['alice']
+
+
+@pytest.mark.asyncio
+async def test_writes_are_seen_by_the_next_read():
+    """Test that update, set and batched writes are seen by the next read"""
+    client, store = make_store()
+    await store.get('organizations', 'org_1')
+    await store.get('users', 'alice')
+
+    await store.update('organizations', 'org_1', {'name': 'Renamed'})
+    await store.write_batch([('update', store.document('users', 'alice'), {'subscriptionPlan': 'free'})])
+    await store.set('organizations', 'org_1', {'name': 'Replaced', 'memberIds': []})
+
+    assert (await store.get('organizations', 'org_1'))['name'] == 'Replaced'
+    assert (await store.get('users', 'alice'))['subscriptionPlan'] == 'free'
+    assert store.cache.stats()['write_throughs'] == 2
+    assert store.cache.stats()['invalidations'] == 1
+
+
+@pytest.mark.asyncio
+async def test_array_updates_are_applied_to_the_cached_copy():
+    """Test that ArrayUnion/ArrayRemove updates keep the document cached and current"""
+    client, store = make_store()
+    await store.get('organizations', 'org_1')
+
+    await store.update('organizations', 'org_1', {'memberIds': ArrayUnion(['bob', 'alice'])})
+    await store.update('organizations', 'org_1', {'memberIds': ArrayRemove(['alice'])})
+    rpcs = client.rpc_count
+
+    assert (await store.get('organizations', 'org_1'))['memberIds'] == ['bob']
+    assert client.rpc_count == rpcs
+    assert client.data('organizations/org_1')['memberIds'] == ['bob']
+
+
+@pytest.mark.asyncio
+async def test_updates_the_cache_cannot_apply_drop_the_document():
+    """Test that overlapping updates and other transforms drop the cached copy"""
+    client, store = make_store()
+    client.latency = 0.001
+    await store.get('organizations', 'org_1')
+
+    await asyncio.gather(
+        store.update('organizations', 'org_1', {'name': 'First'}),
+        store.update('organizations', 'org_1', {'name': 'Second'}),
+    )
+    assert store.cache.stats()['entries'] == 0
+    assert (await store.get('organizations', 'org_1'))['name'] == client.data('organizations/org_1')['name']
+
+    await store.update('organizations', 'org_1', {'visits': Increment(1)})
+    assert (await store.get('organizations', 'org_1'))['visits'] == 1
+    assert store.cache.stats()['write_throughs'] == 0
+
+
+@pytest.mark.asyncio
+async def test_read_racing_a_write_is_not_cached():
+    """Test that a read started before a write does not cache the old document"""
+    client, store = make_store()
+    client.latency = 0.01
+
+    read = asyncio.create_task(store.get('organizations', 'org_1'))
+    await asyncio.sleep(0.001)
+    await store.update('organizations', 'org_1', {'name': 'Renamed'})
+    await read
+
+    assert (await store.get('organizations', 'org_1'))['name'] == 'Renamed'
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_ttl():
+    """Test that the least recently used entry is evicted and old entries expire"""
+    client, store = make_store(max_entries=1)
+    await store.get('organizations', 'org_1')
+    await store.get('users', 'alice')
+    assert store.cache.stats()['evictions'] == 1
+
+    _, store = make_store(ttl=0)
+    await store.get('users', 'alice')
+    await store.get('users', 'alice')
+    assert store.cache.stats()['expirations'] == 1
+
+
+class FakeWatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.unsubscribed = False
+
+    def unsubscribe(self):
+        self.unsubscribed = True
+
+
+class FakeWatchClient:
+    """Sync client stand-in whose listeners are triggered by the test."""
+
+    def __init__(self):
+        self.watches = {}
+
+    def collection(self, name):
+        client = self
+
+        class Collection:
+            def document(self, doc_id):
+                class Document:
+                    def on_snapshot(self, callback):
+                        watch = FakeWatch(callback)
+                        client.watches[f"{name}/{doc_id}"] = watch
+                        return watch
+                return Document()
+        return Collection()
+
+
+class FakeDocSnapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+@pytest.mark.asyncio
+async def test_snapshot_listener_refreshes_cached_document():
+    """Test that changes pushed by on_snapshot on another thread update the cache"""
+    watch_client = FakeWatchClient()
+    client, store = make_store(watch_client=watch_client)
+    await store.get('organizations', 'org_1')
+    watch = watch_client.watches['organizations/org_1']
+
+    thread = threading.Thread(target=watch.callback, args=([FakeDocSnapshot({'name': 'Elsewhere'})], [], None))
+    thread.start()
+    thread.join()
+    await asyncio.sleep(0)
+
+    assert (await store.get('organizations', 'org_1'))['name'] == 'Elsewhere'
+    assert client.rpc_count == 1
+    store.cache.stop()
+    assert watch.unsubscribed
+
+
+@pytest.mark.asyncio
+async def test_only_max_watched_documents_get_a_listener():
+    """Test that listeners are capped and a freed slot goes to the next cached document"""
+    watch_client = FakeWatchClient()
+    client, store = make_store(watch_client=watch_client, max_watched=1, max_entries=2)
+    client.seed('users/bob', {'subscriptionPlan': 'free'})
+    await store.get('organizations', 'org_1')
+    await store.get('users', 'alice')
+
+    assert list(watch_client.watches) == ['organizations/org_1']
+    assert store.cache.stats()['watched'] == 1
+    assert store.cache.stats()['unwatched'] == 1
+
+    await store.get('users', 'bob')
+
+    assert watch_client.watches['organizations/org_1'].unsubscribed
+    assert 'users/bob' in watch_client.watches
+    assert store.cache.stats()['watched'] == 1
+    store.cache.stop()
+    assert store.cache.stats()['watched'] == 0
@@ -0,0 +1,95 @@
+"""
+Tests for the request-scoped document loader
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import pytest
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.doc_cache import CachedFirestoreStore, DocumentCache
+from trip_wizards.doc_loader import DocumentLoader
+from trip_wizards.firestore_store import FirestoreStore
+
+
+def make_client():
+    client = FakeAsyncFirestore()
+    client.seed('organizations/org_1', {'name': 'Wizards'})
+    client.seed('users/alice', {'subscriptionPlan': 'enterprise'})
+    return client
+
+
+@pytest.mark.asyncio
+async def test_independent_reads_share_one_get_all():
+    """Test that reads of several collections requested together take one round trip"""
+    client = make_client()
+    loader = DocumentLoader(FirestoreStore(client))
+
+    org, user, missing = await asyncio.gather(
+        loader.get('organizations', 'org_1'),
+        loader.get('users', 'alice'),
+        loader.get('users', 'nobody'),
+    )
+
+    assert org == {'name': 'Wizards'}
+    assert user == {'subscriptionPlan': 'enterprise'}
+    assert missing is None
+    assert client.rpc_count == 1
+    assert loader.batches == 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_of_a_path_are_made_once():
+    """Test that a path is read once per loader and callers get their own copies"""
+    client = make_client()
+    loader = DocumentLoader(FirestoreStore(client))
+
+    first, second = await asyncio.gather(loader.get('users', 'alice'), loader.get('users', 'alice'))
+    first['subscriptionPlan'] = 'free'
+    third = await loader.get('users', 'alice')
+
+    assert second == third == {'subscriptionPlan': 'enterprise'}
+    assert client.rpc_count == 1
+
+    loader.forget('users', 'alice')
+    await loader.get('users', 'alice')
+    assert client.rpc_count == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_documents_are_not_read_again():
+    """Test that through a CachedFirestoreStore only cache misses reach Firestore"""
+    client = make_client()
+    store = CachedFirestoreStore(client, DocumentCache(['organizations', 'users']))
+    await store.get('organizations', 'org_1')
+    loader = DocumentLoader(store)
+
+    await asyncio.gather(loader.get('organizations', 'org_1'), loader.get('users', 'alice'))
+    await DocumentLoader(store).get('users', 'alice')
+
+    # The org read before the loader, and alice once for both loaders
+    assert client.rpc_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_fails_every_waiter_and_is_retried():
+    """Test that a failed get_all reaches every caller and is not remembered"""
+    client = make_client()
+    store = FirestoreStore(client)
+    loader = DocumentLoader(store)
+    real_get_all = store.get_all
+
+    async def unavailable(keys):
+        raise ConnectionError("Firestore unavailable")
+
+    store.get_all = unavailable
+    results = await asyncio.gather(
+        loader.get('organizations', 'org_1'), loader.get('users', 'alice'), return_exceptions=True
+    )
+    store.get_all = real_get_all
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert await loader.get('users', 'alice') == {'subscriptionPlan': 'enterprise'}
@@ -0,0 +1,115 @@
+"""
+Tests for the async Firestore data-access layer
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+from google.api_core.exceptions import AlreadyExists, NotFound
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.firestore_store import FirestoreStore
+
+
+@pytest.mark.asyncio
+async def test_get_missing_document_returns_none():
+    """Test that reading a missing document returns None"""
+    store = FirestoreStore(FakeAsyncFirestore())
+    assert await store.get('organizations', 'missing') is None
+
+
+@pytest.mark.asyncio
+async def test_add_then_get_round_trip():
+    """Test that added documents can be read back by their generated ID"""
+    store = FirestoreStore(FakeAsyncFirestore())
+    doc_id = await store.add('community_trips', {'title': 'Tokyo'})
+
+    assert await store.get('community_trips', doc_id) == {'title': 'Tokyo'}
+
+
+@pytest.mark.asyncio
+async def test_query_returns_ids_and_data():
+    """Test that array_contains queries return matching documents only"""
+    client = FakeAsyncFirestore()
+    client.seed('organizations/org_1', {'memberIds': ['alice', 'bob']})
+    client.seed('organizations/org_2', {'memberIds': ['carol']})
+    store = FirestoreStore(client)
+
+    result = await store.query('organizations', 'memberIds', 'array_contains', 'bob')
+
+    assert result == [('org_1', {'memberIds': ['alice', 'bob']})]
+
+
+@pytest.mark.asyncio
+async def test_update_where_commits_one_batch():
+    """Test that update_where applies all updates in a single commit"""
+    client = FakeAsyncFirestore()
+    client.seed('users/u1', {'stripeCustomerId': 'cus_1', 'subscriptionPlan': 'pro'})
+    client.seed('users/u2', {'stripeCustomerId': 'cus_1', 'subscriptionPlan': 'pro'})
+    store = FirestoreStore(client)
+
+    count = await store.update_where(
+        'users', 'stripeCustomerId', '==', 'cus_1', {'subscriptionPlan': 'free'}
+    )
+
+    assert count == 2
+    assert client.batch_sizes == [2]
+    assert client.data('users/u1')['subscriptionPlan'] == 'free'
+    assert client.data('users/u2')['subscriptionPlan'] == 'free'
+
+
+@pytest.mark.asyncio
+async def test_write_batch_is_single_round_trip():
+    """Test that write_batch commits mixed writes with one RPC"""
+    client = FakeAsyncFirestore()
+    client.seed('users/u1', {'subscriptionPlan': 'free'})
+    store = FirestoreStore(client)
+
+    await store.write_batch([
+        ('update', store.document('users', 'u1'), {'subscriptionPlan': 'pro'}),
+        ('set', store.document('user_credits', 'u1'), {'remainingCredits': 100}),
+    ])
+
+    assert client.rpc_count == 1
+    assert client.data('users/u1') == {'subscriptionPlan': 'pro'}
+    assert client.data('user_credits/u1') == {'remainingCredits': 100}
+
+
+@pytest.mark.asyncio
+async def test_write_batch_preconditions_fail_the_whole_batch():
+    """Test that a failed create or delete_existing precondition writes nothing"""
+    client = FakeAsyncFirestore()
+    client.seed('invites/a', {'email': 'a'})
+    store = FirestoreStore(client)
+
+    with pytest.raises(AlreadyExists):
+        await store.write_batch([
+            ('set', store.document('invites', 'b'), {'email': 'b'}),
+            ('create', store.document('invites', 'a'), {'email': 'a'}),
+        ])
+    with pytest.raises(NotFound):
+        await store.write_batch([
+            ('delete', store.document('invites', 'a'), None),
+            ('delete_existing', store.document('invites', 'c'), None),
+        ])
+
+    assert client.data('invites/a') == {'email': 'a'}
+    assert client.data('invites/b') is None
+
+
+@pytest.mark.asyncio
+async def test_page_and_get_many():
+    """Test that pages continue after the cursor and get_many reports missing documents"""
+    client = FakeAsyncFirestore()
+    for name in ['a', 'b', 'c']:
+        client.seed(f'orgs/o1/members/{name}', {'userId': name})
+    store = FirestoreStore(client)
+
+    first = await store.page('orgs/o1/members', 'userId', 2)
+    rest = await store.page('orgs/o1/members', 'userId', 2, start_after=first[-1][0])
+    found = await store.get_many('orgs/o1/members', ['a', 'z'])
+
+    assert [doc_id for doc_id, _ in first + rest] == ['a', 'b', 'c']
+    assert found == {'a': {'userId': 'a'}, 'z': None}
@@ -8,7 +8,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from trip_wizards.main import app
 
 client = TestClient(app)
@@ -31,13 +31,11 @@ def test_health_response_structure():
     assert isinstance(data["services"], dict)
 
 
-@patch('trip_wizards.main.db')
-def test_health_firestore_healthy(mock_db):
+@patch('trip_wizards.main.store')
+def test_health_firestore_healthy(mock_store):
     """Test health check when Firestore is healthy"""
     # Mock successful Firestore query
-    mock_collection = MagicMock()
-    mock_db.collection.return_value = mock_collection
-    mock_collection.limit.return_value.get.return_value = []
+    mock_store.ping = AsyncMock(return_value=None)
 
     response = client.get("/health")
     data = response.json()
@@ -46,11 +44,11 @@ def test_health_firestore_healthy(mock_db):
     assert data["services"]["firestore"]["status"] == "healthy"
 
 
-@patch('trip_wizards.main.db')
-def test_health_firestore_unhealthy(mock_db):
+@patch('trip_wizards.main.store')
+def test_health_firestore_unhealthy(mock_store):
     """Test health check when Firestore connection fails"""
     # Mock Firestore connection failure
-    mock_db.collection.side_effect = Exception("Connection failed")
+    mock_store.ping = AsyncMock(side_effect=Exception("Connection failed"))
 
     response = client.get("/health")
     data = response.json()
@@ -60,24 +58,15 @@ def test_health_firestore_unhealthy(mock_db):
     assert data["status"] == "degraded"
 
 
-@patch('trip_wizards.main.httpx.AsyncClient')
-@patch('trip_wizards.main.db')
-def test_health_adk_reachable(mock_db, mock_httpx_client):
+@patch('trip_wizards.main.adk')
+@patch('trip_wizards.main.store')
+def test_health_adk_reachable(mock_store, mock_adk):
     """Test health check when ADK service is reachable"""
     # Mock successful Firestore
-    mock_collection = MagicMock()
-    mock_db.collection.return_value = mock_collection
-    mock_collection.limit.return_value.get.return_value = []
+    mock_store.ping = AsyncMock(return_value=None)
 
-    # Mock successful ADK response
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-
-    mock_client_instance = MagicMock()
-    mock_client_instance.__aenter__.return_value = mock_client_instance
-    mock_client_instance.__aexit__.return_value = None
-    mock_client_instance.get.return_value = mock_response
-    mock_httpx_client.return_value = mock_client_instance
+    # Mock successful ADK response through the pooled client
+    mock_adk.health = AsyncMock(return_value=200)
 
     response = client.get("/health")
     data = response.json()
@@ -87,13 +76,11 @@ def test_health_adk_reachable(mock_db, mock_httpx_client):
 
 
 @patch('trip_wizards.main.firebase_admin.get_app')
-@patch('trip_wizards.main.db')
-def test_health_firebase_auth_healthy(mock_db, mock_get_app):
+@patch('trip_wizards.main.store')
+def test_health_firebase_auth_healthy(mock_store, mock_get_app):
     """Test health check when Firebase Auth is initialized"""
     # Mock successful Firestore
-    mock_collection = MagicMock()
-    mock_db.collection.return_value = mock_collection
-    mock_collection.limit.return_value.get.return_value = []
+    mock_store.ping = AsyncMock(return_value=None)
 
     # Mock Firebase app initialized
     mock_get_app.return_value = MagicMock()
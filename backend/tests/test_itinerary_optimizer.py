@@ -0,0 +1,103 @@
+"""
+Tests for the local itinerary optimizer
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import random
+import numpy as np
+import pytest
+from fixtures.sample_data import get_sample_itinerary_items
+from trip_wizards.itinerary_optimizer import ItineraryOptimizer, haversine_matrix
+
+TOKYO_DAY = [
+    {'id': 'senso_ji', 'coordinates': {'lat': 35.7148, 'lng': 139.7967}},
+    {'id': 'teamlab', 'coordinates': {'lat': 35.6260, 'lng': 139.7840}},
+    {'id': 'jiro', 'coordinates': {'lat': 35.6721, 'lng': 139.7640}, 'startTime': '19:00', 'endTime': '21:00'},
+    {'id': 'akihabara', 'coordinates': {'lat': 35.6984, 'lng': 139.7731}},
+    {'id': 'skytree', 'coordinates': {'lat': 35.7101, 'lng': 139.8107}},
+    {'id': 'meiji', 'coordinates': {'lat': 35.6764, 'lng': 139.6993}, 'window': {'start': '09:00', 'end': '11:00'}},
+]
+
+
+def random_stops(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        {'id': f'stop_{i}', 'coordinates': {'lat': 35.6 + rng.random() * 0.2, 'lng': 139.6 + rng.random() * 0.25},
+         'duration_minutes': 30}
+        for i in range(count)
+    ]
+
+
+def test_haversine_matrix_matches_known_distance():
+    """Test the vectorized distances against Tokyo to Osaka (~392 km)"""
+    distances = haversine_matrix(np.array([35.6762, 34.6937]), np.array([139.6503, 135.5023]))
+
+    assert distances[0, 0] == 0
+    assert distances[0, 1] == pytest.approx(392, abs=2)
+    assert distances[0, 1] == distances[1, 0]
+
+
+def test_optimized_day_respects_time_windows():
+    """Test that booked and windowed stops keep their times while travel drops"""
+    result = ItineraryOptimizer().optimize(TOKYO_DAY)
+    order = {step['itinerary_item_id']: step for step in result['optimized_order']}
+
+    assert result['type'] == 'itinerary_optimization'
+    assert len(order) == len(TOKYO_DAY)
+    assert result['optimized_order'][0]['itinerary_item_id'] == 'meiji'
+    assert order['jiro']['recommended_time'] == '19:00'
+    assert order['jiro']['reasoning'] == 'Booked for 19:00'
+    assert result['late_minutes'] == 0
+    assert result['total_travel_minutes'] < result['baseline_travel_minutes']
+    assert len(result['travel_time_estimates']) == len(TOKYO_DAY) - 1
+
+
+def test_two_opt_improves_on_nearest_neighbour():
+    """Test that 2-opt never lengthens the nearest-neighbour tour and starts at start_id"""
+    stops = random_stops(60)
+    greedy = ItineraryOptimizer(max_passes=0).optimize(stops, start_id='stop_5')
+    improved = ItineraryOptimizer().optimize(stops, start_id='stop_5')
+
+    assert improved['optimized_order'][0]['itinerary_item_id'] == 'stop_5'
+    assert improved['total_travel_minutes'] <= greedy['total_travel_minutes']
+    assert improved['total_travel_minutes'] < improved['baseline_travel_minutes'] / 2
+
+
+def test_typical_day_is_fast():
+    """Test that a typical day is optimized well within 10 ms"""
+    optimizer = ItineraryOptimizer()
+    optimizer.optimize(random_stops(12))
+
+    assert optimizer.optimize(random_stops(12, seed=2))['metadata']['response_time_ms'] < 10
+
+
+def test_invalid_items_are_rejected():
+    """Test that missing coordinates and unknown start stops raise ValueError"""
+    optimizer = ItineraryOptimizer()
+
+    with pytest.raises(ValueError):
+        optimizer.optimize([{'id': 'nowhere'}])
+    with pytest.raises(ValueError):
+        optimizer.optimize(TOKYO_DAY, start_id='hotel')
+    with pytest.raises(ValueError):
+        optimizer.optimize([])
+
+
+def test_app_itinerary_items_need_coordinates():
+    """Test that items with a place-name location are rejected unless they carry coordinates"""
+    optimizer = ItineraryOptimizer()
+    items = get_sample_itinerary_items()
+
+    with pytest.raises(ValueError):
+        optimizer.optimize(items)
+
+    for item, stop in zip(items, TOKYO_DAY):
+        item['coordinates'] = stop['coordinates']
+    items[-1]['location'] = {'name': 'Skytree', 'coordinates': items[-1].pop('coordinates')}
+    result = optimizer.optimize(items)
+    placed = sorted(step['itinerary_item_id'] for step in result['optimized_order'])
+    assert placed == sorted(item['id'] for item in items)
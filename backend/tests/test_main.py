@@ -1,19 +1,98 @@
-from trip_wizards.main import app
+import asyncio
+from unittest.mock import AsyncMock, patch
+
 from fastapi.testclient import TestClient
 
+from fixtures.adk_mock_responses import get_adk_mock_response
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards import main
+from trip_wizards.adk_client import AdkError
+from trip_wizards.ai_cache import SuggestionCache
+from trip_wizards.credit_ledger import CreditLedger
+from trip_wizards.doc_loader import DocumentLoader
+from trip_wizards.firestore_store import FirestoreStore
+from trip_wizards.main import app
+from trip_wizards.org_index import OrgIndex
+from trip_wizards.org_members import OrgMembers
+from trip_wizards.single_flight import SingleFlight
+
 client = TestClient(app)
 
+
 def test_health():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
 
+
 def test_root():
     response = client.get("/")
     assert response.status_code == 200
     assert "Trip Wizards API" in response.json()["message"]
 
-def test_ai_suggest():
+
+@patch('trip_wizards.main.adk')
+def test_ai_suggest(mock_adk):
+    mock_adk.suggest = AsyncMock(return_value=get_adk_mock_response('restaurant'))
     response = client.post("/ai/suggest", json={"prompt": "restaurant"})
     assert response.status_code == 200
-    assert "suggestion" in response.json()
\ No newline at end of file
+    assert "The Golden Fork" in response.json()["suggestion"]
+
+
+@patch('trip_wizards.main.adk')
+def test_ai_suggest_falls_back_while_circuit_open(mock_adk):
+    mock_adk.suggest = AsyncMock(side_effect=AdkError('circuit_open', 'paused', 30))
+    response = client.post("/ai/suggest", json={"prompt": "museum tips for a rainy afternoon"})
+    assert response.status_code == 200
+    assert "busy right now" in response.json()["suggestion"]
+
+
+def test_concurrent_membership_changes_are_all_kept():
+    """Test that concurrent invites and member adds to one org do not overwrite each other"""
+    fake = FakeAsyncFirestore(latency=0.001)
+    fake.seed('organizations/org_1', {'name': 'Wizards', 'adminId': 'admin'})
+    fake.seed('organizations/org_1/members/admin', {'userId': 'admin', 'role': 'admin'})
+    for i in range(10):
+        fake.seed(f'users/u{i}', {'subscriptionPlan': 'free'})
+    store = FirestoreStore(fake)
+    org_index = OrgIndex(store)
+
+    async def change_members():
+        return await asyncio.gather(
+            *(main.invite_user_to_org('org_1', main.InviteUserRequest(email=f'{i}@example.com')) for i in range(10)),
+            *(main.add_member_to_org('org_1', {'userId': f'u{i % 5}'}, DocumentLoader(store)) for i in range(10)),
+            return_exceptions=True,
+        )
+
+    with patch.object(main, 'store', store), patch.object(main, 'org_index', org_index), \
+            patch.object(main, 'org_members', OrgMembers(store, org_index)):
+        results = asyncio.run(change_members())
+
+    # Each user is added once; the second add of the same user is refused
+    assert sum(1 for result in results if getattr(result, 'status_code', None) == 400) == 5
+    assert len([path for path in fake._docs if path.startswith('organizations/org_1/invites/')]) == 10
+    assert len([path for path in fake._docs if path.startswith('organizations/org_1/members/')]) == 6
+
+
+def test_cache_hits_and_coalesced_callers_are_not_charged():
+    """Test that only the caller whose request reaches ADK pays a credit"""
+
+    async def slow_suggest(prompt, context):
+        await asyncio.sleep(0.01)
+        return get_adk_mock_response('restaurant')
+
+    ledger = CreditLedger(FirestoreStore(FakeAsyncFirestore()), default_credits=10)
+
+    async def ask():
+        # Three users at once share one ADK call, a fourth is served from the cache
+        await asyncio.gather(*(main.cached_suggestion('restaurants in Gion', {}, user_id=f'u{i}') for i in range(3)))
+        await main.cached_suggestion('restaurants in Gion', {}, user_id='u3')
+
+    with patch.object(main, 'credits', ledger), patch.object(main, 'suggestion_cache', SuggestionCache()), \
+            patch.object(main, 'ai_requests', SingleFlight()), patch('trip_wizards.main.adk') as mock_adk:
+        mock_adk.suggest = AsyncMock(side_effect=slow_suggest)
+        asyncio.run(ask())
+
+    stats = ledger.stats()
+    assert mock_adk.suggest.await_count == 1
+    assert stats['debits'] - stats['refunds'] == 1
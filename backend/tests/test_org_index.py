@@ -0,0 +1,102 @@
+"""
+Tests for the user -> organizations index
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.firestore_store import FirestoreStore
+from trip_wizards.org_index import OrgIndex
+
+
+ORG = {'name': 'Wizards', 'adminId': 'alice', 'memberIds': ['alice', 'bob'], 'pendingInvites': ['x@example.com']}
+
+
+def make_index(**kwargs):
+    client = FakeAsyncFirestore()
+    client.seed('organizations/org_1', ORG)
+    client.seed('organizations/org_2', {'name': 'Elsewhere', 'adminId': 'carol', 'memberIds': ['carol']})
+    return client, OrgIndex(FirestoreStore(client), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_first_listing_backfills_from_a_membership_scan():
+    """Test that a user missing from the index is backfilled once with projected fields"""
+    client, index = make_index()
+
+    orgs = await index.organizations('bob')
+
+    assert orgs == [{'id': 'org_1', 'name': 'Wizards', 'adminId': 'alice', 'role': 'member'}]
+    assert client.data('user_orgs/bob')['complete'] is True
+    assert client.data('user_orgs/bob')['orgs'] == {'org_1': {'name': 'Wizards', 'adminId': 'alice'}}
+    assert index.stats()['backfills'] == 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_listings_are_served_from_memory():
+    """Test that listing a recently seen user makes no Firestore calls"""
+    client, index = make_index()
+    await index.organizations('alice')
+    rpcs = client.rpc_count
+
+    for _ in range(3):
+        orgs = await index.organizations('alice')
+
+    assert orgs[0]['role'] == 'admin'
+    assert client.rpc_count == rpcs
+    assert index.stats()['hits'] == 3
+
+
+@pytest.mark.asyncio
+async def test_membership_writes_keep_the_index_current():
+    """Test that add and remove writes update both the stored and the in-memory index"""
+    client, index = make_index()
+    store = index.store
+    await index.organizations('carol')
+
+    await store.write_batch(index.add_writes('carol', 'org_1', ORG))
+    index.added('carol', 'org_1', ORG)
+    assert {org['id'] for org in await index.organizations('carol')} == {'org_1', 'org_2'}
+
+    await store.write_batch(index.remove_writes('carol', 'org_2'))
+    index.removed('carol', 'org_2')
+    assert [org['id'] for org in await index.organizations('carol')] == ['org_1']
+    assert set(client.data('user_orgs/carol')['orgs']) == {'org_1'}
+
+    # A worker with nothing in memory reads the same from user_orgs, without a scan
+    _, other = make_index()
+    other.store = store
+    assert [org['id'] for org in await other.organizations('carol')] == ['org_1']
+    assert other.stats()['backfills'] == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_is_bounded_and_expires():
+    """Test that the least recently listed user is dropped and entries expire"""
+    client, index = make_index(max_users=1)
+    await index.organizations('alice')
+    await index.organizations('bob')
+    assert index.stats()['users'] == 1
+
+    _, index = make_index(ttl=0)
+    await index.organizations('alice')
+    await index.organizations('alice')
+    assert index.stats()['hits'] == 0
+    assert index.stats()['loads'] == 2
+    assert index.stats()['backfills'] == 1
+
+
+@pytest.mark.asyncio
+async def test_backfill_finds_members_subcollections():
+    """Test that the backfill also finds organizations that keep members in a subcollection"""
+    client, index = make_index()
+    client.seed('organizations/org_3', {'name': 'New', 'adminId': 'dave'})
+    client.seed('organizations/org_3/members/bob', {'userId': 'bob', 'role': 'member'})
+
+    orgs = await index.organizations('bob')
+
+    assert {org['id'] for org in orgs} == {'org_1', 'org_3'}
@@ -0,0 +1,121 @@
+"""
+Tests for organization members and invites
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pytest
+from fixtures.fake_firestore import FakeAsyncFirestore
+from trip_wizards.firestore_store import FirestoreStore
+from trip_wizards.org_index import OrgIndex
+from trip_wizards.org_members import OrgMembers, OrgNotFound
+
+
+def make_members(users=0, **kwargs):
+    client = FakeAsyncFirestore()
+    client.seed('organizations/org_1', {'name': 'Wizards', 'adminId': 'admin'})
+    client.seed('organizations/org_1/members/admin', {'userId': 'admin', 'role': 'admin'})
+    for i in range(users):
+        client.seed(f'users/u{i:05d}', {'subscriptionPlan': 'free'})
+    store = FirestoreStore(client)
+    return client, OrgMembers(store, OrgIndex(store), **kwargs)
+
+
+def member_paths(client, org_id='org_1'):
+    return sorted(path for path in client._docs if path.startswith(f'organizations/{org_id}/members/'))
+
+
+@pytest.mark.asyncio
+async def test_single_changes_take_one_commit():
+    """Test that add and invite commit once and that duplicates are reported"""
+    client, members = make_members(users=1)
+    await members.organization('org_1')
+    rpcs = client.rpc_count
+
+    assert await members.add('org_1', 'u00000') is True
+    assert await members.add('org_1', 'u00000') is False
+    assert await members.invite('org_1', 'a@example.com') is True
+    assert await members.invite('org_1', 'a@example.com') is False
+
+    # Each is one read of the organization (uncached here) and one commit
+    assert client.rpc_count - rpcs == 4 * 2
+    assert client.data('user_orgs/u00000')['orgs'] == {'org_1': {'name': 'Wizards', 'adminId': 'admin'}}
+
+    assert await members.remove('org_1', 'u00000') is True
+    assert await members.remove('org_1', 'u00000') is False
+    assert await members.cancel_invite('org_1', 'a@example.com') is True
+    assert await members.cancel_invite('org_1', 'a@example.com') is False
+    assert member_paths(client) == ['organizations/org_1/members/admin']
+    assert client.data('user_orgs/u00000')['orgs'] == {}
+
+
+@pytest.mark.asyncio
+async def test_missing_organization_raises():
+    """Test that changes to an unknown organization raise OrgNotFound"""
+    _, members = make_members()
+
+    with pytest.raises(OrgNotFound):
+        await members.invite('missing', 'a@example.com')
+
+
+@pytest.mark.asyncio
+async def test_legacy_arrays_move_to_subcollections():
+    """Test that member and invite arrays are moved over in chunked transactions"""
+    client = FakeAsyncFirestore()
+    member_ids = ['admin'] + [f'u{i:04d}' for i in range(700)]
+    client.seed('organizations/old', {
+        'name': 'Legacy', 'adminId': 'admin', 'memberIds': member_ids, 'pendingInvites': ['x@example.com'],
+    })
+    store = FirestoreStore(client)
+    members = OrgMembers(store, OrgIndex(store))
+
+    org = await members.organization('old')
+
+    assert 'memberIds' not in org
+    assert 'memberIds' not in client.data('organizations/old')
+    assert 'pendingInvites' not in client.data('organizations/old')
+    assert len(member_paths(client, 'old')) == 701
+    assert client.data('organizations/old/members/admin')['role'] == 'admin'
+    assert client.data('organizations/old/invites/x@example.com') is not None
+    assert max(client.batch_sizes) <= 500
+    assert members.stats()['migrated'] == 1
+
+
+@pytest.mark.asyncio
+async def test_members_are_paginated():
+    """Test that pages follow each other by user ID and the last one has no token"""
+    _, members = make_members(users=5)
+    await members.bulk_add('org_1', [f'u{i:05d}' for i in range(5)])
+
+    seen = []
+    page, token = await members.members('org_1', limit=4)
+    seen += page
+    page, token_2 = await members.members('org_1', limit=4, start_after=token)
+    seen += page
+
+    assert token == 'u00002'
+    assert token_2 is None
+    assert [member['userId'] for member in seen] == ['admin'] + [f'u{i:05d}' for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_bulk_add_writes_chunks_in_parallel():
+    """Test that thousands of users are added in a few batches and skipped users are reported"""
+    client, members = make_members(users=2000, chunk_size=250)
+    client.latency = 0.001
+    user_ids = [f'u{i:05d}' for i in range(2000)] + ['ghost', 'admin', 'u00001']
+    client.seed('users/admin', {'subscriptionPlan': 'enterprise'})
+
+    result = await members.bulk_add('org_1', user_ids)
+
+    assert result == {'added': 2000, 'alreadyMembers': ['admin'], 'notFound': ['ghost']}
+    assert len(member_paths(client)) == 2001
+    assert client.batch_sizes == [500] * 8
+    assert client.data('user_orgs/u01999')['orgs']['org_1']['name'] == 'Wizards'
+
+    result = await members.bulk_remove('org_1', user_ids[:1000] + ['ghost'])
+    assert result == {'removed': 1000, 'notMembers': ['ghost']}
+    assert len(member_paths(client)) == 1001
@@ -0,0 +1,108 @@
+"""
+Tests for single-flight coalescing of concurrent calls
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import asyncio
+import pytest
+from trip_wizards.single_flight import SingleFlight
+
+
+class Upstream:
+    def __init__(self, delay=0.02, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return {'suggestion': f'answer {self.calls}'}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    """Test that a burst of identical requests makes one upstream call"""
+    flights = SingleFlight()
+    upstream = Upstream()
+
+    leader = asyncio.ensure_future(flights.do('museums', upstream))
+    await asyncio.sleep(0)
+    assert flights.in_flight('museums') and not flights.in_flight('hiking')
+    results = await asyncio.gather(leader, *(flights.do('museums', upstream) for _ in range(9)))
+
+    assert not flights.in_flight('museums')
+    assert upstream.calls == 1
+    assert all(result == {'suggestion': 'answer 1'} for result in results)
+    assert flights.stats() == {'in_flight': 0, 'leaders': 1, 'followers': 9, 'abandoned': 0}
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_are_not_coalesced():
+    """Test that a finished flight does not serve later callers"""
+    flights = SingleFlight()
+    upstream = Upstream(delay=0)
+
+    await flights.do('museums', upstream)
+    await flights.do('museums', upstream)
+
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_waiter():
+    """Test that an upstream failure is raised to all coalesced callers"""
+    flights = SingleFlight()
+    upstream = Upstream(error=RuntimeError('ADK down'))
+
+    results = await asyncio.gather(
+        *(flights.do('museums', upstream) for _ in range(3)), return_exceptions=True
+    )
+
+    assert upstream.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_others():
+    """Test that one caller going away leaves the shared call running"""
+    flights = SingleFlight()
+    upstream = Upstream()
+    leader = asyncio.create_task(flights.do('museums', upstream))
+    follower = asyncio.create_task(flights.do('museums', upstream))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+
+    assert await follower == {'suggestion': 'answer 1'}
+    assert leader.cancelled()
+    assert not upstream.cancelled
+
+
+@pytest.mark.asyncio
+async def test_upstream_cancelled_when_all_waiters_leave():
+    """Test that an abandoned call is cancelled and the key freed"""
+    flights = SingleFlight()
+    upstream = Upstream(delay=1.0)
+    waiters = [asyncio.create_task(flights.do('museums', upstream)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert upstream.cancelled
+    assert flights.stats()['in_flight'] == 0
+    assert flights.stats()['abandoned'] == 1
@@ -4,6 +4,8 @@ class Organization {
   final String id;
   final String name;
   final String adminId;
+  // Loaded from the members and invites subcollections; not stored on the
+  // organization document
   final List<String> memberIds;
   final List<String> pendingInvites;
   final List<String> allowedDomains;
@@ -34,14 +36,18 @@ class Organization {
     required this.updatedAt,
   });
 
-  factory Organization.fromFirestore(DocumentSnapshot doc) {
+  factory Organization.fromFirestore(
+    DocumentSnapshot doc, {
+    List<String> memberIds = const [],
+    List<String> pendingInvites = const [],
+  }) {
     final data = doc.data() as Map<String, dynamic>;
     return Organization(
       id: doc.id,
       name: data['name'] ?? '',
       adminId: data['adminId'] ?? '',
-      memberIds: List<String>.from(data['memberIds'] ?? []),
-      pendingInvites: List<String>.from(data['pendingInvites'] ?? []),
+      memberIds: memberIds,
+      pendingInvites: pendingInvites,
       allowedDomains: List<String>.from(data['allowedDomains'] ?? []),
       domainAutoJoin: data['domainAutoJoin'] ?? false,
       ssoEnabled: data['ssoEnabled'] ?? false,
@@ -60,8 +66,6 @@ class Organization {
     return {
       'name': name,
       'adminId': adminId,
-      'memberIds': memberIds,
-      'pendingInvites': pendingInvites,
       'allowedDomains': allowedDomains,
       'domainAutoJoin': domainAutoJoin,
       'ssoEnabled': ssoEnabled,
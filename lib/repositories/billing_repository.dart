@@ -251,14 +251,15 @@ class BillingRepository {
 
   // Get organization usage analytics
   Future<Map<String, dynamic>> getOrganizationAnalytics(String orgId) async {
-    final orgDoc = await _firestore
-        .collection('organizations')
-        .doc(orgId)
-        .get();
+    final orgRef = _firestore.collection('organizations').doc(orgId);
+    final orgDoc = await orgRef.get();
     if (!orgDoc.exists) return {};
 
     final orgData = orgDoc.data()!;
-    final memberIds = List<String>.from(orgData['memberIds'] ?? []);
+    // Members and invites are documents in the organization's subcollections
+    final members = await orgRef.collection('members').get();
+    final memberIds = members.docs.map((doc) => doc.id).toList();
+    final pendingInvites = await orgRef.collection('invites').count().get();
 
     // Get billing records for all members
     final billingRecords = <BillingRecord>[];
@@ -287,7 +288,7 @@ class BillingRepository {
       'totalSpent': totalSpent,
       'monthlyRevenue': monthlyRevenue,
       'pooledCredits': orgData['pooledCredits'] ?? 0,
-      'pendingInvites': (orgData['pendingInvites'] as List?)?.length ?? 0,
+      'pendingInvites': pendingInvites.count ?? 0,
       'createdAt': orgData['createdAt'],
     };
   }
@@ -1,46 +1,67 @@
+import 'dart:convert';
 import 'package:cloud_firestore/cloud_firestore.dart';
+import 'package:http/http.dart' as http;
 import '../models/organization.dart';
 import '../models/organization_credit_usage.dart';
 
 class OrganizationRepository {
   final FirebaseFirestore _firestore = FirebaseFirestore.instance;
+  // Organizations, members and invites are written by the backend, which
+  // keeps them in organizations/{id}/members and /invites and indexes each
+  // user's organizations in user_orgs/{userId}
+  final String _backendUrl = 'http://localhost:8000'; // Backend URL
 
-  // Create a new organization
+  // Create a new organization (enterprise plan required)
   Future<String> createOrganization(String name, String adminId) async {
-    final now = DateTime.now();
-    final orgData = {
-      'name': name,
-      'adminId': adminId,
-      'memberIds': [adminId],
-      'pendingInvites': [],
-      'createdAt': now,
-      'updatedAt': now,
-    };
-
-    final docRef = await _firestore.collection('organizations').add(orgData);
-    return docRef.id;
+    final response = await http.post(
+      Uri.parse('$_backendUrl/api/v1/orgs'),
+      headers: {'Content-Type': 'application/json'},
+      body: jsonEncode({'name': name, 'adminId': adminId}),
+    );
+    if (response.statusCode != 200) {
+      throw Exception(
+        'Failed to create organization: ${_detail(response) ?? response.statusCode}',
+      );
+    }
+    return jsonDecode(response.body)['id'];
   }
 
-  // Get organization by ID
+  // Get organization by ID, with its members and pending invites
   Future<Organization?> getOrganization(String orgId) async {
-    final doc = await _firestore.collection('organizations').doc(orgId).get();
-    if (doc.exists) {
-      return Organization.fromFirestore(doc);
-    }
-    return null;
+    final orgRef = _firestore.collection('organizations').doc(orgId);
+    final results = await Future.wait([
+      orgRef.get(),
+      orgRef.collection('members').orderBy('userId').get(),
+      orgRef.collection('invites').orderBy('email').get(),
+    ]);
+    final doc = results[0] as DocumentSnapshot;
+    if (!doc.exists) return null;
+    return Organization.fromFirestore(
+      doc,
+      memberIds: (results[1] as QuerySnapshot).docs.map((d) => d.id).toList(),
+      pendingInvites: (results[2] as QuerySnapshot).docs
+          .map((d) => d.id)
+          .toList(),
+    );
   }
 
   // Get organizations for a user (as admin or member)
   Stream<List<Organization>> getUserOrganizations(String userId) {
-    return _firestore
-        .collection('organizations')
-        .where('memberIds', arrayContains: userId)
-        .snapshots()
-        .map(
-          (snapshot) => snapshot.docs
-              .map((doc) => Organization.fromFirestore(doc))
-              .toList(),
+    return _firestore.collection('user_orgs').doc(userId).snapshots().asyncMap((
+      indexDoc,
+    ) async {
+      if (!indexDoc.exists) {
+        // Users whose memberships predate the index get it built on their
+        // first listing, which updates this stream
+        await http.get(
+          Uri.parse('$_backendUrl/api/v1/orgs?user_id=$userId'),
         );
+        return <Organization>[];
+      }
+      final orgs = Map<String, dynamic>.from(indexDoc.data()?['orgs'] ?? {});
+      final organizations = await Future.wait(orgs.keys.map(getOrganization));
+      return organizations.whereType<Organization>().toList();
+    });
   }
 
   // Update organization
@@ -54,34 +75,59 @@ class OrganizationRepository {
 
   // Add member to organization
   Future<void> addMember(String orgId, String userId) async {
-    await _firestore.collection('organizations').doc(orgId).update({
-      'memberIds': FieldValue.arrayUnion([userId]),
-      'updatedAt': DateTime.now(),
-    });
+    final response = await http.post(
+      Uri.parse('$_backendUrl/api/v1/orgs/$orgId/members'),
+      headers: {'Content-Type': 'application/json'},
+      body: jsonEncode({'userId': userId}),
+    );
+    _checkMembershipResponse(response, 'User is already a member');
   }
 
   // Remove member from organization
   Future<void> removeMember(String orgId, String userId) async {
-    await _firestore.collection('organizations').doc(orgId).update({
-      'memberIds': FieldValue.arrayRemove([userId]),
-      'updatedAt': DateTime.now(),
-    });
+    final response = await http.delete(
+      Uri.parse('$_backendUrl/api/v1/orgs/$orgId/members/$userId'),
+    );
+    _checkMembershipResponse(response, 'User is not a member');
   }
 
   // Add pending invite
   Future<void> addPendingInvite(String orgId, String email) async {
-    await _firestore.collection('organizations').doc(orgId).update({
-      'pendingInvites': FieldValue.arrayUnion([email]),
-      'updatedAt': DateTime.now(),
-    });
+    final response = await http.post(
+      Uri.parse('$_backendUrl/api/v1/orgs/$orgId/invite'),
+      headers: {'Content-Type': 'application/json'},
+      body: jsonEncode({'email': email}),
+    );
+    _checkMembershipResponse(response, 'Invite already sent');
   }
 
   // Remove pending invite
   Future<void> removePendingInvite(String orgId, String email) async {
-    await _firestore.collection('organizations').doc(orgId).update({
-      'pendingInvites': FieldValue.arrayRemove([email]),
-      'updatedAt': DateTime.now(),
-    });
+    final response = await http.delete(
+      Uri.parse('$_backendUrl/api/v1/orgs/$orgId/invite'),
+      headers: {'Content-Type': 'application/json'},
+      body: jsonEncode({'email': email}),
+    );
+    _checkMembershipResponse(response, 'Invite not found');
+  }
+
+  // A change that was already in effect (already a member, invite already
+  // sent, ...) counts as done
+  void _checkMembershipResponse(http.Response response, String alreadyDone) {
+    if (response.statusCode == 200) return;
+    final detail = _detail(response);
+    if (detail == alreadyDone) return;
+    throw Exception(
+      'Failed to update organization members: ${detail ?? response.statusCode}',
+    );
+  }
+
+  String? _detail(http.Response response) {
+    try {
+      return jsonDecode(response.body)['detail'];
+    } catch (_) {
+      return null;
+    }
   }
 
   // Delete organization
@@ -100,14 +146,20 @@ class OrganizationRepository {
     return _firestore
         .collection('organizations')
         .doc(orgId)
+        .collection('members')
+        .orderBy('userId')
         .snapshots()
-        .asyncMap((orgDoc) async {
+        .asyncMap((snapshot) async {
+          final orgDoc = await _firestore
+              .collection('organizations')
+              .doc(orgId)
+              .get();
           if (!orgDoc.exists) return [];
-
-          final org = Organization.fromFirestore(orgDoc);
+          final adminId = orgDoc.data()?['adminId'];
           final members = <Map<String, dynamic>>[];
 
-          for (final memberId in org.memberIds) {
+          for (final memberDoc in snapshot.docs) {
+            final memberId = memberDoc.id;
             final userDoc = await _firestore
                 .collection('users')
                 .doc(memberId)
@@ -118,7 +170,7 @@ class OrganizationRepository {
                 'id': memberId,
                 'email': userData['email'] ?? 'Unknown',
                 'displayName': userData['displayName'] ?? 'Unknown',
-                'isAdmin': memberId == org.adminId,
+                'isAdmin': memberId == adminId,
               });
             }
           }
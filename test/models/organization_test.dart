@@ -82,8 +82,9 @@ void main() {
 
       expect(data['name'], 'Test Org');
       expect(data['adminId'], 'admin_123');
-      expect(data['memberIds'], ['admin_123']);
-      expect(data['pendingInvites'], []);
+      // Members and invites live in subcollections written by the backend
+      expect(data.containsKey('memberIds'), false);
+      expect(data.containsKey('pendingInvites'), false);
       expect(data['createdAt'], now);
       expect(data['updatedAt'], now);
     });